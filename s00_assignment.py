@@ -0,0 +1,112 @@
+# Project: ISCA 2021 Script
+# Filename: s00_assignment.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Reviewer Assignment Functions for ISCA 2021 Script
+# Description:
+## This script contains the functions used by s08 to assign reviewers to the papers.
+## The score of a reviewer on a paper is the topic interest of the reviewer (HotCRP PC info export)
+## on the topics of the paper (s05 output), obtained for all pairs with one sparse matrix product.
+## The assignment is a transportation problem (each paper needs a number of reviews and each
+## reviewer has a maximum load), solved as a sparse linear program: only the best candidate
+## reviewers of each paper are variables, the conflicts are removed through a sparse mask, and
+## every paper has a slack variable with a large cost so that the problem is always feasible.
+## The constraint matrix is totally unimodular, so the simplex solution is integral.
+
+#%% Import some libraries that are needed
+import numpy as np
+import scipy.sparse
+import scipy.optimize
+from s00_instrument import timed
+
+#%% Define constant
+# Prefix of the topic interest columns in the HotCRP PC info export
+topic_column_prefix = 'topic: '
+# Cost of a review that cannot be assigned (much higher than any score)
+unassigned_cost = 1000.0
+
+#%% Function to get the topic interest of each reviewer
+## Returns a reviewer x topic matrix (empty interest is 0) for the topics in topic_list.
+def topic_interest_matrix(pc_info_df, topic_list):
+    interest = np.zeros((pc_info_df.shape[0], len(topic_list)))
+    for column, topic in enumerate(topic_list):
+        if topic_column_prefix + topic in pc_info_df.columns:
+            interest[:, column] = pc_info_df[topic_column_prefix + topic].fillna(0).to_numpy(dtype=np.float64)
+    return interest
+
+#%% Function to encode the topics of each paper as a sparse paper x topic matrix
+## topic_lists is the list of topics of each paper in order of priority (s05). The first topic has
+## weight 1 and the other topics have weight secondary_topic_weight.
+def paper_topic_matrix(topic_lists, topic_index, secondary_topic_weight=0.5):
+    row_list = []
+    column_list = []
+    data_list = []
+    for row, topic_list in enumerate(topic_lists):
+        for order, topic in enumerate(topic_list):
+            if topic in topic_index:
+                row_list.append(row)
+                column_list.append(topic_index[topic])
+                data_list.append(1.0 if order == 0 else secondary_topic_weight)
+    return scipy.sparse.csr_matrix((data_list, (row_list, column_list)), shape=(len(topic_lists), len(topic_index)))
+
+#%% Function to encode the conflicts as a sparse paper x reviewer mask
+## conflict_pairs is a list of (paper ID, reviewer email).
+def conflict_mask(paper_id_list, reviewer_email_list, conflict_pairs):
+    paper_index = {paper_id: index for index, paper_id in enumerate(paper_id_list)}
+    reviewer_index = {email: index for index, email in enumerate(reviewer_email_list)}
+    pair_set = set()
+    for paper_id, email in conflict_pairs:
+        if paper_id in paper_index and email in reviewer_index:
+            pair_set.add((paper_index[paper_id], reviewer_index[email]))
+    pair_list = sorted(pair_set)
+    return scipy.sparse.csr_matrix((np.ones(len(pair_list), dtype=bool), ([pair[0] for pair in pair_list], [pair[1] for pair in pair_list])),
+                                   shape=(len(paper_id_list), len(reviewer_email_list)))
+
+#%% Function to assign the reviewers
+## score is the paper x reviewer score matrix and conflict the sparse paper x reviewer conflict mask.
+## Each paper gets reviews_per_paper reviewers among its candidates_per_paper best non-conflicted
+## reviewers, and each reviewer gets at most max_load papers. Ties are broken by a small random
+## perturbation (seed) so that the load is spread over the reviewers with the same score.
+## Returns (assignment_list, stats) in which assignment_list is a list of (paper, reviewer) indexes.
+@timed()
+def solve_assignment(score, conflict, reviews_per_paper, max_load, candidates_per_paper=50, seed=0):
+    paper_num, reviewer_num = score.shape
+    perturbed = score + np.random.RandomState(seed).uniform(0, 1e-3, size=score.shape)
+    perturbed[conflict.nonzero()] = -np.inf
+    candidates_per_paper = min(candidates_per_paper, reviewer_num)
+
+    # Candidate reviewers of each paper (the conflicted reviewers are never candidates)
+    candidate = np.argpartition(-perturbed, candidates_per_paper - 1, axis=1)[:, :candidates_per_paper] if candidates_per_paper > 0 else np.zeros((paper_num, 0), dtype=np.int64)
+    paper_list = np.repeat(np.arange(paper_num), candidate.shape[1])
+    reviewer_list = candidate.ravel()
+    valid = np.isfinite(perturbed[paper_list, reviewer_list])
+    paper_list, reviewer_list = paper_list[valid], reviewer_list[valid]
+    edge_num = len(paper_list)
+
+    # Variables: one per candidate pair, then one slack per paper
+    cost = np.concatenate([-perturbed[paper_list, reviewer_list], np.full(paper_num, unassigned_cost)])
+    edge_index = np.arange(edge_num)
+    paper_constraint = scipy.sparse.csr_matrix((np.ones(edge_num + paper_num), (np.concatenate([paper_list, np.arange(paper_num)]),
+                                               np.concatenate([edge_index, edge_num + np.arange(paper_num)]))), shape=(paper_num, edge_num + paper_num))
+    reviewer_constraint = scipy.sparse.csr_matrix((np.ones(edge_num), (reviewer_list, edge_index)), shape=(reviewer_num, edge_num + paper_num))
+    bounds = np.column_stack([np.zeros(edge_num + paper_num), np.concatenate([np.ones(edge_num), np.full(paper_num, reviews_per_paper)])])
+    result = scipy.optimize.linprog(cost, A_ub=reviewer_constraint, b_ub=np.full(reviewer_num, max_load),
+                                    A_eq=paper_constraint, b_eq=np.full(paper_num, reviews_per_paper), bounds=bounds, method='highs-ds')
+    if result.status != 0:
+        raise RuntimeError('Reviewer assignment failed: %s' % (result.message))
+
+    assigned = result.x[:edge_num] > 0.5
+    assignment_list = list(zip(paper_list[assigned].tolist(), reviewer_list[assigned].tolist()))
+    load = np.bincount(reviewer_list[assigned], minlength=reviewer_num)
+    stats = \
+    {
+        "papers"      : paper_num,
+        "reviewers"   : reviewer_num,
+        "candidates"  : edge_num,
+        "assigned"    : len(assignment_list),
+        "unassigned"  : int(round(result.x[edge_num:].sum())),
+        "total_score" : float(score[paper_list[assigned], reviewer_list[assigned]].sum()),
+        "min_load"    : int(load.min()) if reviewer_num else 0,
+        "max_load"    : int(load.max()) if reviewer_num else 0
+    }
+    return assignment_list, stats
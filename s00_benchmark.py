@@ -0,0 +1,173 @@
+# Project: ISCA 2021 Script
+# Filename: s00_benchmark.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Benchmark of the ISCA 2021 Script Pipeline
+# Description:
+## This script times every script of the pipeline (s01-s08) on synthetic conferences of several
+## sizes (see s00_synthetic.py). For each scale, the dataset is generated in its own folder, the
+## synthetic DBLP dump is imported (so the DBLP scripts use the dump backend and never the network),
+## and the scripts are run one by one in the pipeline order, each in its own Python process from
+## the folder of the dataset (see run_stage() in s00_pipeline.py). The time of each step, with the peak memory and the slowest functions
+## from the run report of the script (see s00_instrument.py), is appended to a JSON file so that the
+## results of successive runs can be compared.
+##
+##   python s00_benchmark.py [--scale NAME ...] [--stage STAGE ...] [--repeat N] [--output FILE] [--profile PROFILER]
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+
+from s00_synthetic import generate_dataset
+from s00_synthetic import synthetic_files
+from s00_dblp_dump import import_dblp_dump
+from s00_dblp_dump import dump_index_filename
+from s00_pipeline import pipeline_dir
+from s00_pipeline import pipeline_stages
+from s00_pipeline import pipeline_log_folder
+from s00_pipeline import run_stage
+from s00_pipeline import stage_run_report
+from s00_instrument import load_run_report
+
+#%% Define constant
+# Size of the synthetic conference of each scale
+benchmark_scales = \
+{
+    "small"  : {"papers": 100,  "pc": 30,  "coauthors": 50},
+    "medium" : {"papers": 500,  "pc": 100, "coauthors": 150},
+    "large"  : {"papers": 2000, "pc": 300, "coauthors": 300}
+}
+# Scales run by default
+benchmark_default_scales = ['small', 'medium']
+# Folder of the datasets (one folder per scale)
+benchmark_folder = '.cache/benchmark'
+# Results of all runs are appended to this file
+benchmark_result_filename = 'benchmark-results.json'
+# Seed of the synthetic datasets
+benchmark_seed = 0
+# Number of functions of the run report of each script kept in the results (the slowest ones)
+benchmark_top_functions = 10
+
+#%% Function to run a stage on a dataset
+## The stage is run with the DBLP dump backend, from the folder of the dataset.
+## Returns (seconds, returncode, output)
+def run_script(stage_name, dataset_folder, python=None):
+    # Read by s00_function.py in the process of the stage
+    os.environ['ISCA_DBLP_BACKEND'] = 'dump'
+    start = time.perf_counter()
+    returncode, runtime = run_stage(stage_name, python, dataset_folder)
+    seconds = time.perf_counter() - start
+    with open(os.path.join(dataset_folder, pipeline_log_folder, stage_name + '.log'), encoding='utf-8', errors='replace') as log_file:
+        output = log_file.read()
+    return seconds, returncode, output
+
+#%% Function to benchmark one scale
+## Returns the result of the scale: the parameters, the size of the dataset and the time of each step.
+def benchmark_scale(scale, stage_names=None, repeat=1, keep=False, verbose=True):
+    parameters = benchmark_scales[scale]
+    dataset_folder = os.path.join(pipeline_dir, benchmark_folder, scale)
+    if os.path.exists(dataset_folder):
+        shutil.rmtree(dataset_folder)
+    step_list = []
+
+    def report(step, seconds, status, run_report=None):
+        step_dict = {"step": step, "seconds": round(seconds, 3), "status": status}
+        if run_report is not None:
+            step_dict['peak_rss_mb'] = run_report['peak_rss_mb']
+            step_dict['functions'] = dict(list(run_report['functions'].items())[:benchmark_top_functions])
+            step_dict['cache'] = run_report['cache']
+        step_list.append(step_dict)
+        if verbose:
+            print('[%s] %-16s %8.2f s %s' % (scale, step, seconds, status))
+
+    start = time.perf_counter()
+    count_dict = generate_dataset(dataset_folder, seed=benchmark_seed, **parameters)
+    report('generate', time.perf_counter() - start, 'ok')
+    start = time.perf_counter()
+    import_dblp_dump(os.path.join(dataset_folder, synthetic_files['dblpdump']), os.path.join(dataset_folder, dump_index_filename), progress=False)
+    report('dblp-import', time.perf_counter() - start, 'ok')
+
+    failed = False
+    for stage in pipeline_stages:
+        if stage_names and stage['name'] not in stage_names:
+            continue
+        if failed:
+            report(stage['name'], 0.0, 'skipped')
+            continue
+        # The run report of the fastest run is kept
+        best_seconds = None
+        best_run_report = None
+        for index in range(repeat):
+            seconds, returncode, output = run_script(stage['name'], dataset_folder)
+            if returncode != 0:
+                failed = True
+                if verbose:
+                    print(output[-2000:])
+                break
+            if best_seconds is None or seconds < best_seconds:
+                best_seconds = seconds
+                best_run_report = load_run_report(os.path.join(dataset_folder, stage_run_report(stage)))
+        if failed:
+            report(stage['name'], seconds, 'failed')
+        else:
+            report(stage['name'], best_seconds, 'ok', best_run_report)
+
+    if not keep:
+        shutil.rmtree(dataset_folder)
+    scale_dict = \
+    {
+        "scale"      : scale,
+        "parameters" : parameters,
+        "dataset"    : count_dict,
+        "repeat"     : repeat,
+        "steps"      : step_list
+    }
+    return scale_dict
+
+#%% Function to run the benchmark and append the results to the result file
+def run_benchmark(scales=None, stage_names=None, repeat=1, output_filename=None, keep=False, verbose=True):
+    scales = scales or benchmark_default_scales
+    output_filename = output_filename or os.path.join(pipeline_dir, benchmark_folder, benchmark_result_filename)
+    run_dict = \
+    {
+        "date"     : time.strftime('%Y-%m-%d %H:%M:%S'),
+        "python"   : platform.python_version(),
+        "platform" : platform.platform(),
+        "scales"   : [benchmark_scale(scale, stage_names, repeat, keep, verbose) for scale in scales]
+    }
+    result_list = []
+    if os.path.exists(output_filename):
+        with open(output_filename, encoding='utf-8') as result_file:
+            result_list = json.load(result_file)
+    result_list.append(run_dict)
+    if os.path.dirname(output_filename):
+        os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+    with open(output_filename, 'w', encoding='utf-8') as result_file:
+        json.dump(result_list, result_file, indent=1)
+    if verbose:
+        print('Results are appended to %s' % (output_filename))
+    return run_dict
+
+#%% Command line interface
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the ISCA 2021 Script pipeline on synthetic data')
+    parser.add_argument('--scale', action='append', choices=sorted(benchmark_scales), help='scale to run (default: %s)' % (', '.join(benchmark_default_scales)))
+    parser.add_argument('--stage', action='append', help='stage to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs of each stage (the fastest is kept)')
+    parser.add_argument('--output', help='result file (default: %s)' % (os.path.join(benchmark_folder, benchmark_result_filename)))
+    parser.add_argument('--keep', action='store_true', help='keep the datasets and the outputs')
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], help='profile every script (the profiles are kept with --keep)')
+    args = parser.parse_args(argv)
+    if args.profile:
+        # Read by s00_instrument.py in the processes of the scripts
+        os.environ['ISCA_PROFILE'] = args.profile
+    run_dict = run_benchmark(args.scale, args.stage, max(args.repeat, 1), args.output, args.keep)
+    return 1 if any(step['status'] != 'ok' for scale_dict in run_dict['scales'] for step in scale_dict['steps']) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
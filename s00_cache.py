@@ -0,0 +1,374 @@
+# Project: ISCA 2021 Script
+# Filename: s00_cache.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: DBLP Cache for ISCA 2021 Script
+# Description:
+## This script contains the on-disk cache used by s00_function.py to store DBLP responses.
+## All entries are stored in a single SQLite file with compressed payloads. Each type of entry
+## has its own time-to-live (TTL) so that stale affiliations are refreshed, and the least
+## recently used entries are evicted when the cache grows beyond the size limit.
+## An entry derived from another entry (e.g., a person record parsed from a person XML) keeps the
+## creation time of its source, so it expires together with its source and never outlives it.
+## The access times used for the eviction are written in batches instead of on every hit.
+##
+## The script can also be run from the command line to manage the cache:
+##   python s00_cache.py stats
+##   python s00_cache.py prune [--kind KIND] [--all] [--max-size MB]
+##   python s00_cache.py warm FILE [FILE ...]
+##   python s00_cache.py import-legacy
+## FILE for warm is either a CSV file (HotCRP PC info with first and last columns, or the output of
+## s01 with url_dblp column) or a text file with one name or DBLP link per line.
+
+#%% Import some libraries that are needed
+import os
+import sys
+import csv
+import glob
+import time
+import zlib
+import sqlite3
+import atexit
+import argparse
+import threading
+from s00_instrument import count
+
+#%% Define cache settings
+# Location of the cache file
+cache_filename = '.cache/dblp-cache.sqlite'
+# Time-to-live (in seconds) of each type of entry
+##   person_id     : DBLP author search result (s01)
+##   pub_id        : DBLP person XML (s02, s04)
+##   person_record : person record extracted from DBLP person XML (s02, s04)
+cache_ttl = \
+{
+    "person_id"     : 30 * 24 * 3600,
+    "pub_id"        : 14 * 24 * 3600,
+    "person_record" : 14 * 24 * 3600
+}
+# Maximum size (in bytes) of the compressed payloads before the least recently used entries are evicted
+cache_max_size = 1024 * 1024 * 1024
+# The size limit is checked once every this many writes
+cache_evict_interval = 100
+# The access times of the cache hits are written once every this many hits (and with every write)
+cache_touch_interval = 500
+# Entries derived from another entry type, they are removed together with their source and
+# expire with it (their TTL is never longer than the TTL of their source)
+cache_derived_kind = \
+{
+    "pub_id" : ["person_record"]
+}
+
+#%% DBLP cache backed by SQLite
+class DBLPCache:
+    def __init__(self, filename=None, ttl=None, max_size=None):
+        self.filename = cache_filename if filename is None else filename
+        self.ttl = dict(cache_ttl) if ttl is None else dict(ttl)
+        for source_kind, derived_kind_list in cache_derived_kind.items():
+            for derived_kind in derived_kind_list:
+                if self.ttl.get(source_kind) is not None:
+                    self.ttl[derived_kind] = min(self.ttl.get(derived_kind) or self.ttl[source_kind], self.ttl[source_kind])
+        self.max_size = cache_max_size if max_size is None else max_size
+        cache_dir = os.path.dirname(self.filename)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.write_count = 0
+        self.pending_touches = {}
+        connection = self.get_connection()
+        with self.write_lock:
+            connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'kind TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL, '
+                               'accessed REAL NOT NULL, size INTEGER NOT NULL, payload BLOB NOT NULL, '
+                               'PRIMARY KEY (kind, key))')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            connection.commit()
+        # The access times of the last hits are written when the script exits
+        atexit.register(self.flush_touches)
+
+    def get_connection(self):
+        # SQLite connections cannot be shared between threads, so each thread opens its own
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.filename, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def is_expired(self, kind, created, now=None):
+        ttl = self.ttl.get(kind)
+        if ttl is None:
+            return False
+        if now is None:
+            now = time.time()
+        return created + ttl < now
+
+    def get(self, kind, key):
+        # Return the cached string (return None if not cached or expired)
+        connection = self.get_connection()
+        row = connection.execute('SELECT created, payload FROM entries WHERE kind=? AND key=?', (kind, key)).fetchone()
+        if row is None:
+            count('cache.%s.miss' % (kind))
+            return None
+        now = time.time()
+        if self.is_expired(kind, row[0], now):
+            self.delete(kind, key)
+            count('cache.%s.miss' % (kind))
+            return None
+        count('cache.%s.hit' % (kind))
+        with self.write_lock:
+            self.pending_touches[(kind, key)] = now
+            if len(self.pending_touches) >= cache_touch_interval:
+                self.write_touches(connection)
+                connection.commit()
+        return zlib.decompress(row[1]).decode('utf-8')
+
+    def created(self, kind, key):
+        # Return the creation time of an entry (return None if not cached)
+        row = self.get_connection().execute('SELECT created FROM entries WHERE kind=? AND key=?', (kind, key)).fetchone()
+        return None if row is None else row[0]
+
+    def write_touches(self, connection):
+        # Write the pending access times, the caller holds write_lock and commits
+        if self.pending_touches:
+            connection.executemany('UPDATE entries SET accessed=? WHERE kind=? AND key=?',
+                                   [(accessed, kind, key) for (kind, key), accessed in self.pending_touches.items()])
+            self.pending_touches = {}
+
+    def flush_touches(self):
+        connection = self.get_connection()
+        with self.write_lock:
+            if self.pending_touches:
+                self.write_touches(connection)
+                connection.commit()
+
+    def put(self, kind, key, value, created=None):
+        now = time.time()
+        payload = zlib.compress(value.encode('utf-8'), 6)
+        connection = self.get_connection()
+        with self.write_lock:
+            connection.execute('INSERT OR REPLACE INTO entries (kind, key, created, accessed, size, payload) VALUES (?,?,?,?,?,?)',
+                               (kind, key, now if created is None else created, now, len(payload), payload))
+            # A new source entry makes the derived entries outdated
+            for derived_kind in cache_derived_kind.get(kind, []):
+                connection.execute('DELETE FROM entries WHERE kind=? AND key=?', (derived_kind, key))
+            self.write_touches(connection)
+            connection.commit()
+            self.write_count = self.write_count + 1
+            check_size = (self.write_count % cache_evict_interval == 0)
+        if check_size:
+            self.evict()
+
+    def delete(self, kind, key):
+        connection = self.get_connection()
+        with self.write_lock:
+            connection.execute('DELETE FROM entries WHERE kind=? AND key=?', (kind, key))
+            for derived_kind in cache_derived_kind.get(kind, []):
+                connection.execute('DELETE FROM entries WHERE kind=? AND key=?', (derived_kind, key))
+            connection.commit()
+
+    def total_size(self):
+        connection = self.get_connection()
+        return connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self, max_size=None):
+        # Remove the least recently used entries until the cache fits into max_size
+        if max_size is None:
+            max_size = self.max_size
+        self.flush_touches()
+        total_size = self.total_size()
+        if total_size <= max_size:
+            return 0
+        connection = self.get_connection()
+        evicted = 0
+        with self.write_lock:
+            cursor = connection.execute('SELECT kind, key, size FROM entries ORDER BY accessed ASC')
+            victims = []
+            for kind, key, size in cursor:
+                if total_size <= max_size:
+                    break
+                victims.append((kind, key))
+                total_size = total_size - size
+            cursor.close()
+            # The derived entries are removed with their source
+            victims.extend((derived_kind, key) for kind, key in list(victims) for derived_kind in cache_derived_kind.get(kind, []))
+            evicted = connection.executemany('DELETE FROM entries WHERE kind=? AND key=?', victims).rowcount
+            connection.commit()
+        return evicted
+
+    def prune(self, kind=None, remove_all=False):
+        # Remove expired entries (or every entry if remove_all), optionally only of one kind
+        connection = self.get_connection()
+        now = time.time()
+        removed = 0
+        with self.write_lock:
+            for entry_kind in self.kinds(connection):
+                if kind is not None and entry_kind != kind:
+                    continue
+                if remove_all:
+                    cursor = connection.execute('DELETE FROM entries WHERE kind=?', (entry_kind,))
+                elif self.ttl.get(entry_kind) is not None:
+                    cursor = connection.execute('DELETE FROM entries WHERE kind=? AND created<?', (entry_kind, now - self.ttl[entry_kind]))
+                else:
+                    continue
+                removed = removed + cursor.rowcount
+            connection.commit()
+        return removed
+
+    def kinds(self, connection=None):
+        if connection is None:
+            connection = self.get_connection()
+        return [row[0] for row in connection.execute('SELECT DISTINCT kind FROM entries')]
+
+    def stats(self):
+        connection = self.get_connection()
+        now = time.time()
+        stats_list = []
+        for kind, count, size, oldest, newest in connection.execute(
+                'SELECT kind, COUNT(*), SUM(size), MIN(created), MAX(created) FROM entries GROUP BY kind ORDER BY kind'):
+            expired = 0
+            if self.ttl.get(kind) is not None:
+                expired = connection.execute('SELECT COUNT(*) FROM entries WHERE kind=? AND created<?',
+                                             (kind, now - self.ttl[kind])).fetchone()[0]
+            stats_dict = \
+            {
+                "kind"    : kind,
+                "entries" : count,
+                "expired" : expired,
+                "size"    : size,
+                "oldest"  : oldest,
+                "newest"  : newest
+            }
+            stats_list.append(stats_dict)
+        return stats_list
+
+    def vacuum(self):
+        connection = self.get_connection()
+        with self.write_lock:
+            connection.execute('VACUUM')
+
+    def import_legacy(self, legacy_dir='.cache'):
+        # Import the one-file-per-entry cache used by older versions of the scripts
+        imported = 0
+        legacy_files = [('person_id', filename) for filename in glob.glob(os.path.join(legacy_dir, 'person_id', '*.json'))]
+        legacy_files = legacy_files + [('pub_id', filename) for filename in glob.glob(os.path.join(legacy_dir, 'pub_id', '*'))]
+        for kind, filename in legacy_files:
+            key = os.path.basename(filename)
+            if kind == 'person_id':
+                key = key[:-len('.json')]
+            with open(filename, 'r', encoding='utf-8') as fp:
+                value = fp.read()
+            self.put(kind, key, value, created=os.path.getmtime(filename))
+            imported = imported + 1
+        return imported
+
+# The cache is opened on first use so that the settings above can be changed beforehand
+dblp_cache = None
+dblp_cache_lock = threading.Lock()
+
+def get_cache():
+    global dblp_cache
+    with dblp_cache_lock:
+        if dblp_cache is None:
+            dblp_cache = DBLPCache()
+    return dblp_cache
+
+#%% Function to read names and DBLP links to warm the cache
+def read_warm_file(filename):
+    names = []
+    dblp_links = []
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'r', encoding='utf-8') as fp:
+            for row in csv.DictReader(fp):
+                if row.get('url_dblp'):
+                    dblp_links.append(row['url_dblp'])
+                elif row.get('first') and row.get('last'):
+                    names.append(row['first'] + ' ' + row['last'])
+    else:
+        with open(filename, 'r', encoding='utf-8') as fp:
+            for line in fp:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('http://') or line.startswith('https://'):
+                    dblp_links.append(line)
+                else:
+                    names.append(line)
+    # Split the full name the same way as s01: the last word is the last name
+    name_pairs = []
+    for full_name in names:
+        split_name = full_name.split()
+        if len(split_name) < 2:
+            continue
+        name_pairs.append((' '.join(split_name[:-1]), split_name[-1]))
+    return name_pairs, dblp_links
+
+#%% Command line interface
+def format_size(size):
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024 or unit == 'GiB':
+            return '%.1f %s' % (size, unit)
+        size = size / 1024.0
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the DBLP cache used by the ISCA 2021 scripts.')
+    parser.add_argument('--cache', default=None, help='cache file (default: %s)' % (cache_filename))
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('stats', help='show the number of entries and size of each entry type')
+    prune_parser = subparsers.add_parser('prune', help='remove expired entries')
+    prune_parser.add_argument('--kind', default=None, help='only prune this entry type')
+    prune_parser.add_argument('--all', action='store_true', help='remove every entry, not only expired ones')
+    prune_parser.add_argument('--max-size', type=float, default=None, help='evict least recently used entries until the cache is smaller than this (MB)')
+    warm_parser = subparsers.add_parser('warm', help='fetch names and DBLP links into the cache')
+    warm_parser.add_argument('files', nargs='+', help='CSV or text files with names or DBLP links')
+    subparsers.add_parser('import-legacy', help='import the .cache/person_id and .cache/pub_id directories')
+    args = parser.parse_args(argv)
+
+    cache = get_cache() if args.cache is None else DBLPCache(args.cache)
+    if args.command == 'stats':
+        stats_list = cache.stats()
+        print('%-14s %8s %8s %12s  %-16s  %-16s' % ('kind', 'entries', 'expired', 'size', 'oldest', 'newest'))
+        for stats_dict in stats_list:
+            print('%-14s %8d %8d %12s  %-16s  %-16s' % (stats_dict['kind'], stats_dict['entries'], stats_dict['expired'],
+                  format_size(stats_dict['size']), format_time(stats_dict['oldest']), format_time(stats_dict['newest'])))
+        print('Total size: %s (limit %s)' % (format_size(cache.total_size()), format_size(cache.max_size)))
+    elif args.command == 'prune':
+        removed = cache.prune(args.kind, args.all)
+        print('Removed %d entries' % (removed))
+        if args.max_size is not None:
+            evicted = cache.evict(int(args.max_size * 1024 * 1024))
+            print('Evicted %d entries' % (evicted))
+        cache.vacuum()
+    elif args.command == 'warm':
+        # Imported here since s00_function also imports this script
+        import s00_cache
+        from s00_function import request_author_key_batch
+        from s00_function import request_person_record_batch
+        s00_cache.dblp_cache = cache
+        name_pairs = []
+        dblp_links = []
+        for filename in args.files:
+            file_name_pairs, file_dblp_links = read_warm_file(filename)
+            name_pairs = name_pairs + file_name_pairs
+            dblp_links = dblp_links + file_dblp_links
+        if name_pairs:
+            request_author_key_batch(name_pairs)
+            print('Warmed %d names' % (len(name_pairs)))
+        if dblp_links:
+            request_person_record_batch(dblp_links)
+            print('Warmed %d DBLP links' % (len(dblp_links)))
+    elif args.command == 'import-legacy':
+        imported = cache.import_legacy(os.path.dirname(cache.filename) or '.')
+        print('Imported %d entries' % (imported))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
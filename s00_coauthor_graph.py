@@ -0,0 +1,200 @@
+# Project: ISCA 2021 Script
+# Filename: s00_coauthor_graph.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Co-Author Graph for ISCA 2021 Script
+# Description:
+## This script contains the co-authorship graph of the PC members built from DBLP.
+## Every DBLP Person ID is interned into an integer and the co-authors of each person are kept
+## in sparse adjacency arrays (CSR) with the most recent year and the number of papers of each
+## co-authorship. The graph is built once by s02 and saved as a binary file, so that the next
+## scripts can query "co-authors of X since year Y" in O(degree) without parsing any list.
+
+#%% Import some libraries that are needed
+import numpy as np
+from s00_instrument import timed
+
+#%% Define constant
+# DBLP link prefix of each person
+dblp_pid_url = 'https://dblp.org/pid/'
+
+#%% Function to get DBLP Person ID from DBLP link
+# e.g., https://dblp.org/pid/75/912 -> 75/912
+def link_to_pid(dblp_link):
+    if '/pid/' in dblp_link:
+        return dblp_link.split('/pid/', 1)[1]
+    return dblp_link
+
+#%% Co-author graph
+## While building, the co-authors of each person are kept in a dictionary (in the order they first
+## appear). freeze() converts them into CSR arrays:
+##   indptr      : co-authors of node i are in indices[indptr[i]:indptr[i+1]]
+##   indices     : node of the co-author
+##   last_year   : most recent year of a paper with the co-author
+##   paper_count : number of papers with the co-author
+##   edge_name   : name of the co-author as printed on the first paper with the co-author
+## min_year is the oldest publication year used to build the graph (None if all years are used).
+class CoauthorGraph:
+    def __init__(self, min_year=None):
+        self.min_year = min_year
+        self.pid_list = []
+        self.pid_index = {}
+        self.name_list = []
+        self.name_index = {}
+        self.node_name = []
+        self.added_node = set()
+        self.building_edges = {}
+        self.indptr = None
+
+    def intern_name(self, name):
+        name_id = self.name_index.get(name)
+        if name_id is None:
+            name_id = len(self.name_list)
+            self.name_index[name] = name_id
+            self.name_list.append(name)
+        return name_id
+
+    def intern(self, pid, name=''):
+        node = self.pid_index.get(pid)
+        if node is None:
+            node = len(self.pid_list)
+            self.pid_index[pid] = node
+            self.pid_list.append(pid)
+            self.node_name.append(self.intern_name(name))
+        return node
+
+    @timed()
+    def add_person(self, dblp_link, name, publications):
+        ## Add the co-authors of a person from the publications of the person record
+        ## (list of (year, author pids, author names)). Each person is only added once.
+        if self.indptr is not None:
+            raise RuntimeError('The co-author graph is already frozen')
+        node = self.intern(link_to_pid(dblp_link), name)
+        if node in self.added_node:
+            return node
+        self.added_node.add(node)
+        edges = self.building_edges.setdefault(node, {})
+        for year, author_pids, author_names in publications:
+            if self.min_year is not None and year < self.min_year:
+                continue
+            for author_pid, author_name in zip(author_pids, author_names):
+                coauthor = self.intern(author_pid, author_name)
+                if coauthor == node:
+                    continue
+                edge = edges.get(coauthor)
+                if edge is None:
+                    edges[coauthor] = [year, 1, self.intern_name(author_name)]
+                else:
+                    edge[0] = max(edge[0], year)
+                    edge[1] = edge[1] + 1
+        return node
+
+    def copy_person(self, graph, dblp_link):
+        ## Copy the co-authors of a person from another graph (e.g., the graph saved by the previous
+        ## run) instead of adding them from the publications. Returns None if the person is not in
+        ## the other graph.
+        if self.indptr is not None:
+            raise RuntimeError('The co-author graph is already frozen')
+        if graph.min_year != self.min_year:
+            raise ValueError('The co-author graphs are built with different years')
+        pid = link_to_pid(dblp_link)
+        other_node = graph.pid_index.get(pid)
+        if other_node is None or other_node not in graph.added_node:
+            return None
+        node = self.intern(pid, graph.name_list[graph.node_name[other_node]])
+        if node in self.added_node:
+            return node
+        self.added_node.add(node)
+        edges = self.building_edges.setdefault(node, {})
+        for author_pid, author_name, last_year, paper_count in graph.coauthors(dblp_link):
+            edges[self.intern(author_pid, author_name)] = [last_year, paper_count, self.intern_name(author_name)]
+        return node
+
+    @timed()
+    def freeze(self):
+        # Convert the adjacency dictionaries into CSR arrays
+        node_num = len(self.pid_list)
+        degree = np.zeros(node_num, dtype=np.int64)
+        for node, edges in self.building_edges.items():
+            degree[node] = len(edges)
+        self.indptr = np.zeros(node_num + 1, dtype=np.int64)
+        np.cumsum(degree, out=self.indptr[1:])
+        edge_num = int(self.indptr[-1])
+        self.indices = np.zeros(edge_num, dtype=np.int32)
+        self.last_year = np.zeros(edge_num, dtype=np.int16)
+        self.paper_count = np.zeros(edge_num, dtype=np.int32)
+        self.edge_name = np.zeros(edge_num, dtype=np.int32)
+        for node, edges in self.building_edges.items():
+            start = self.indptr[node]
+            end = start + len(edges)
+            if end == start:
+                continue
+            self.indices[start:end] = list(edges.keys())
+            edge_values = np.array(list(edges.values()), dtype=np.int64)
+            self.last_year[start:end] = edge_values[:, 0]
+            self.paper_count[start:end] = edge_values[:, 1]
+            self.edge_name[start:end] = edge_values[:, 2]
+        self.building_edges = {}
+        return self
+
+    def coauthors(self, dblp_link, since_year=None):
+        ## Return the co-authors of a person as a list of (pid, name, last year, paper count),
+        ## in the order they first appear on DBLP. Only co-authorships with a paper in or after
+        ## since_year are returned.
+        if self.indptr is None:
+            self.freeze()
+        if since_year is not None and self.min_year is not None and since_year < self.min_year:
+            raise ValueError('The co-author graph only contains publications since %d' % (self.min_year))
+        node = self.pid_index.get(link_to_pid(dblp_link))
+        if node is None:
+            return []
+        start = self.indptr[node]
+        end = self.indptr[node + 1]
+        last_year = self.last_year[start:end]
+        selected = np.arange(start, end)
+        if since_year is not None:
+            selected = selected[last_year >= since_year]
+        return [(self.pid_list[self.indices[edge]], self.name_list[self.edge_name[edge]],
+                 int(self.last_year[edge]), int(self.paper_count[edge])) for edge in selected]
+
+    def degree(self, dblp_link):
+        if self.indptr is None:
+            self.freeze()
+        node = self.pid_index.get(link_to_pid(dblp_link))
+        if node is None:
+            return 0
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def save(self, filename):
+        if self.indptr is None:
+            self.freeze()
+        np.savez_compressed(filename,
+                            pid_list=np.array(self.pid_list, dtype=str),
+                            name_list=np.array(self.name_list, dtype=str),
+                            node_name=np.array(self.node_name, dtype=np.int32),
+                            added_node=np.array(sorted(self.added_node), dtype=np.int32),
+                            indptr=self.indptr, indices=self.indices, last_year=self.last_year,
+                            paper_count=self.paper_count, edge_name=self.edge_name,
+                            min_year=np.array(-1 if self.min_year is None else self.min_year))
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            min_year = int(data['min_year'])
+            graph = cls(None if min_year < 0 else min_year)
+            graph.pid_list = data['pid_list'].tolist()
+            graph.name_list = data['name_list'].tolist()
+            graph.node_name = data['node_name'].tolist()
+            graph.added_node = set(data['added_node'].tolist())
+            graph.indptr = data['indptr']
+            graph.indices = data['indices']
+            graph.last_year = data['last_year']
+            graph.paper_count = data['paper_count']
+            graph.edge_name = data['edge_name']
+        graph.pid_index = {pid: node for node, pid in enumerate(graph.pid_list)}
+        graph.name_index = {name: name_id for name_id, name in enumerate(graph.name_list)}
+        return graph
+
+#%% Function to load the co-author graph saved by s02
+def load_coauthor_graph(filename):
+    return CoauthorGraph.load(filename)
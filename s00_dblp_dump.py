@@ -0,0 +1,325 @@
+# Project: ISCA 2021 Script
+# Filename: s00_dblp_dump.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Offline DBLP Backend for ISCA 2021 Script
+# Description:
+## This script builds a local index from the DBLP XML dump (https://dblp.org/xml/dblp.xml.gz)
+## so that s01, s02, and s04 can run without sending any request to DBLP. The dump is read
+## as a stream and only the following are kept in a SQLite index:
+##   person    : DBLP Person ID and name of each person (from the homepages records)
+##   name      : every name (including aliases) of each person, used for the name search
+##   note      : affiliation notes of each person
+##   pub       : year of each publication
+##   authorship: authors (or editors) of each publication
+##
+## Build the index once (this takes a while for the full dump):
+##   python s00_dblp_dump.py import dblp.xml.gz
+## Then set dblp_backend = 'dump' inside s00_function.py.
+
+#%% Import some libraries that are needed
+import os
+import re
+import sys
+import gzip
+import time
+import sqlite3
+import argparse
+import threading
+import html.entities
+import xml.etree.ElementTree as ET
+import unidecode
+from s00_instrument import timed
+
+#%% Define the index settings
+# Location of the index built from the DBLP XML dump
+dump_index_filename = '.cache/dblp-index.sqlite'
+# Publication types in the DBLP XML dump
+dump_publication_tags = ['article', 'inproceedings', 'proceedings', 'book', 'incollection',
+                         'phdthesis', 'mastersthesis', 'data']
+# Number of rows inserted at once during the import
+dump_insert_batch = 50000
+# DBLP link prefix of each person
+dblp_pid_url = 'https://dblp.org/pid/'
+
+#%% Function to normalize a name for the name search
+# e.g., 'Wei Wang 0001' -> 'wei wang', 'Jos\xe9 Mart\xednez' -> 'jose martinez'
+def normalize_name(name):
+    name = unidecode.unidecode(name).lower()
+    name = name.translate({ord(ch): None for ch in '0123456789'})
+    return ' '.join(name.replace('.', ' ').split())
+
+#%% Reader that resolves the DTD entities of the DBLP XML dump
+## The DBLP XML dump uses the character entities defined in dblp.dtd (e.g., &uuml;) which are
+## unknown to the XML parser. They are converted into numeric character references while reading.
+class DBLPDumpReader:
+    entity_pattern = re.compile(rb'&([A-Za-z][A-Za-z0-9]*);')
+    xml_entities = [b'amp', b'lt', b'gt', b'quot', b'apos']
+
+    def __init__(self, filename):
+        if filename.endswith('.gz'):
+            self.fp = gzip.open(filename, 'rb')
+        else:
+            self.fp = open(filename, 'rb')
+        self.buffer = b''
+        self.eof = False
+        self.bytes_read = 0
+
+    def replace_entity(self, match):
+        name = match.group(1)
+        if name in self.xml_entities:
+            return match.group(0)
+        codepoint = html.entities.name2codepoint.get(name.decode('ascii'))
+        if codepoint is None:
+            return b'?'
+        return b'&#%d;' % (codepoint)
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            line = self.fp.readline()
+            if not line:
+                self.eof = True
+                break
+            self.bytes_read = self.bytes_read + len(line)
+            if b'&' in line:
+                line = self.entity_pattern.sub(self.replace_entity, line)
+            self.buffer = self.buffer + line
+        if size < 0:
+            size = len(self.buffer)
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return data
+
+    def close(self):
+        self.fp.close()
+
+#%% Function to create the index tables
+def create_index_tables(connection):
+    connection.execute('CREATE TABLE IF NOT EXISTS person (pid TEXT PRIMARY KEY, name TEXT NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS name (name TEXT NOT NULL, pid TEXT NOT NULL, name_norm TEXT NOT NULL, last_norm TEXT NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS note (pid TEXT NOT NULL, note TEXT NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS pub (id INTEGER PRIMARY KEY, year INTEGER NOT NULL)')
+    connection.execute('CREATE TABLE IF NOT EXISTS authorship (pub_id INTEGER NOT NULL, position INTEGER NOT NULL, name TEXT NOT NULL)')
+
+def create_index_indexes(connection):
+    connection.execute('CREATE INDEX IF NOT EXISTS name_name ON name (name)')
+    connection.execute('CREATE INDEX IF NOT EXISTS name_pid ON name (pid)')
+    connection.execute('CREATE INDEX IF NOT EXISTS name_last_norm ON name (last_norm)')
+    connection.execute('CREATE INDEX IF NOT EXISTS note_pid ON note (pid)')
+    connection.execute('CREATE INDEX IF NOT EXISTS authorship_name ON authorship (name)')
+    connection.execute('CREATE INDEX IF NOT EXISTS authorship_pub_id ON authorship (pub_id)')
+
+#%% Function to import the DBLP XML dump into the index
+## The dump is parsed as a stream and every record is discarded once it has been stored, so the
+## memory usage stays small even for the full dump.
+def import_dblp_dump(dump_filename, index_filename=None, progress=True):
+    if index_filename is None:
+        index_filename = dump_index_filename
+    index_dir = os.path.dirname(index_filename)
+    if index_dir and not os.path.exists(index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+    # Always build a new index
+    if os.path.exists(index_filename):
+        os.remove(index_filename)
+    connection = sqlite3.connect(index_filename)
+    connection.execute('PRAGMA journal_mode=OFF')
+    connection.execute('PRAGMA synchronous=OFF')
+    create_index_tables(connection)
+
+    person_rows = []
+    name_rows = []
+    note_rows = []
+    pub_rows = []
+    authorship_rows = []
+    pub_id = 0
+    person_num = 0
+    start_time = time.time()
+
+    def flush():
+        connection.executemany('INSERT OR REPLACE INTO person VALUES (?,?)', person_rows)
+        connection.executemany('INSERT INTO name VALUES (?,?,?,?)', name_rows)
+        connection.executemany('INSERT INTO note VALUES (?,?)', note_rows)
+        connection.executemany('INSERT INTO pub VALUES (?,?)', pub_rows)
+        connection.executemany('INSERT INTO authorship VALUES (?,?,?)', authorship_rows)
+        del person_rows[:], name_rows[:], note_rows[:], pub_rows[:], authorship_rows[:]
+
+    reader = DBLPDumpReader(dump_filename)
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(reader, events=('start', 'end')):
+        if event == 'start':
+            depth = depth + 1
+            if depth == 1:
+                root = elem
+            continue
+        depth = depth - 1
+        if depth != 1:
+            continue
+        key = elem.get('key', '')
+        if elem.tag == 'www' and key.startswith('homepages/'):
+            # Person record
+            names = [author.text for author in elem.findall('author') if author.text]
+            if names:
+                pid = key[len('homepages/'):]
+                person_rows.append((pid, names[0]))
+                for name in names:
+                    name_norm = normalize_name(name)
+                    last_norm = name_norm.split()[-1] if name_norm else ''
+                    name_rows.append((name, pid, name_norm, last_norm))
+                for note in elem.findall('note'):
+                    if note.get('type') == 'affiliation' and note.text:
+                        note_rows.append((pid, note.text))
+                person_num = person_num + 1
+        elif elem.tag in dump_publication_tags:
+            # Publication record, use editors if the publication does not have any author
+            authors = elem.findall('author')
+            if not authors:
+                authors = elem.findall('editor')
+            year = elem.findtext('year')
+            if authors:
+                pub_id = pub_id + 1
+                pub_rows.append((pub_id, int(year) if year and year.isdigit() else 0))
+                for position, author in enumerate(authors):
+                    if author.text:
+                        authorship_rows.append((pub_id, position, author.text))
+        root.clear()
+        if len(authorship_rows) >= dump_insert_batch:
+            flush()
+            if progress:
+                print('\r%d MB read, %d persons, %d publications, %.0fs' % (reader.bytes_read // (1024 * 1024), person_num, pub_id, time.time() - start_time), end='')
+    flush()
+    reader.close()
+    if progress:
+        print('\r%d MB read, %d persons, %d publications, %.0fs' % (reader.bytes_read // (1024 * 1024), person_num, pub_id, time.time() - start_time))
+        print('Building the index...')
+    create_index_indexes(connection)
+    connection.commit()
+    connection.close()
+    return person_num, pub_id
+
+#%% Index built from the DBLP XML dump
+class DBLPDumpIndex:
+    def __init__(self, index_filename=None):
+        self.filename = dump_index_filename if index_filename is None else index_filename
+        if not os.path.isfile(self.filename):
+            raise FileNotFoundError('DBLP dump index %s does not exist, run: python s00_dblp_dump.py import dblp.xml.gz' % (self.filename))
+        self.local = threading.local()
+
+    def get_connection(self):
+        # SQLite connections cannot be shared between threads, so each thread opens its own
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect('file:%s?mode=ro' % (self.filename), uri=True)
+            self.local.connection = connection
+        return connection
+
+    def affiliations(self, pid):
+        connection = self.get_connection()
+        return [row[0] for row in connection.execute('SELECT note FROM note WHERE pid=? ORDER BY rowid', (pid,))]
+
+    @timed()
+    def search_author(self, firstname, lastname):
+        ## Return the same JSON structure as the DBLP author search API
+        ## (https://dblp.org/search/author/api) for the first word of firstname and lastname
+        connection = self.get_connection()
+        first_norm = normalize_name(firstname.split()[0]) if firstname.split() else ''
+        last_norm = normalize_name(lastname)
+        last_key = last_norm.split()[-1] if last_norm else ''
+        pid_list = []
+        for pid, name_norm in connection.execute('SELECT pid, name_norm FROM name WHERE last_norm=? ORDER BY rowid', (last_key,)):
+            if pid in pid_list:
+                continue
+            if (' ' + first_norm + ' ') in (' ' + name_norm + ' ') and (' ' + last_norm + ' ') in (' ' + name_norm + ' '):
+                pid_list.append(pid)
+        hit_list = []
+        for pid in pid_list:
+            name = connection.execute('SELECT name FROM person WHERE pid=?', (pid,)).fetchone()[0]
+            info = {'author': name, 'url': dblp_pid_url + pid}
+            notes = [{'@type': 'affiliation', 'text': note} for note in self.affiliations(pid)]
+            if notes:
+                info['notes'] = {'note': notes}
+            hit_list.append({'info': info})
+        json_dict = {'result': {'hits': {'@sent': str(len(hit_list)), 'hit': hit_list}}}
+        return json_dict
+
+    def publications(self, pid, threshold_year=None):
+        ## Return (year, author pids, author names) of each publication of the person,
+        ## newest first like the DBLP person page. Authors without DBLP Person ID are skipped.
+        connection = self.get_connection()
+        if threshold_year is None:
+            threshold_year = -1
+        pub_rows = connection.execute(
+            'SELECT DISTINCT pub.id, pub.year FROM name JOIN authorship ON authorship.name = name.name '
+            'JOIN pub ON pub.id = authorship.pub_id WHERE name.pid=? AND pub.year>=? ORDER BY pub.year DESC, pub.id DESC',
+            (pid, threshold_year)).fetchall()
+        publication_list = []
+        for pub_id, year in pub_rows:
+            # A name may belong to several homepages (e.g., an alias shared by two persons). It is
+            # resolved to the person being looked up if it is one of its names, then to the person
+            # whose primary name it is, then to the smallest pid, so the result does not depend on
+            # the order in which SQLite returns the rows.
+            author_rows = connection.execute(
+                'SELECT (SELECT name.pid FROM name JOIN person ON person.pid = name.pid WHERE name.name = authorship.name '
+                'ORDER BY name.pid = ? DESC, person.name = name.name DESC, name.pid LIMIT 1) AS author_pid, authorship.name '
+                'FROM authorship WHERE authorship.pub_id=? AND author_pid IS NOT NULL ORDER BY authorship.position', (pid, pub_id)).fetchall()
+            publication_list.append((year, tuple(row[0] for row in author_rows), tuple(row[1] for row in author_rows)))
+        return publication_list
+
+    @timed()
+    def person_record(self, pid, threshold_year=None, with_publications=True):
+        # Return the same person record as s00_function.parse_person_record
+        connection = self.get_connection()
+        row = connection.execute('SELECT name FROM person WHERE pid=?', (pid,)).fetchone()
+        if row is None:
+            raise KeyError('DBLP Person ID %s is not in the DBLP dump index' % (pid))
+        person_record = \
+        {
+            "pid"            : pid,
+            "name"           : row[0],
+            "affiliations"   : self.affiliations(pid),
+            "publications"   : self.publications(pid, threshold_year) if with_publications else [],
+            "threshold_year" : threshold_year
+        }
+        return person_record
+
+    def stats(self):
+        connection = self.get_connection()
+        stats_dict = {}
+        for table in ['person', 'name', 'note', 'pub', 'authorship']:
+            stats_dict[table] = connection.execute('SELECT COUNT(*) FROM %s' % (table)).fetchone()[0]
+        return stats_dict
+
+# The index is opened on first use so that the settings above can be changed beforehand
+dump_index = None
+dump_index_lock = threading.Lock()
+
+def get_dump_index():
+    global dump_index
+    with dump_index_lock:
+        if dump_index is None:
+            dump_index = DBLPDumpIndex()
+    return dump_index
+
+#%% Command line interface
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and inspect the offline DBLP index used by the ISCA 2021 scripts.')
+    parser.add_argument('--index', default=None, help='index file (default: %s)' % (dump_index_filename))
+    subparsers = parser.add_subparsers(dest='command')
+    import_parser = subparsers.add_parser('import', help='build the index from the DBLP XML dump')
+    import_parser.add_argument('dump', help='DBLP XML dump (dblp.xml or dblp.xml.gz)')
+    subparsers.add_parser('stats', help='show the number of rows in the index')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        person_num, pub_num = import_dblp_dump(args.dump, args.index)
+        print('Imported %d persons and %d publications' % (person_num, pub_num))
+    elif args.command == 'stats':
+        for table, count in DBLPDumpIndex(args.index).stats().items():
+            print('%-12s %10d' % (table, count))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,25 +8,246 @@
 ## You don't need to run this script since it will be called by other Python scripts.
 
 #%% Import some libraries that are needed
-import urllib.request
 import json
 import unidecode
 import os
 from fuzzywuzzy import fuzz
 import xmltodict
+import xml.etree.ElementTree as ET
+import io
 import hashlib
+import threading
+import tqdm
+import time
+import random
+import functools
+import http.client
+import email.utils
+import urllib.parse
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from s00_cache import get_cache
+from s00_dblp_dump import get_dump_index
+from s00_instrument import timed
+try:
+    from rapidfuzz import fuzz as rapidfuzz_fuzz
+    from rapidfuzz import process as rapidfuzz_process
+except ImportError:
+    rapidfuzz_fuzz = None
+    rapidfuzz_process = None
 
-#%% Function to Retrieve DBLP Person ID
-## This function is used to retrieve DBLP Person ID using DBLP API based on Person Name
-## Since there is a possibility that multiple people own same name, the function will return
-## JSON file that contains all possible people.
-def request_author_key(firstname, lastname, retry_num=2, outputtype='json'):
-    if not os.path.exists('.cache'):
-        os.makedirs('.cache')
-    if not os.path.exists('.cache/person_id'):
-        os.makedirs('.cache/person_id')
+#%% Define DBLP backend
+## 'http' : send requests to DBLP (responses are cached, see s00_cache.py)
+## 'dump' : use the local index built from the DBLP XML dump (see s00_dblp_dump.py), no network is needed
+## The backend can also be selected with the ISCA_DBLP_BACKEND environment variable, e.g.:
+##   ISCA_DBLP_BACKEND=dump python s00_pipeline.py run
+dblp_backend = os.environ.get('ISCA_DBLP_BACKEND') or 'http'
+
+#%% Define fuzzy match backend
+## 'fuzzywuzzy' : gives the same scores as the original scripts
+## 'rapidfuzz'  : much faster for large batches (pip install "rapidfuzz>=3.6"); the scores may be slightly
+##                different from fuzzywuzzy if python-Levenshtein is not installed. fuzzywuzzy is used
+##                if rapidfuzz is not installed.
+fuzzy_backend = 'fuzzywuzzy'
+
+#%% Define DBLP endpoints and fetch settings
+# The endpoints can be pointed to a local HTTP server (e.g., for testing without network).
+dblp_author_api_url     = 'https://dblp.org/search/author/api?'
+# Maximum number of concurrent requests when fetching a batch of names or links
+fetch_max_workers       = 8
+# Maximum number of requests per second sent to the same host (DBLP rate-limits aggressive clients)
+fetch_requests_per_host = 5
+# Timeout (in seconds) of a single HTTP request
+fetch_timeout           = 30
+# Base and maximum delay (in seconds) of the exponential backoff between retries
+fetch_backoff_base      = 1.0
+fetch_backoff_max       = 60.0
+# Threshold year used for person records that only need the affiliation (no publication is kept)
+affiliation_only_year   = 9999
+
+#%% Per-host rate limiter
+## This class spaces out the requests sent to the same host so that the worker threads
+## do not flood DBLP. Each call to wait() reserves the next free slot for the host and
+## sleeps until that slot comes.
+class HostRateLimiter:
+    def __init__(self, requests_per_second=fetch_requests_per_host):
+        if requests_per_second and requests_per_second > 0:
+            self.min_interval = 1.0 / requests_per_second
+        else:
+            self.min_interval = 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, req_url):
+        host = urllib.parse.urlsplit(req_url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+#%% Shared HTTP client for DBLP
+## All DBLP requests go through this client. It keeps one persistent (keep-alive) connection
+## per host for each worker thread, follows redirects, and retries timeouts, connection errors,
+## HTTP 429 and HTTP 5xx with exponential backoff and jitter. If DBLP sends a Retry-After header,
+## the client waits for that long instead. Latency and number of attempts of each request are
+## recorded in request_log and can be summarized using summary().
+class DBLPHttpClient:
+    retry_status = (429, 500, 502, 503, 504)
+    redirect_status = (301, 302, 303, 307, 308)
+    max_redirect = 5
+
+    def __init__(self, timeout=None, backoff_base=None, backoff_max=None, requests_per_second=None):
+        self.timeout = fetch_timeout if timeout is None else timeout
+        self.backoff_base = fetch_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = fetch_backoff_max if backoff_max is None else backoff_max
+        if requests_per_second is None:
+            requests_per_second = fetch_requests_per_host
+        self.limiter = HostRateLimiter(requests_per_second)
+        self.local = threading.local()
+        self.log_lock = threading.Lock()
+        self.request_log = []
+
+    def get_connection(self, scheme, netloc):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        connection = self.local.connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == 'https':
+                connection = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            self.local.connections[(scheme, netloc)] = connection
+        return connection
+
+    def drop_connection(self, scheme, netloc):
+        connection = self.local.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def parse_retry_after(self, value):
+        # Retry-After is either a number of seconds or an HTTP date
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_date.timestamp() - time.time())
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+
+    def send(self, req_url):
+        # Send a single GET request and return (status, headers, body)
+        url_split = urllib.parse.urlsplit(req_url)
+        path = url_split.path or '/'
+        if url_split.query:
+            path = path + '?' + url_split.query
+        connection = self.get_connection(url_split.scheme, url_split.netloc)
+        try:
+            connection.request('GET', path, headers={'Connection': 'keep-alive', 'User-Agent': 'ISCA-2021-Script'})
+            response = connection.getresponse()
+            body = response.read()
+        except Exception:
+            # The connection may be half-closed, open a new one on the next attempt
+            self.drop_connection(url_split.scheme, url_split.netloc)
+            raise
+        if response.will_close:
+            self.drop_connection(url_split.scheme, url_split.netloc)
+        return response.status, response.headers, body
+
+    def get(self, req_url, retry_num=2):
+        start_time = time.monotonic()
+        attempt = 0
+        status = None
+        redirect_num = 0
+        try:
+            while True:
+                retry_after = None
+                self.limiter.wait(req_url)
+                try:
+                    status, headers, body = self.send(req_url)
+                except (OSError, http.client.HTTPException):
+                    if attempt >= retry_num:
+                        raise
+                else:
+                    if status in self.redirect_status and redirect_num < self.max_redirect:
+                        req_url = urllib.parse.urljoin(req_url, headers.get('Location', ''))
+                        redirect_num = redirect_num + 1
+                        continue
+                    if status < 400:
+                        return body
+                    if status not in self.retry_status or attempt >= retry_num:
+                        raise urllib.error.HTTPError(req_url, status, 'DBLP returned HTTP %d' % (status), headers, None)
+                    retry_after = self.parse_retry_after(headers.get('Retry-After'))
+                time.sleep(self.backoff_delay(attempt, retry_after))
+                attempt = attempt + 1
+        finally:
+            latency = time.monotonic() - start_time
+            with self.log_lock:
+                self.request_log.append({'url': req_url, 'status': status, 'attempts': attempt + 1, 'latency': latency})
+
+    def summary(self):
+        with self.log_lock:
+            request_log = list(self.request_log)
+        latency_list = [entry['latency'] for entry in request_log]
+        return \
+        {
+            "requests"      : len(request_log),
+            "retries"       : sum(entry['attempts'] - 1 for entry in request_log),
+            "failures"      : sum(1 for entry in request_log if entry['status'] is None or entry['status'] >= 400),
+            "total_latency" : sum(latency_list),
+            "max_latency"   : max(latency_list) if latency_list else 0.0
+        }
+
+# The client is created on first use so that the settings above can be changed beforehand
+http_client = None
+http_client_lock = threading.Lock()
+
+def get_http_client():
+    global http_client
+    with http_client_lock:
+        if http_client is None:
+            http_client = DBLPHttpClient()
+    return http_client
+
+#%% Function to fetch a batch of requests concurrently
+## requests is a list of (req_url, req_hash) and fetch_function is called as
+## fetch_function(req_url, req_hash) from the worker threads. The same URL is only fetched once.
+## The results are returned in the same order as the requests. The number of requests per second
+## to each host is limited by the shared HTTP client.
+## If progress is given (description), a progress bar with ETA over the unique requests is shown.
+@timed()
+def run_fetch_pool(requests, fetch_function, max_workers=None, progress=None):
+    if max_workers is None:
+        max_workers = fetch_max_workers
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for req_url, req_hash in requests:
+            if req_url not in futures:
+                futures[req_url] = pool.submit(fetch_function, req_url, req_hash)
+        if progress is not None:
+            for future in tqdm.tqdm(as_completed(futures.values()), total=len(futures), desc=progress):
+                pass
+        results = [futures[req_url].result() for req_url, req_hash in requests]
+    return results
+
+#%% Function to construct DBLP Person ID query
+# Return the request URL and its hash that is used as the cache key
+def author_key_query(firstname, lastname, outputtype='json'):
     # Define the DBLP API URL to retrieve the autor
-    api_url = 'https://dblp.org/search/author/api?'
+    api_url = dblp_author_api_url
     # Define the format, currently it is json
     format_url= ('format=%s' % (outputtype))
     # If firstname consists of multiple words, then use only the first word
@@ -37,29 +258,65 @@ def request_author_key(firstname, lastname, retry_num=2, outputtype='json'):
     req_query = ('q=$%s$+$%s$' % (urllib.parse.quote(req_firstname), urllib.parse.quote(req_lastname)))
     req_url = ('%s%s&%s' % (api_url, req_query, format_url))
     req_hash= hashlib.sha256(req_query.encode('utf-8')).hexdigest()
+    return req_url, req_hash
+
+#%% Function to load cached DBLP Person ID (return None if not cached)
+def load_author_key_cache(req_hash):
+    json_str = get_cache().get('person_id', req_hash)
+    if json_str is not None:
+        return json.loads(json_str)
+    return None
+
+#%% Function to fetch DBLP Person ID from DBLP API and cache it
+def fetch_author_key(req_url, req_hash, retry_num=2):
+    # Try to fetch author data using DBLP API
+    raw_str = get_http_client().get(req_url, retry_num)
+    # Sanitize string
+    decoded_string = raw_str.decode('utf-8')
+    # Convert JSON to Python Dictionary
+    json_dict = json.loads(decoded_string)
+    # cache
+    get_cache().put('person_id', req_hash, decoded_string)
+    return json_dict
 
+#%% Function to Retrieve DBLP Person ID
+## This function is used to retrieve DBLP Person ID using DBLP API based on Person Name
+## Since there is a possibility that multiple people own same name, the function will return
+## JSON file that contains all possible people.
+def request_author_key(firstname, lastname, retry_num=2, outputtype='json'):
+    if dblp_backend == 'dump':
+        return get_dump_index().search_author(firstname, lastname)
+    req_url, req_hash = author_key_query(firstname, lastname, outputtype)
     # Check if the request is already cached:
-    if os.path.isfile('.cache/person_id/'+req_hash+'.json'):
-        with open('.cache/person_id/'+req_hash+'.json', 'r') as fp:
-            json_dict = json.load(fp)
-    else:
-        # Try to fetch author data using DBLP API
-        resource = urllib.request.urlopen(req_url)
-        # Get the JSON data
-        raw_str = resource.read()
-        # Sanitize string
-        decoded_string = raw_str.decode('utf-8')
-        #decoded_string = unidecode.unidecode(html.unescape(raw_str.decode('utf-8')))
-        # Convert JSON to Python Dictionary
-        #try:
-        json_dict = json.loads(decoded_string)
-        # cache
-        with open('.cache/person_id/'+req_hash+'.json', 'w') as fp:
-            json.dump(json_dict, fp)
-        #except:
-        #    print(raw_str)
+    json_dict = load_author_key_cache(req_hash)
+    if json_dict is None:
+        json_dict = fetch_author_key(req_url, req_hash, retry_num)
     return json_dict
 
+#%% Function to Retrieve DBLP Person ID for a batch of names
+## names is a list of (firstname, lastname). Cached names are served directly while the rest
+## are fetched concurrently. The JSON dictionaries are returned in the same order as names.
+@timed()
+def request_author_key_batch(names, retry_num=2, outputtype='json', max_workers=None):
+    if dblp_backend == 'dump':
+        return [get_dump_index().search_author(firstname, lastname) for firstname, lastname in names]
+    json_dict_list = [None] * len(names)
+    pending_index = []
+    pending_requests = []
+    for index, (firstname, lastname) in enumerate(names):
+        req_url, req_hash = author_key_query(firstname, lastname, outputtype)
+        json_dict = load_author_key_cache(req_hash)
+        if json_dict is None:
+            pending_index.append(index)
+            pending_requests.append((req_url, req_hash))
+        else:
+            json_dict_list[index] = json_dict
+    if pending_requests:
+        fetched = run_fetch_pool(pending_requests, functools.partial(fetch_author_key, retry_num=retry_num), max_workers)
+        for index, json_dict in zip(pending_index, fetched):
+            json_dict_list[index] = json_dict
+    return json_dict_list
+
 #%% Function to merge affiliation
 # DBLP may return multiple affiliations. This function will merge all affiliation into a list of string
 def merge_affiliation(pc_json, entrynum):
@@ -173,70 +430,397 @@ def filter_affiliation(pc_member_dblp_list, confidence_threshold=80):
     return pc_member_dblp_list_filtered
 
 
-#%% Function to retrieve PC member's all publications from DBLP
-def request_publication_list(dblp_link, retry_num=2, outputtype='xml'):
-    if not os.path.exists('.cache'):
-        os.makedirs('.cache')
-    if not os.path.exists('.cache/pub_id'):
-        os.makedirs('.cache/pub_id')
+#%% Function to compute fuzzy match scores for a batch of string pairs
+## Returns the fuzzy match score (0-100) between string_1_list[i] and string_2_list[i] for each i.
+## scorer is the name of the fuzzy match function (e.g., 'ratio' or 'partial_ratio').
+@timed()
+def batch_fuzzy_score(string_1_list, string_2_list, scorer='ratio'):
+    if len(string_1_list) == 0:
+        return []
+    if fuzzy_backend == 'rapidfuzz' and rapidfuzz_process is not None:
+        rapidfuzz_scorer = getattr(rapidfuzz_fuzz, scorer)
+        if hasattr(rapidfuzz_process, 'cpdist'):
+            score_list = rapidfuzz_process.cpdist(string_1_list, string_2_list, scorer=rapidfuzz_scorer, workers=-1)
+        else:
+            # cpdist needs rapidfuzz 3.6 or newer, older versions score the pairs one by one
+            score_list = [rapidfuzz_scorer(string_1, string_2) for string_1, string_2 in zip(string_1_list, string_2_list)]
+        return [int(round(float(score))) for score in score_list]
+    fuzz_scorer = getattr(fuzz, scorer)
+    return [fuzz_scorer(string_1, string_2) for string_1, string_2 in zip(string_1_list, string_2_list)]
+
+#%% Function to score the name and affiliation of every candidate
+## pc_member_dblp_lists is a list of the output of convert_to_dict (one list per PC member).
+## The name and affiliation scores of every candidate of every PC member are computed once, in two
+## batches. Returns, for each PC member, a list of (name score, affiliation score) for each candidate.
+## The affiliation score is None if DBLP does not have the affiliation of the candidate.
+## PC members with a single candidate are not scored since there is nothing to filter.
+def score_candidates(pc_member_dblp_lists):
+    name_string_1 = []
+    name_string_2 = []
+    affl_string_1 = []
+    affl_string_2 = []
+    affl_owner = []
+    for list_index, pc_member_dblp_list in enumerate(pc_member_dblp_lists):
+        if len(pc_member_dblp_list) <= 1:
+            continue
+        for entry_index, pc_member_dict in enumerate(pc_member_dblp_list):
+            name_string_1.append(pc_member_dict['full_name'].lower())
+            name_string_2.append(pc_member_dict['name_dblp'].lower())
+            affiliation = pc_member_dict['affiliation']
+            affiliation = affiliation.lower() if isinstance(affiliation, str) else ''
+            for affiliation_dblp in pc_member_dict['affiliation_dblp']:
+                affl_string_1.append(affiliation)
+                affl_string_2.append(affiliation_dblp.lower())
+                affl_owner.append((list_index, entry_index))
+    name_score_list = iter(batch_fuzzy_score(name_string_1, name_string_2, 'ratio'))
+    affl_score_list = batch_fuzzy_score(affl_string_1, affl_string_2, 'partial_ratio')
+
+    # Highest affiliation score of each candidate
+    affl_max_dict = {}
+    for owner, affl_score in zip(affl_owner, affl_score_list):
+        affl_max_dict[owner] = max(affl_max_dict.get(owner, 0), affl_score)
+
+    candidate_score_lists = []
+    for list_index, pc_member_dblp_list in enumerate(pc_member_dblp_lists):
+        candidate_score_list = []
+        if len(pc_member_dblp_list) > 1:
+            for entry_index, pc_member_dict in enumerate(pc_member_dblp_list):
+                candidate_score_list.append((next(name_score_list), affl_max_dict.get((list_index, entry_index))))
+        candidate_score_lists.append(candidate_score_list)
+    return candidate_score_lists
+
+#%% Function to select the best candidates based on the scores
+## This gives the same result as filtering by name with the highest confidence level, then gradually
+## reducing the confidence level until at least one candidate comes up (filter_name), followed by
+## filter_affiliation: only the candidates with the highest name score are kept, then those whose
+## affiliation matches (or whose affiliation is not available on DBLP) if there is any.
+def select_candidates(pc_member_dblp_list, candidate_score_list, affl_confidence_threshold=80):
+    if len(pc_member_dblp_list) <= 1:
+        return pc_member_dblp_list
+    best_name_score = max(name_score for name_score, affl_score in candidate_score_list)
+    selected_list = []
+    for pc_member_dict, (name_score, affl_score) in zip(pc_member_dblp_list, candidate_score_list):
+        if name_score == best_name_score:
+            pc_member_dict['name_confidence'] = name_score
+            selected_list.append((pc_member_dict, affl_score))
+    if len(selected_list) == 1:
+        return [selected_list[0][0]]
+
+    # Filtering by Affiliation
+    affl_selected_list = []
+    for pc_member_dict, affl_score in selected_list:
+        if affl_score is None:
+            # inconclusive filtering since affiliation information is not available on DBLP
+            affl_selected_list.append(pc_member_dict)
+        elif affl_score >= affl_confidence_threshold:
+            pc_member_dict['affl_confidence'] = affl_score
+            affl_selected_list.append(pc_member_dict)
+    if len(affl_selected_list) > 0:
+        return affl_selected_list
+    return [pc_member_dict for pc_member_dict, affl_score in selected_list]
+
+#%% Function to select the best candidates for every PC member
+@timed()
+def resolve_candidates(pc_member_dblp_lists, affl_confidence_threshold=80):
+    candidate_score_lists = score_candidates(pc_member_dblp_lists)
+    return [select_candidates(pc_member_dblp_list, candidate_score_list, affl_confidence_threshold)
+            for pc_member_dblp_list, candidate_score_list in zip(pc_member_dblp_lists, candidate_score_lists)]
+
+#%% Function to construct DBLP publication list query
+# Return the request URL and its hash that is used as the cache key
+def publication_list_query(dblp_link):
     # Construct the query, please refer to https://dblp.org/faq/1474589.html
     req_url = ('%s.xml' % (dblp_link))
     req_hash= hashlib.sha256(req_url.encode('utf-8')).hexdigest()
-    # Cache
-    if os.path.isfile('.cache/pub_id/'+req_hash):
-        with open('.cache/pub_id/'+req_hash, 'r') as fp:
-            xml_dict = xmltodict.parse(fp.read(), dict_constructor=dict)
-    else:
-        # Try to fetch author data using DBLP API
-        resource = urllib.request.urlopen(req_url)
-        # Get the XML data
-        raw_str = resource.read()
-        # Sanitize string
-        decoded_string = raw_str.decode('utf-8')
-        # Convert XML to Python Dictionary
-        xml_dict = xmltodict.parse(decoded_string, dict_constructor=dict)
-        with open('.cache/pub_id/'+req_hash, 'w') as fp:
-            fp.write(xmltodict.unparse(xml_dict))
-    return xml_dict
+    return req_url, req_hash
+
+#%% Function to load cached DBLP person XML (return None if not cached)
+## The XML is cached exactly as returned by DBLP
+def load_person_xml_cache(req_hash):
+    return get_cache().get('pub_id', req_hash)
+
+#%% Function to fetch DBLP person XML and cache it
+def fetch_person_xml(req_url, req_hash, retry_num=2):
+    # Try to fetch author data using DBLP API
+    raw_str = get_http_client().get(req_url, retry_num)
+    # Sanitize string
+    decoded_string = raw_str.decode('utf-8')
+    get_cache().put('pub_id', req_hash, decoded_string)
+    return decoded_string
+
+#%% Function to retrieve DBLP person XML
+def request_person_xml(dblp_link, retry_num=2):
+    if dblp_backend == 'dump':
+        return person_record_to_xml(get_dump_index().person_record(dblp_link_to_pid(dblp_link)))
+    req_url, req_hash = publication_list_query(dblp_link)
+    xml_str = load_person_xml_cache(req_hash)
+    if xml_str is None:
+        xml_str = fetch_person_xml(req_url, req_hash, retry_num)
+    return xml_str
 
 #%% Function to retrieve PC member's all publications from DBLP
+## The full XML document is converted to Python Dictionary.
+## Use request_person_record if only the co-authors or the affiliation are needed.
+def request_publication_list(dblp_link, retry_num=2, outputtype='xml'):
+    xml_str = request_person_xml(dblp_link, retry_num)
+    # Convert XML to Python Dictionary
+    xml_dict = xmltodict.parse(xml_str, dict_constructor=dict)
+    return xml_dict
+
+#%% Function to retrieve all publications for a batch of DBLP links
+## Cached links are served directly while the rest are fetched concurrently.
+## The dictionaries are returned in the same order as dblp_links.
+@timed()
+def request_publication_list_batch(dblp_links, retry_num=2, outputtype='xml', max_workers=None):
+    if dblp_backend == 'dump':
+        return [request_publication_list(dblp_link, retry_num, outputtype) for dblp_link in dblp_links]
+    xml_str_list = [None] * len(dblp_links)
+    pending_index = []
+    pending_requests = []
+    for index, dblp_link in enumerate(dblp_links):
+        req_url, req_hash = publication_list_query(dblp_link)
+        xml_str = load_person_xml_cache(req_hash)
+        if xml_str is None:
+            pending_index.append(index)
+            pending_requests.append((req_url, req_hash))
+        else:
+            xml_str_list[index] = xml_str
+    if pending_requests:
+        fetched = run_fetch_pool(pending_requests, functools.partial(fetch_person_xml, retry_num=retry_num), max_workers)
+        for index, xml_str in zip(pending_index, fetched):
+            xml_str_list[index] = xml_str
+    return [xmltodict.parse(xml_str, dict_constructor=dict) for xml_str in xml_str_list]
+
+#%% Function to get DBLP Person ID from DBLP link
+# e.g., https://dblp.org/pid/75/912 -> 75/912
+def dblp_link_to_pid(dblp_link):
+    if '/pid/' in dblp_link:
+        return dblp_link.split('/pid/', 1)[1]
+    return dblp_link
+
+#%% Function to stream publications from DBLP person XML
+## The XML is parsed incrementally and each publication is yielded as (year, author pids, author names).
+## Editors are used if the publication does not have any author. Publications older than
+## threshold_year are skipped and every element is discarded as soon as it has been read, so the
+## whole document is never kept in memory. If person_info is a dictionary, it is filled with the
+## pid, name and affiliation notes of the person.
+## xml_source can be a string, a file name, or a file object opened in binary mode.
+def iter_person_publications(xml_source, threshold_year=None, person_info=None):
+    if isinstance(xml_source, str) and xml_source.lstrip().startswith('<'):
+        xml_source = io.BytesIO(xml_source.encode('utf-8'))
+    depth = 0
+    root = None
+    section = None
+    authors = []
+    editors = []
+    year = 0
+    for event, elem in ET.iterparse(xml_source, events=('start', 'end')):
+        if event == 'start':
+            depth = depth + 1
+            if depth == 1:
+                root = elem
+                if person_info is not None:
+                    person_info['pid'] = elem.get('pid', '')
+                    person_info['name'] = elem.get('name', '')
+                    person_info.setdefault('affiliations', [])
+            elif depth == 2:
+                section = elem.tag
+            elif depth == 3 and section == 'r':
+                authors = []
+                editors = []
+                year = 0
+            continue
+
+        if section == 'r' and depth == 4:
+            # author, editor, and year of the publication
+            if elem.tag == 'author':
+                authors.append((elem.get('pid'), elem.text or ''))
+            elif elem.tag == 'editor':
+                editors.append((elem.get('pid'), elem.text or ''))
+            elif elem.tag == 'year':
+                year = int(elem.text) if elem.text else 0
+            elem.clear()
+        elif section == 'r' and depth == 3:
+            # end of the publication
+            if threshold_year is None or year >= threshold_year:
+                if not authors:
+                    authors = editors
+                authors = [author for author in authors if author[0]]
+                yield (year, tuple(author[0] for author in authors), tuple(author[1] for author in authors))
+            elem.clear()
+        elif section == 'person' and depth == 3:
+            if elem.tag == 'note' and elem.get('type') == 'affiliation' and elem.text and person_info is not None:
+                person_info['affiliations'].append(elem.text)
+        elif depth == 2:
+            # drop the finished section (person, r, coauthors) from the root
+            section = None
+            root.clear()
+        depth = depth - 1
+
+#%% Function to extract person record from DBLP person XML
+## The person record only keeps what the scripts need from the DBLP person XML:
+##   pid            : DBLP Person ID
+##   name           : name of the person on DBLP
+##   affiliations   : list of affiliation notes
+##   publications   : list of (year, author pids, author names) for each publication.
+##                    Editors are used if the publication does not have any author.
+##   threshold_year : publications older than this year are not kept (None keeps all publications)
+@timed()
+def parse_person_record(xml_str, threshold_year=None):
+    person_record = {'pid': '', 'name': '', 'affiliations': []}
+    if threshold_year == affiliation_only_year:
+        # Stop right after the person section, the publications are not needed
+        publication_list = []
+        for publication in iter_person_publications(xml_str, None, person_record):
+            break
+    else:
+        publication_list = list(iter_person_publications(xml_str, threshold_year, person_record))
+    person_record['publications'] = publication_list
+    person_record['threshold_year'] = threshold_year
+    return person_record
+
+#%% Function to convert person record back to DBLP person XML
+## Used by the offline backend so that request_publication_list returns the same structure
+def person_record_to_xml(person_record):
+    root = ET.Element('dblpperson', {'name': person_record['name'], 'pid': person_record['pid'], 'n': str(len(person_record['publications']))})
+    person = ET.SubElement(root, 'person', {'key': 'homepages/' + person_record['pid']})
+    ET.SubElement(person, 'author', {'pid': person_record['pid']}).text = person_record['name']
+    for affiliation in person_record['affiliations']:
+        ET.SubElement(person, 'note', {'type': 'affiliation'}).text = affiliation
+    for year, author_pids, author_names in person_record['publications']:
+        bib = ET.SubElement(ET.SubElement(root, 'r'), 'article')
+        for author_pid, author_name in zip(author_pids, author_names):
+            ET.SubElement(bib, 'author', {'pid': author_pid}).text = author_name
+        ET.SubElement(bib, 'year').text = str(year)
+    return ET.tostring(root, encoding='unicode')
+
+#%% Function to check whether a person record contains the requested publications
+def person_record_covers(person_record, threshold_year):
+    record_threshold_year = person_record.get('threshold_year')
+    if record_threshold_year is None:
+        return True
+    return threshold_year is not None and record_threshold_year <= threshold_year
+
+#%% Person record store
+## Each DBLP person XML is parsed only once. The person records are kept in memory (keyed by DBLP
+## Person ID) and stored in the DBLP cache (s00_cache.py) so that the next run does not need to parse the
+## XML again. The same store is used for co-authors (s02) and affiliations (s04).
+## A record that was built with a threshold_year only contains the newer publications; it is
+## rebuilt from the cached XML if older publications are requested later.
+class PersonRecordStore:
+    def __init__(self):
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def load_record_cache(self, req_hash):
+        json_str = get_cache().get('person_record', req_hash)
+        if json_str is not None:
+            person_record = json.loads(json_str)
+            person_record['publications'] = [(year, tuple(pids), tuple(names)) for year, pids, names in person_record['publications']]
+            return person_record
+        return None
+
+    def save_record_cache(self, req_hash, person_record):
+        # The record keeps the creation time of its XML so that it expires together with the XML
+        get_cache().put('person_record', req_hash, json.dumps(person_record), created=get_cache().created('pub_id', req_hash))
+
+    def build_record(self, req_hash, xml_str, threshold_year=None):
+        person_record = parse_person_record(xml_str, threshold_year)
+        self.save_record_cache(req_hash, person_record)
+        return person_record
+
+    def lookup(self, dblp_link, threshold_year=None):
+        # Return the person record from memory or disk (return None if it has to be fetched)
+        pid = dblp_link_to_pid(dblp_link)
+        if dblp_backend == 'dump':
+            # The index is fast enough, no need to keep the record
+            return get_dump_index().person_record(pid, threshold_year, threshold_year != affiliation_only_year)
+        with self.lock:
+            person_record = self.records.get(pid)
+        if person_record is not None and person_record_covers(person_record, threshold_year):
+            return person_record
+        req_url, req_hash = publication_list_query(dblp_link)
+        person_record = self.load_record_cache(req_hash)
+        if person_record is None or not person_record_covers(person_record, threshold_year):
+            person_record = None
+            xml_str = load_person_xml_cache(req_hash)
+            if xml_str is not None:
+                person_record = self.build_record(req_hash, xml_str, threshold_year)
+        if person_record is not None:
+            self.put(pid, person_record)
+        return person_record
+
+    def put(self, pid, person_record):
+        with self.lock:
+            self.records[pid] = person_record
+
+    def fetch(self, req_url, req_hash, retry_num=2, threshold_year=None):
+        xml_str = fetch_person_xml(req_url, req_hash, retry_num)
+        return self.build_record(req_hash, xml_str, threshold_year)
+
+    def get(self, dblp_link, retry_num=2, threshold_year=None):
+        person_record = self.lookup(dblp_link, threshold_year)
+        if person_record is None:
+            req_url, req_hash = publication_list_query(dblp_link)
+            person_record = self.fetch(req_url, req_hash, retry_num, threshold_year)
+            self.put(dblp_link_to_pid(dblp_link), person_record)
+        return person_record
+
+    @timed()
+    def get_batch(self, dblp_links, retry_num=2, max_workers=None, threshold_year=None):
+        # Person records are returned in the same order as dblp_links
+        person_record_list = [None] * len(dblp_links)
+        pending_index = []
+        pending_requests = []
+        for index, dblp_link in enumerate(dblp_links):
+            person_record = self.lookup(dblp_link, threshold_year)
+            if person_record is None:
+                pending_index.append(index)
+                pending_requests.append(publication_list_query(dblp_link))
+            else:
+                person_record_list[index] = person_record
+        if pending_requests:
+            fetch_function = functools.partial(self.fetch, retry_num=retry_num, threshold_year=threshold_year)
+            fetched = run_fetch_pool(pending_requests, fetch_function, max_workers)
+            for index, person_record in zip(pending_index, fetched):
+                self.put(dblp_link_to_pid(dblp_links[index]), person_record)
+                person_record_list[index] = person_record
+        return person_record_list
+
+person_store = PersonRecordStore()
+
+#%% Function to retrieve person record from DBLP
+## Use threshold_year to skip publications older than threshold_year while parsing
+def request_person_record(dblp_link, retry_num=2, threshold_year=None):
+    return person_store.get(dblp_link, retry_num, threshold_year)
+
+#%% Function to retrieve person records for a batch of DBLP links
+def request_person_record_batch(dblp_links, retry_num=2, max_workers=None, threshold_year=None):
+    return person_store.get_batch(dblp_links, retry_num, max_workers, threshold_year)
+
+#%% Function to retrieve the affiliation of a person from DBLP
 def request_affiliation(dblp_link, retry_num=2, outputtype='xml'):
-    if not os.path.exists('.cache'):
-        os.makedirs('.cache')
-    if not os.path.exists('.cache/pub_id'):
-        os.makedirs('.cache/pub_id')
-    # Construct the query, please refer to https://dblp.org/faq/1474589.html
-    req_url = ('%s.xml' % (dblp_link))
-    req_hash= hashlib.sha256(req_url.encode('utf-8')).hexdigest()
     # Try to fetch author data using DBLP API
     try:
-        if os.path.isfile('.cache/pub_id/'+req_hash):
-            with open('.cache/pub_id/'+req_hash, 'r') as fp:
-                xml_dict = xmltodict.parse(fp.read(), dict_constructor=dict)
+        person_record = request_person_record(dblp_link, retry_num, affiliation_only_year)
+        if person_record['affiliations']:
+            affiliation_str = ','.join(person_record['affiliations']) + ' <DBLP>'
         else:
-            resource = urllib.request.urlopen(req_url)
-            # Get the JSON data
-            raw_str = resource.read()
-            # Sanitize string
-            decoded_string = raw_str.decode('utf-8')
-            # Convert XML to Python Dictionary
-            xml_dict = xmltodict.parse(decoded_string, dict_constructor=dict)
-            with open('.cache/pub_id/'+req_hash, 'w') as fp:
-                fp.write(xmltodict.unparse(xml_dict))
-
-        affiliation_list=[]
-        affiliation_str = ''
-        try:
-            notes = xml_dict['dblpperson']['person']['note']
-            if(isinstance(notes,dict)):
-                notes = [notes]
-            for note in notes:
-                if (note['@type']=='affiliation'):
-                    affiliation_list.append(note['#text'])
-            affiliation_str=','.join(affiliation_list)
-            affiliation_str= affiliation_str + ' <DBLP>'
-        except:
             affiliation_str = 'NONE <DBLP>'
     except:
         affiliation_str = 'NONE <DBLP>'
-    return affiliation_str
\ No newline at end of file
+    return affiliation_str
+
+#%% Function to retrieve the affiliations of a batch of persons from DBLP
+## Each DBLP Person ID is only looked up once, even if it appears many times in dblp_links
+## (e.g., a student shared by several PC members). The lookups are done concurrently.
+## Returns a dictionary of DBLP Person ID to affiliation string (see request_affiliation).
+@timed()
+def request_affiliation_batch(dblp_links, retry_num=2, max_workers=None, progress=None):
+    unique_links = {}
+    for dblp_link in dblp_links:
+        unique_links.setdefault(dblp_link_to_pid(dblp_link), dblp_link)
+    requests = [(dblp_link, pid) for pid, dblp_link in unique_links.items()]
+    fetch_function = lambda dblp_link, pid: request_affiliation(dblp_link, retry_num)
+    affiliation_list = run_fetch_pool(requests, fetch_function, max_workers, progress)
+    return dict(zip(unique_links.keys(), affiliation_list))
@@ -0,0 +1,101 @@
+# Project: ISCA 2021 Script
+# Filename: s00_incremental.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Incremental Mode Functions for ISCA 2021 Script
+# Description:
+## This script contains the functions used by s01-s04 to only process the PC members whose inputs
+## have changed since the previous run. Each script stores a fingerprint of the inputs of every
+## PC member (identified by the HotCRP email) next to its output. On the next run, only the PC
+## members with a new or different fingerprint are processed, and the other PC members are
+## taken from the previous output.
+##
+## A fingerprint has two parts:
+##   input      : the input row(s) of the PC member and the settings used by the script
+##   dependency : the DBLP records the result depends on (None if it is not known without
+##                sending requests to DBLP, in which case only the input part is compared)
+
+#%% Import some libraries that are needed
+import os
+import json
+import hashlib
+import pandas as pd
+from s00_function import person_store
+
+#%% Function to compute the fingerprint of some values
+## The values must be JSON serializable (other types are converted to string)
+def fingerprint(*values):
+    json_str = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(json_str.encode('utf-8')).hexdigest()
+
+#%% Function to get the fingerprint filename of an output file
+def fingerprint_filename(output_filename):
+    return output_filename + '.fingerprint.json'
+
+#%% Function to load the fingerprints saved by the previous run
+## Returns an empty dictionary if the previous output or its fingerprints do not exist.
+def load_fingerprints(output_filename):
+    filename = fingerprint_filename(output_filename)
+    if not os.path.exists(output_filename) or not os.path.exists(filename):
+        return {}
+    with open(filename, encoding='utf-8') as fingerprint_file:
+        return json.load(fingerprint_file)
+
+#%% Function to save the fingerprints of this run
+def save_fingerprints(output_filename, fingerprint_dict):
+    with open(fingerprint_filename(output_filename), 'w', encoding='utf-8') as fingerprint_file:
+        json.dump(fingerprint_dict, fingerprint_file, indent=1, sort_keys=True)
+
+#%% Function to find the PC members that need to be processed
+## fingerprint_dict is a dictionary of email to {'input': ..., 'dependency': ...} of this run.
+## Returns the set of emails whose fingerprint is new or different from the previous run.
+def changed_keys(fingerprint_dict, previous_fingerprint_dict):
+    changed = set()
+    for key, current in fingerprint_dict.items():
+        previous = previous_fingerprint_dict.get(key)
+        if previous is None or previous['input'] != current['input']:
+            changed.add(key)
+        elif current['dependency'] is not None and previous['dependency'] != current['dependency']:
+            changed.add(key)
+    return changed
+
+#%% Function to fill the unknown dependency fingerprints from the previous run
+## A PC member that is not processed keeps the dependency fingerprint of the previous run.
+def carry_fingerprints(fingerprint_dict, previous_fingerprint_dict, changed):
+    for key, current in fingerprint_dict.items():
+        if key not in changed and current['dependency'] is None and key in previous_fingerprint_dict:
+            current['dependency'] = previous_fingerprint_dict[key]['dependency']
+    return fingerprint_dict
+
+#%% Function to compute the fingerprint of the DBLP records of a PC member
+## Only the records that are already in the cache are used (no request is sent to DBLP).
+## field is the part of the records used ('publications' for s02, 'affiliations' for s04).
+## Returns None if one of the records is not in the cache (or not in the index of the DBLP dump).
+def person_records_fingerprint(dblp_links, threshold_year=None, field='publications'):
+    value_list = []
+    for dblp_link in dblp_links:
+        try:
+            person_record = person_store.lookup(dblp_link, threshold_year)
+        except KeyError:
+            # The dump backend raises KeyError for an unknown pid, the PC member is then
+            # processed again (and the error is reported by the script if the pid is still missing)
+            return None
+        if person_record is None:
+            return None
+        value_list.append(person_record[field])
+    return fingerprint(value_list)
+
+#%% Function to merge the new result with the previous output
+## The rows of the PC members that were processed are taken from new_df, the rows of the other
+## PC members are taken from previous_df. PC members that are no longer in key_order are removed.
+## The rows are sorted following key_order (the order of the PC members in the input).
+def merge_incremental(previous_df, new_df, key_column, key_order, changed):
+    key_rank = {key: rank for rank, key in enumerate(dict.fromkeys(key_order))}
+    kept_df = previous_df[previous_df[key_column].map(lambda key: key in key_rank and key not in changed)]
+    merged_df = pd.concat([kept_df, new_df], ignore_index=True)
+    merged_df = merged_df.iloc[merged_df[key_column].map(key_rank).argsort(kind='stable')]
+    return merged_df.reset_index(drop=True)
+
+#%% Function to print the summary of an incremental run
+def print_incremental_summary(changed, total):
+    print('Incremental mode: %d of %d PC members changed' % (len(changed), total))
@@ -0,0 +1,209 @@
+# Project: ISCA 2021 Script
+# Filename: s00_instrument.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Run Instrumentation for ISCA 2021 Script
+# Description:
+## This script contains the instrumentation used by the s01-s08 scripts to tell where the time of
+## a run goes. Each script calls start_run_report() after its imports and write_run_report() at the
+## end, which writes a JSON run report next to its outputs with:
+## - the wall time of the script and its peak memory (RSS),
+## - the number of calls and the total time of the hot functions (decorated with @timed); the time
+##   of a function includes the time of the functions it calls,
+## - the DBLP requests (count, retries, failures, and latency) if any request was sent,
+## - the hit ratio of the caches (DBLP cache in .cache, person records, papers) from the counters,
+## - optionally, a profile of the whole script (cProfile or pyinstrument).
+## The profiler is selected with profiler below or with the ISCA_PROFILE environment variable, e.g.:
+##   ISCA_PROFILE=cprofile python s00_pipeline.py run s03 --force
+## The cProfile statistics are saved next to the run report (.prof, open it with pstats or snakeviz)
+## and the most expensive functions are listed in the report; pyinstrument saves an HTML page.
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import platform
+import functools
+import threading
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory is then not reported
+    resource = None
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+#%% Define instrumentation settings
+# Profiler run around each script: None, 'cprofile', or 'pyinstrument' (pip install pyinstrument)
+profiler = os.environ.get('ISCA_PROFILE') or None
+# Number of functions listed in the run report by cProfile (sorted by cumulative time)
+profile_top_functions = 25
+
+#%% Counters and timers of the current run
+## The functions can be called from the fetch pool threads, so every update takes the lock.
+class RunReport:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, stage=None):
+        with self.lock:
+            self.stage = stage
+            self.start_time = time.perf_counter()
+            self.start_date = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.timings = {}
+            self.counters = {}
+            self.profiler = None
+
+    def add_timing(self, name, seconds):
+        with self.lock:
+            timing = self.timings.setdefault(name, [0, 0.0])
+            timing[0] = timing[0] + 1
+            timing[1] = timing[1] + seconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+run_report = RunReport()
+
+#%% Decorator to time a hot function
+## The name defaults to module.function (module.class.method for methods).
+def timed(name=None):
+    def decorator(function):
+        timing_name = name or '%s.%s' % (function.__module__, function.__qualname__)
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                run_report.add_timing(timing_name, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+#%% Function to increase a counter
+## The cache counters are named 'cache.<kind>.hit' and 'cache.<kind>.miss'.
+def count(name, value=1):
+    run_report.count(name, value)
+
+#%% Function to get the peak memory (RSS) of the process in MB
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak_rss / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0), 1)
+
+#%% Function to start the run report of a script
+## Resets the counters (so a script can be run again from an IDE) and starts the profiler.
+def start_run_report(stage):
+    run_report.reset(stage)
+    if profiler == 'cprofile':
+        run_report.profiler = cProfile.Profile()
+        run_report.profiler.enable()
+    elif profiler == 'pyinstrument':
+        if pyinstrument is None:
+            print('pyinstrument is not installed, the run is not profiled')
+        else:
+            run_report.profiler = pyinstrument.Profiler()
+            run_report.profiler.start()
+
+#%% Function to stop the profiler and save its output
+## Returns the profile part of the run report.
+def stop_profiler(report_filename):
+    profile_dict = {"profiler": profiler}
+    if isinstance(run_report.profiler, cProfile.Profile):
+        run_report.profiler.disable()
+        profile_filename = os.path.splitext(report_filename)[0] + '.prof'
+        run_report.profiler.dump_stats(profile_filename)
+        stats = pstats.Stats(profile_filename)
+        function_list = []
+        for (filename, line, function), (primitive_calls, calls, total_time, cumulative_time, callers) in stats.stats.items():
+            function_dict = \
+            {
+                "function"   : '%s:%d(%s)' % (os.path.basename(filename), line, function),
+                "calls"      : calls,
+                "tottime"    : round(total_time, 4),
+                "cumtime"    : round(cumulative_time, 4)
+            }
+            function_list.append(function_dict)
+        function_list.sort(key=lambda function_dict: function_dict['cumtime'], reverse=True)
+        profile_dict['output'] = profile_filename
+        profile_dict['functions'] = function_list[:profile_top_functions]
+    elif pyinstrument is not None and isinstance(run_report.profiler, pyinstrument.Profiler):
+        run_report.profiler.stop()
+        profile_filename = os.path.splitext(report_filename)[0] + '.html'
+        with open(profile_filename, 'w', encoding='utf-8') as profile_file:
+            profile_file.write(run_report.profiler.output_html())
+        profile_dict['output'] = profile_filename
+    run_report.profiler = None
+    return profile_dict
+
+#%% Function to summarize the cache counters
+## Returns {kind: {hits, misses, hit_ratio}} from the 'cache.<kind>.hit/miss' counters.
+def cache_summary(counters):
+    result_key = {"hit": 'hits', "miss": 'misses'}
+    cache_dict = {}
+    for name, value in counters.items():
+        part_list = name.split('.')
+        if len(part_list) == 3 and part_list[0] == 'cache' and part_list[2] in result_key:
+            cache_dict.setdefault(part_list[1], {"hits": 0, "misses": 0})[result_key[part_list[2]]] = value
+    for kind_dict in cache_dict.values():
+        total = kind_dict['hits'] + kind_dict['misses']
+        kind_dict['hit_ratio'] = round(kind_dict['hits'] / total, 4) if total else None
+    return cache_dict
+
+#%% Function to get the DBLP request summary (None if no request was sent)
+def http_summary():
+    # s00_function is only loaded by the DBLP scripts, do not load it for the others
+    function_module = sys.modules.get('s00_function')
+    http_client = getattr(function_module, 'http_client', None)
+    if http_client is None:
+        return None
+    summary = http_client.summary()
+    summary['mean_latency'] = summary['total_latency'] / summary['requests'] if summary['requests'] else 0.0
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in summary.items()}
+
+#%% Function to write the run report of a script
+## extra is a dictionary of additional values of the script (e.g., number of PC members).
+## Returns the run report.
+def write_run_report(report_filename, extra=None):
+    wall_time = time.perf_counter() - run_report.start_time
+    profile_dict = stop_profiler(report_filename) if profiler else None
+    with run_report.lock:
+        timings = dict(run_report.timings)
+        counters = dict(run_report.counters)
+    report_dict = \
+    {
+        "stage"       : run_report.stage,
+        "started"     : run_report.start_date,
+        "wall_time"   : round(wall_time, 4),
+        "peak_rss_mb" : peak_rss_mb(),
+        "python"      : platform.python_version(),
+        "functions"   : {name: {"calls": calls, "seconds": round(seconds, 4)}
+                         for name, (calls, seconds) in sorted(timings.items(), key=lambda item: item[1][1], reverse=True)},
+        "http"        : http_summary(),
+        "cache"       : cache_summary(counters),
+        "counters"    : dict(sorted(counters.items())),
+        "profile"     : profile_dict
+    }
+    if extra:
+        report_dict.update(extra)
+    if os.path.dirname(report_filename):
+        os.makedirs(os.path.dirname(report_filename), exist_ok=True)
+    with open(report_filename, 'w', encoding='utf-8') as report_file:
+        json.dump(report_dict, report_file, indent=1)
+    return report_dict
+
+#%% Function to load a run report (None if it does not exist)
+def load_run_report(report_filename):
+    if not os.path.exists(report_filename):
+        return None
+    with open(report_filename, encoding='utf-8') as report_file:
+        return json.load(report_file)
@@ -0,0 +1,198 @@
+# Project: ISCA 2021 Script
+# Filename: s00_name_match.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Name Matching Functions for ISCA 2021 Script
+# Description:
+## This script contains the functions to fuzzy match two lists of person names quickly.
+## Every name is normalized once (unidecode, lowercase, punctuation removed). Instead of comparing
+## every name against every other name, the candidates are narrowed down using blocking keys
+## (name tokens and their prefixes) and only the surviving pairs are scored, in one batch, using
+## the same scorer as fuzzywuzzy's process.extractOne (WRatio). Since the score is symmetric, the
+## best match of both lists are obtained from the same pass.
+
+#%% Import some libraries that are needed
+import re
+import collections
+import unidecode
+from s00_function import batch_fuzzy_score
+from s00_instrument import timed
+
+#%% Define constant
+# Length of the token prefix used as blocking key (catches typos at the end of a name token)
+blocking_prefix_length = 3
+# Minimum length of a token to be used as blocking key (initials are too common)
+blocking_min_token_length = 2
+
+#%% Function to normalize a person name
+# e.g., 'J\xf6rg M\xfcller (UT Austin)' -> 'jorg muller ut austin'
+def normalize_person_name(name):
+    if not isinstance(name, str):
+        return ''
+    name = unidecode.unidecode(name).lower()
+    name = re.sub(r'[^a-z0-9]+', ' ', name)
+    return name.strip()
+
+#%% Function to compute blocking keys of a normalized name
+## Two names are compared only if they share at least one blocking key
+def blocking_keys(name_norm):
+    keys = set()
+    for token in name_norm.split():
+        if len(token) < blocking_min_token_length:
+            continue
+        keys.add(token)
+        keys.add(token[:blocking_prefix_length] + '*')
+    return keys
+
+#%% Function to find the candidate pairs of two lists of normalized names
+## Returns a list of (index in list a, index in list b) that share a blocking key.
+## If blocking is False, every pair is returned.
+def candidate_pairs(name_norm_list_a, name_norm_list_b, blocking=True):
+    if not blocking:
+        return [(index_a, index_b) for index_a in range(len(name_norm_list_a)) for index_b in range(len(name_norm_list_b))]
+    key_index = {}
+    for index_b, name_norm in enumerate(name_norm_list_b):
+        for key in blocking_keys(name_norm):
+            key_index.setdefault(key, []).append(index_b)
+    pair_list = []
+    for index_a, name_norm in enumerate(name_norm_list_a):
+        candidate_set = set()
+        for key in blocking_keys(name_norm):
+            candidate_set.update(key_index.get(key, []))
+        pair_list.extend((index_a, index_b) for index_b in sorted(candidate_set))
+    return pair_list
+
+#%% Function to score the best match of each name in two lists of names
+## name_list_pairs is a list of (name list a, name list b). For each pair, returns
+## (best score of each name in list a, best score of each name in list b), in which the best score
+## of a name is the highest score against any name of the other list (0 if there is no candidate).
+## This gives the same result as process.extractOne in both directions for the pairs of names that
+## share a blocking key. The candidate pairs of all lists are scored in a single batch.
+def best_match_scores_batch(name_list_pairs, blocking=True):
+    string_a_list = []
+    string_b_list = []
+    owner_list = []
+    for pair_index, (name_list_a, name_list_b) in enumerate(name_list_pairs):
+        name_norm_list_a = [normalize_person_name(name) for name in name_list_a]
+        name_norm_list_b = [normalize_person_name(name) for name in name_list_b]
+        for index_a, index_b in candidate_pairs(name_norm_list_a, name_norm_list_b, blocking):
+            string_a_list.append(name_norm_list_a[index_a])
+            string_b_list.append(name_norm_list_b[index_b])
+            owner_list.append((pair_index, index_a, index_b))
+    score_list = batch_fuzzy_score(string_a_list, string_b_list, 'WRatio')
+
+    best_score_list = [([0] * len(name_list_a), [0] * len(name_list_b)) for name_list_a, name_list_b in name_list_pairs]
+    for (pair_index, index_a, index_b), score in zip(owner_list, score_list):
+        best_score_a, best_score_b = best_score_list[pair_index]
+        if score > best_score_a[index_a]:
+            best_score_a[index_a] = score
+        if score > best_score_b[index_b]:
+            best_score_b[index_b] = score
+    return best_score_list
+
+#%% Function to score the best match of each name in two lists of names
+def best_match_scores(name_list_a, name_list_b, blocking=True):
+    return best_match_scores_batch([(name_list_a, name_list_b)], blocking)[0]
+
+#%% Function to crosscheck pairs of name lists
+## name_list_pairs is a list of (name list a, name list b). For each pair, returns
+## (names only in list a, names only in list b): a name is only in one list if its best match in
+## the other list is lower than confidence_threshold.
+## Returns the index of the names instead of the names if return_index is True.
+@timed()
+def crosscheck_names_batch(name_list_pairs, confidence_threshold=90, blocking=True, return_index=False):
+    crosscheck_list = []
+    best_score_list = best_match_scores_batch(name_list_pairs, blocking)
+    for (name_list_a, name_list_b), (best_score_a, best_score_b) in zip(name_list_pairs, best_score_list):
+        only_a = [index for index, score in enumerate(best_score_a) if score < confidence_threshold]
+        only_b = [index for index, score in enumerate(best_score_b) if score < confidence_threshold]
+        if not return_index:
+            only_a = [name_list_a[index] for index in only_a]
+            only_b = [name_list_b[index] for index in only_b]
+        crosscheck_list.append((only_a, only_b))
+    return crosscheck_list
+
+#%% Function to crosscheck two lists of names
+def crosscheck_names(name_list_a, name_list_b, confidence_threshold=90, blocking=True, return_index=False):
+    return crosscheck_names_batch([(name_list_a, name_list_b)], confidence_threshold, blocking, return_index)[0]
+
+#%% Function to build an index of a list of names
+## Every name is normalized once and stored once, and the names are indexed by their blocking keys,
+## so many query names can be matched against a large list of names (e.g., the co-authors of every
+## PC member) without comparing every pair.
+@timed()
+def build_name_index(name_list):
+    name_norm_list = []
+    owner_list = []
+    name_position = {}
+    for position, name in enumerate(name_list):
+        name_norm = normalize_person_name(name)
+        if not name_norm:
+            continue
+        if name_norm not in name_position:
+            name_position[name_norm] = len(name_norm_list)
+            name_norm_list.append(name_norm)
+            owner_list.append([])
+        owner_list[name_position[name_norm]].append(position)
+    key_index = {}
+    for index, name_norm in enumerate(name_norm_list):
+        for key in blocking_keys(name_norm):
+            key_index.setdefault(key, []).append(index)
+    name_index = \
+    {
+        "names"     : name_norm_list,
+        "owners"    : owner_list,
+        "key_index" : key_index
+    }
+    return name_index
+
+#%% Function to check whether two normalized names can have a WRatio score of at least 95
+## WRatio can only reach 95 if one name has all the tokens of the other (token set ratio of 100) or
+## if the names are almost equal (ratio of at least 94.5, which is bounded by the number of common
+## characters), so the other pairs do not need to be scored.
+def may_match_95(name_norm_a, token_set_a, char_count_a, name_norm_b, token_set_b, char_count_b):
+    if token_set_a <= token_set_b or token_set_b <= token_set_a:
+        return True
+    total_length = len(name_norm_a) + len(name_norm_b)
+    if 2 * min(len(name_norm_a), len(name_norm_b)) < 0.945 * total_length:
+        return False
+    common = sum(min(count, char_count_b.get(char, 0)) for char, count in char_count_a.items())
+    return 2 * common >= 0.945 * total_length
+
+#%% Function to find the names of an index that match each query name
+## Each distinct query name is looked up once and only the names of the index that share a blocking
+## key with it are scored, in a single batch (WRatio, as process.extractOne). With a threshold of 95
+## or more, the pairs that cannot reach 95 are skipped before scoring. Returns, for each query name,
+## a list of (position in the indexed name list, score) with score >= confidence_threshold.
+@timed()
+def query_name_index(name_index, query_name_list, confidence_threshold=95):
+    query_norm_list = [normalize_person_name(name) for name in query_name_list]
+    unique_query_list = sorted(set(name_norm for name_norm in query_norm_list if name_norm))
+    prune = confidence_threshold >= 95
+    if prune and 'token_sets' not in name_index:
+        name_index['token_sets'] = [frozenset(name_norm.split()) for name_norm in name_index['names']]
+        name_index['char_counts'] = [collections.Counter(name_norm) for name_norm in name_index['names']]
+    string_a_list = []
+    string_b_list = []
+    pair_list = []
+    for query_norm in unique_query_list:
+        candidate_set = set()
+        for key in blocking_keys(query_norm):
+            candidate_set.update(name_index['key_index'].get(key, []))
+        if prune:
+            token_set = frozenset(query_norm.split())
+            char_count = collections.Counter(query_norm)
+        for index in sorted(candidate_set):
+            if prune and not may_match_95(query_norm, token_set, char_count, name_index['names'][index],
+                                          name_index['token_sets'][index], name_index['char_counts'][index]):
+                continue
+            string_a_list.append(query_norm)
+            string_b_list.append(name_index['names'][index])
+            pair_list.append((query_norm, index))
+    score_list = batch_fuzzy_score(string_a_list, string_b_list, 'WRatio')
+
+    match_dict = {}
+    for (query_norm, index), score in zip(pair_list, score_list):
+        if score >= confidence_threshold:
+            match_dict.setdefault(query_norm, []).extend((position, score) for position in name_index['owners'][index])
+    return [sorted(match_dict.get(query_norm, [])) for query_norm in query_norm_list]
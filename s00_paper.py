@@ -0,0 +1,85 @@
+# Project: ISCA 2021 Script
+# Filename: s00_paper.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Paper Loader for ISCA 2021 Script
+# Description:
+## This script contains the function to load the papers from the HotCRP exports (paper data,
+## authors and PC conflicts) used by s06 and s07. The papers are combined into a single table
+## with one row per paper:
+##   ID, Title, Tags, authors, pc conflict name, pc conflict email, hash
+## The table is cached on disk (keyed by the content of the input files), so running s06 or s07
+## again with the same HotCRP exports does not need to process them again.
+
+#%% Import some libraries that are needed
+import os
+import glob
+import hashlib
+import pandas as pd
+from s00_table import load_table
+from s00_table import save_table
+from s00_instrument import timed
+from s00_instrument import count
+
+#%% Define constant
+# Folder of the cached paper tables
+paper_cache_folder = '.cache/papers'
+# Increase this if the content of the paper table is changed
+paper_cache_version = 1
+
+#%% Function to compute the hash of a file
+def file_hash(filename):
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+#%% Function to compute the paper hash used to name the Zoom and conflict files
+# e.g., paper 12 titled 'Title' -> sha256('12@Title')[:6]
+def paper_hash(paper_id, title):
+    return hashlib.sha256((str(paper_id) + '@' + title).encode('utf-8')).hexdigest()[:6]
+
+#%% Function to build the paper table from the HotCRP exports
+## Papers without conflict have '#NA' as pc conflict name and pc conflict email (as before).
+def build_paper_table(paper_data_filename, paper_authors_filename, paper_pc_conflict_filename):
+    paper_data_df = pd.read_csv(paper_data_filename)
+    paper_authors_df = pd.read_csv(paper_authors_filename)
+    paper_pc_conflict_df = pd.read_csv(paper_pc_conflict_filename)
+
+    # Group the authors and PC conflicts of each paper into lists
+    paper_authors_df['full name'] = paper_authors_df['first'] + ' ' + paper_authors_df['last']
+    paper_authors_merge = paper_authors_df.groupby('paper')['full name'].agg(list)
+    paper_pc_conflict_df['full name'] = paper_pc_conflict_df['first'] + ' ' + paper_pc_conflict_df['last']
+    paper_pc_conflict_merge_df = paper_pc_conflict_df.groupby('paper').agg({'full name': list, 'email': list})
+
+    papers_df = paper_data_df[['ID','Title']].copy()
+    papers_df['Tags'] = paper_data_df['Tags'].fillna('#NA').str.split(' ')
+    papers_df['authors'] = papers_df['ID'].map(paper_authors_merge)
+    papers_df['pc conflict name'] = papers_df['ID'].map(paper_pc_conflict_merge_df['full name']).fillna('#NA')
+    papers_df['pc conflict email'] = papers_df['ID'].map(paper_pc_conflict_merge_df['email']).fillna('#NA')
+    papers_df['hash'] = [paper_hash(paper_id, title) for paper_id, title in zip(papers_df['ID'], papers_df['Title'])]
+    return papers_df
+
+#%% Function to load the paper table
+## The table is loaded from the cache if the input files have not changed since it was built.
+## The returned DataFrame can be modified freely (it is not shared).
+@timed()
+def load_papers(paper_data_filename, paper_authors_filename, paper_pc_conflict_filename, use_cache=True):
+    if not use_cache:
+        return build_paper_table(paper_data_filename, paper_authors_filename, paper_pc_conflict_filename)
+    cache_key = hashlib.sha256(('%d:%s:%s:%s' % (paper_cache_version, file_hash(paper_data_filename),
+                                file_hash(paper_authors_filename), file_hash(paper_pc_conflict_filename))).encode('utf-8')).hexdigest()
+    cache_filename = os.path.join(paper_cache_folder, 'papers-%s.json.gz' % (cache_key[:16]))
+    if os.path.exists(cache_filename):
+        count('cache.papers.hit')
+        papers_df = load_table(cache_filename)
+        papers_df['authors'] = [authors if isinstance(authors, list) else float('nan') for authors in papers_df['authors']]
+        return papers_df
+    count('cache.papers.miss')
+    papers_df = build_paper_table(paper_data_filename, paper_authors_filename, paper_pc_conflict_filename)
+    # Remove the tables built from older HotCRP exports
+    for old_filename in glob.glob(os.path.join(paper_cache_folder, 'papers-*.json.gz')):
+        os.remove(old_filename)
+    save_table(papers_df, cache_filename)
+    return papers_df
@@ -0,0 +1,372 @@
+# Project: ISCA 2021 Script
+# Filename: s00_pipeline.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Pipeline Runner for ISCA 2021 Script
+# Description:
+## This script runs the s01-s08 scripts as a pipeline. The inputs and outputs of each script are
+## declared below; the order of the scripts (DAG) is derived from them, i.e., a script runs after
+## the scripts that produce its inputs. The code of a script is also an input: the script itself and
+## every s00 module it imports, directly or through another s00 module (found by parsing the code).
+## A script is skipped if its inputs have the same content as the last successful run and its
+## outputs still exist.
+## Scripts that do not depend on each other (e.g., s05 and the DBLP scripts s01-s04) are run
+## concurrently.
+##
+## Every step of a script is in its main() function, so a script can be imported without running it.
+## Each stage is run by calling the main() of its script in its own Python process (the stages that
+## run at the same time do not share the settings and counters of the s00 modules), from the
+## directory of this file. The scripts can still be run by hand (e.g., python s05_paper_topic_assign.py).
+## The stages can also be run from another script with run_stage() or run_pipeline().
+##
+##   python s00_pipeline.py list
+##   python s00_pipeline.py run [STAGE ...] [--force] [--jobs N] [--dry-run] [--profile PROFILER]
+## STAGE is the name of a stage (e.g., s03); the stages it depends on are run first if needed.
+## Each script writes a run report next to its outputs (see s00_instrument.py).
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import ast
+import time
+import importlib
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import wait
+
+#%% Define pipeline settings
+# Directory of the scripts, all paths below are relative to this directory
+pipeline_dir = os.path.dirname(os.path.abspath(__file__))
+# State of the last successful run of each stage (content hash of the inputs)
+pipeline_state_filename = '.cache/pipeline-state.json'
+# Output of each stage (stdout and stderr) is saved here
+pipeline_log_folder = '.cache/pipeline-logs'
+# Maximum number of stages running at the same time
+pipeline_max_jobs = 4
+
+#%% Define the stages
+## script  : the script to run
+## inputs  : data files or folders read by the script (its code is added automatically)
+## outputs : files or folders written by the script, including its run report (see s00_instrument.py;
+##           the profile saved next to it with --profile is not an output)
+pipeline_stages = \
+[
+    {
+        "name"    : "s01",
+        "script"  : "s01_pcname_to_dblp_person_id.py",
+        "inputs"  : ['sample-data/input/isca2021-pcinfo.csv'],
+        "outputs" : ['sample-data/output/isca2021-pc-to-dblp.csv', 'sample-data/output/isca2021-s01-run-report.json']
+    },
+    {
+        "name"    : "s02",
+        "script"  : "s02_pccoauthors_dblp_crawler.py",
+        "inputs"  : ['sample-data/output/isca2021-pc-to-dblp.csv'],
+        "outputs" : ['sample-data/output/isca2021-pccoauthors.json.gz', 'sample-data/output/isca2021-pccoauthors-graph.npz',
+                     'sample-data/output/isca2021-s02-run-report.json']
+    },
+    {
+        "name"    : "s03",
+        "script"  : "s03_pcconflict_crosscheck.py",
+        "inputs"  : ['sample-data/input/isca2021-pcinfo.csv', 'sample-data/output/isca2021-pccoauthors.json.gz'],
+        "outputs" : ['sample-data/output/isca2021-pcconflict-crosscheck.json.gz', 'sample-data/output/isca2021-s03-run-report.json']
+    },
+    {
+        "name"    : "s04",
+        "script"  : "s04_pcconflict_merge_hotcrp.py",
+        "inputs"  : ['sample-data/input/isca2021-pcinfo.csv', 'sample-data/output/isca2021-pcconflict-crosscheck.json.gz'],
+        "outputs" : ['sample-data/output/isca2021-pcinfo-update.csv', 'sample-data/output/isca2021-s04-run-report.json']
+    },
+    {
+        "name"    : "s05",
+        "script"  : "s05_paper_topic_assign.py",
+        "inputs"  : ['sample-data/input/isca2021-topics.csv', 'sample-data/input/isca2021-topics-priority.csv'],
+        "outputs" : ['sample-data/output/isca2021-papers-topics-assigned.csv', 'sample-data/output/isca2021-papers-topics-ranked.csv',
+                     'sample-data/output/isca2021-topics-count.csv', 'sample-data/output/isca2021-s05-run-report.json']
+    },
+    {
+        "name"    : "s06",
+        "script"  : "s06_paper_discussion_window.py",
+        "inputs"  : ['sample-data/input/isca2021-authors.csv', 'sample-data/input/isca2021-paperdata.csv',
+                     'sample-data/input/isca2021-pcconflicts.csv', 'sample-data/input/isca2021-pcassignments.csv',
+                     'sample-data/input/isca2021-pcavailability.csv'],
+        "outputs" : ['sample-data/output/isca2021-paperschedule.csv', 'sample-data/output/isca2021-s06-run-report.json']
+    },
+    {
+        "name"    : "s07",
+        "script"  : "s07_zoom_meeting_generator.py",
+        "inputs"  : ['sample-data/input/isca2021-authors.csv', 'sample-data/input/isca2021-paperdata.csv',
+                     'sample-data/input/isca2021-pcconflicts.csv', 'sample-data/output/isca2021-pcconflict-crosscheck.json.gz',
+                     'sample-data/input/isca2021-pczoom.csv', 'sample-data/input/isca2021-zoom-rules.json'],
+        "outputs" : ['sample-data/output/zoom', 'sample-data/output/zoom_hashed', 'sample-data/output/conflict',
+                     'sample-data/output/conflict_hashed', 'sample-data/output/isca2021-paper-summary.csv',
+                     'sample-data/output/isca2021-zoom-report.csv', 'sample-data/output/isca2021-suspected-conflicts.csv',
+                     'sample-data/output/isca2021-s07-run-report.json']
+    },
+    {
+        "name"    : "s08",
+        "script"  : "s08_reviewer_assign.py",
+        "inputs"  : ['sample-data/output/isca2021-papers-topics-ranked.csv', 'sample-data/input/isca2021-pcinfo.csv',
+                     'sample-data/input/isca2021-pcconflicts.csv'],
+        "outputs" : ['sample-data/output/isca2021-pcassignments.csv', 'sample-data/output/isca2021-s08-run-report.json']
+    }
+]
+
+#%% Function to get a stage by name
+def get_stage(name):
+    for stage in pipeline_stages:
+        if stage['name'] == name or stage['script'] == name:
+            return stage
+    raise KeyError('Unknown stage %s' % (name))
+
+#%% Function to find the code of a script
+## Returns the script and the s00 modules it imports (directly or through other s00 modules), in
+## the order they are found. The imports are read from the code without running it.
+def script_code(script):
+    code_list = []
+    pending = [script]
+    while pending:
+        filename = pending.pop(0)
+        if filename in code_list or not os.path.isfile(os.path.join(pipeline_dir, filename)):
+            continue
+        code_list.append(filename)
+        with open(os.path.join(pipeline_dir, filename), encoding='utf-8') as code_file:
+            tree = ast.parse(code_file.read(), filename)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                module_list = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                module_list = [node.module]
+            else:
+                continue
+            pending.extend(module.split('.')[0] + '.py' for module in module_list if module.startswith('s00_'))
+    return code_list
+
+#%% Function to get the inputs of a stage (including its code)
+def stage_inputs(stage):
+    code_list = script_code(stage['script'])
+    return code_list + [path for path in stage['inputs'] if path not in code_list]
+
+#%% Function to get the outputs of all stages
+def stage_outputs():
+    return set(path for stage in pipeline_stages for path in stage['outputs'])
+
+#%% Function to get the run report of a stage (None if it has none)
+def stage_run_report(stage):
+    for path in stage['outputs']:
+        if path.endswith('-run-report.json'):
+            return path
+    return None
+
+#%% Function to find the stages that a stage depends on
+## A stage depends on the stages that produce one of its inputs
+def stage_dependencies(stage):
+    producer = {}
+    for other_stage in pipeline_stages:
+        for path in other_stage['outputs']:
+            producer[path] = other_stage['name']
+    return sorted(set(producer[path] for path in stage_inputs(stage) if path in producer and producer[path] != stage['name']))
+
+#%% Function to find the stages needed to run the target stages (in pipeline order)
+def select_stages(targets=None):
+    if not targets:
+        return [stage['name'] for stage in pipeline_stages]
+    selected = set()
+    pending = [get_stage(target)['name'] for target in targets]
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(stage_dependencies(get_stage(name)))
+    return [stage['name'] for stage in pipeline_stages if stage['name'] in selected]
+
+#%% Function to compute the content hash of a file or a folder
+## Returns None if the path does not exist
+def content_hash(path):
+    full_path = os.path.join(pipeline_dir, path)
+    if os.path.isfile(full_path):
+        file_hash = hashlib.sha256()
+        with open(full_path, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(1024 * 1024), b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+    if os.path.isdir(full_path):
+        folder_hash = hashlib.sha256()
+        for root, dirs, files in os.walk(full_path):
+            dirs.sort()
+            for filename in sorted(files):
+                file_path = os.path.relpath(os.path.join(root, filename), pipeline_dir)
+                folder_hash.update(('%s:%s\n' % (os.path.relpath(file_path, path), content_hash(file_path))).encode('utf-8'))
+        return folder_hash.hexdigest()
+    return None
+
+#%% Function to load and save the state of the pipeline
+def load_state():
+    filename = os.path.join(pipeline_dir, pipeline_state_filename)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, encoding='utf-8') as state_file:
+        return json.load(state_file)
+
+def save_state(state):
+    filename = os.path.join(pipeline_dir, pipeline_state_filename)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file, indent=1, sort_keys=True)
+
+#%% Function to check whether a stage needs to run
+## Returns (status, input hashes), status is one of
+##   'missing' : some inputs do not exist
+##   'run'     : the inputs have changed or some outputs do not exist
+##   'skip'    : the inputs are the same as the last successful run
+def check_stage(stage, state, force=False):
+    input_hashes = {path: content_hash(path) for path in stage_inputs(stage)}
+    if any(input_hash is None for input_hash in input_hashes.values()):
+        return 'missing', input_hashes
+    if force:
+        return 'run', input_hashes
+    outputs_exist = all(os.path.exists(os.path.join(pipeline_dir, path)) for path in stage['outputs'])
+    if outputs_exist and state.get(stage['name'], {}).get('inputs') == input_hashes:
+        return 'skip', input_hashes
+    return 'run', input_hashes
+
+#%% Function to run a stage
+## The script is run in its own Python process from the directory of the scripts. The output of the
+## script is saved into the log folder. Returns the exit code of the script and the runtime.
+## folder is the directory the script is run from (default: the directory of the scripts).
+def run_stage(name, python=None, folder=None):
+    stage = get_stage(name)
+    folder = pipeline_dir if folder is None else folder
+    log_folder = os.path.join(folder, pipeline_log_folder)
+    os.makedirs(log_folder, exist_ok=True)
+    # A new interpreter (not a fork of this one, which may run other stages in its threads)
+    context = multiprocessing.get_context('spawn')
+    if python is not None:
+        context.set_executable(python)
+    start_time = time.time()
+    process = context.Process(target=stage_process, args=(stage['script'], folder, os.path.join(log_folder, stage['name'] + '.log')))
+    process.start()
+    process.join()
+    return process.exitcode, time.time() - start_time
+
+#%% Function to call the main() of a script, in the process of its stage
+## The output of the script (stdout and stderr) is written into log_filename.
+def stage_process(script, folder, log_filename):
+    if pipeline_dir not in sys.path:
+        sys.path.insert(0, pipeline_dir)
+    os.chdir(folder)
+    with open(log_filename, 'w') as log_file:
+        os.dup2(log_file.fileno(), sys.stdout.fileno())
+        os.dup2(log_file.fileno(), sys.stderr.fileno())
+    importlib.import_module(os.path.splitext(script)[0]).main()
+
+#%% Function to run the pipeline
+## Runs the target stages (all stages if targets is empty) and the stages they depend on.
+## Returns a dictionary of stage name to status:
+##   'done', 'skipped', 'failed', 'missing input' or 'blocked' (a stage it depends on did not finish)
+def run_pipeline(targets=None, force=False, max_jobs=None, dry_run=False, verbose=True):
+    names = select_stages(targets)
+    state = load_state()
+    state_lock = threading.Lock()
+    status = {}
+    running = {}
+    if max_jobs is None:
+        max_jobs = pipeline_max_jobs
+
+    def report(name, message):
+        if verbose:
+            print('[%s] %s' % (name, message), flush=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        while len(status) < len(names):
+            # Start every stage whose dependencies have finished
+            for name in names:
+                if name in status or name in running:
+                    continue
+                stage = get_stage(name)
+                dependencies = [dependency for dependency in stage_dependencies(stage) if dependency in names]
+                if any(status.get(dependency) in ('failed', 'missing input', 'blocked') for dependency in dependencies):
+                    status[name] = 'blocked'
+                    report(name, 'blocked')
+                    continue
+                if any(dependency not in status for dependency in dependencies):
+                    continue
+                if dry_run and any(status[dependency] == 'would run' for dependency in dependencies):
+                    # The inputs produced by the other stages do not exist yet, only check the others
+                    missing = [path for path in stage_inputs(stage) if path not in stage_outputs() and content_hash(path) is None]
+                    status[name] = 'missing input' if missing else 'would run'
+                    report(name, 'missing input: %s' % (', '.join(missing)) if missing else 'would run (after %s)' % (', '.join(dependencies)))
+                    continue
+                check, input_hashes = check_stage(stage, state, force)
+                if check == 'missing':
+                    status[name] = 'missing input'
+                    missing = [path for path, input_hash in input_hashes.items() if input_hash is None]
+                    report(name, 'missing input: %s' % (', '.join(missing)))
+                elif check == 'skip':
+                    status[name] = 'skipped'
+                    report(name, 'up to date')
+                elif dry_run:
+                    status[name] = 'would run'
+                    report(name, 'would run')
+                else:
+                    report(name, 'running %s' % (stage['script']))
+                    running[name] = (pool.submit(run_stage, name), input_hashes)
+            if not running:
+                if len(status) < len(names):
+                    raise RuntimeError('The stages %s cannot be started' % (', '.join(name for name in names if name not in status)))
+                continue
+            # Wait for a running stage to finish
+            finished, not_finished = wait([future for future, input_hashes in running.values()], return_when=FIRST_COMPLETED)
+            for name in [name for name, (future, input_hashes) in running.items() if future in finished]:
+                future, input_hashes = running.pop(name)
+                returncode, runtime = future.result()
+                if returncode == 0:
+                    status[name] = 'done'
+                    report(name, 'done in %.1fs' % (runtime))
+                    with state_lock:
+                        state[name] = {"inputs": input_hashes, "finished": time.time()}
+                        save_state(state)
+                else:
+                    status[name] = 'failed'
+                    report(name, 'failed with exit code %d after %.1fs, see %s' % (returncode, runtime,
+                           os.path.join(pipeline_log_folder, name + '.log')))
+    return status
+
+#%% Command line interface
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the ISCA 2021 scripts as a pipeline.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help='show the stages, their dependencies and whether they are up to date')
+    run_parser = subparsers.add_parser('run', help='run the stages that are not up to date')
+    run_parser.add_argument('stages', nargs='*', help='stages to run (default: all), the stages they depend on are included')
+    run_parser.add_argument('--force', action='store_true', help='run the stages even if they are up to date')
+    run_parser.add_argument('--jobs', type=int, default=None, help='maximum number of stages running at the same time (default: %d)' % (pipeline_max_jobs))
+    run_parser.add_argument('--dry-run', action='store_true', help='only show which stages would run')
+    run_parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], help='profile the scripts, the profile is saved next to their run report')
+    args = parser.parse_args(argv)
+    if getattr(args, 'profile', None):
+        # Read by s00_instrument.py in the processes of the scripts
+        os.environ['ISCA_PROFILE'] = args.profile
+
+    if args.command == 'list':
+        state = load_state()
+        print('%-5s %-36s %-12s %s' % ('stage', 'script', 'depends on', 'status'))
+        for stage in pipeline_stages:
+            check, input_hashes = check_stage(stage, state)
+            check = {'missing': 'missing input', 'run': 'needs to run', 'skip': 'up to date'}[check]
+            print('%-5s %-36s %-12s %s' % (stage['name'], stage['script'], ','.join(stage_dependencies(stage)) or '-', check))
+    elif args.command == 'run':
+        status = run_pipeline(args.stages, args.force, args.jobs, args.dry_run)
+        if 'failed' in status.values():
+            return 1
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
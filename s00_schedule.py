@@ -0,0 +1,343 @@
+# Project: ISCA 2021 Script
+# Filename: s00_schedule.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Paper Discussion Scheduling Functions for ISCA 2021 Script
+# Description:
+## This script contains the functions used by s06 to schedule the discussion of each paper.
+## The availability of the PC members is encoded as a reviewer x timeslot penalty matrix and the
+## reviewer assignments as a sparse paper x reviewer matrix, so that the availability score of
+## every paper on every timeslot is obtained from a single sparse matrix product.
+
+#%% Import some libraries that are needed
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import scipy.optimize
+import tqdm
+import time
+from s00_instrument import timed
+
+#%% Define constant
+# Penalty of each availability status on Doodle (any other status, e.g., '0', is not available)
+availability_penalty = \
+{
+    "OK"   : 0,
+    "(OK)" : -1
+}
+# Penalty of a PC member that is not available
+unavailable_penalty = -2
+
+#%% Function to get the timeslots from the Doodle columns
+## The timeslots are the columns named with a number (e.g., '1', '2', ..., '16')
+def doodle_timeslots(pc_avail_doodle_df):
+    return [str(column) for column in pc_avail_doodle_df.columns if str(column).strip().isdigit()]
+
+#%% Function to encode the Doodle sheet as a reviewer x timeslot penalty matrix
+## An empty cell means that the PC member is available (OK). If a PC member appears more than once,
+## the first row is used. Returns (penalty matrix, dictionary of email to row of the matrix).
+def availability_penalty_matrix(pc_avail_doodle_df, timeslot_list):
+    pc_avail_doodle_df = pc_avail_doodle_df.drop_duplicates(subset=['hotcrp_email'], keep='first')
+    status = pc_avail_doodle_df[timeslot_list]
+    penalty = np.full(status.shape, unavailable_penalty, dtype=np.int64)
+    penalty[status.isna().to_numpy()] = 0
+    for status_name, status_penalty in availability_penalty.items():
+        penalty[(status == status_name).to_numpy()] = status_penalty
+    reviewer_index = {email: index for index, email in enumerate(pc_avail_doodle_df['hotcrp_email'])}
+    return penalty, reviewer_index
+
+#%% Function to encode the reviewer assignments as a sparse paper x reviewer matrix
+## reviewer_lists is the list of reviewer emails of each paper. The reviewers that are not in
+## reviewer_index are ignored.
+def assignment_matrix(reviewer_lists, reviewer_index):
+    row_list = []
+    column_list = []
+    for row, reviewer_list in enumerate(reviewer_lists):
+        for reviewer in reviewer_list:
+            column = reviewer_index.get(reviewer)
+            if column is not None:
+                row_list.append(row)
+                column_list.append(column)
+    data = np.ones(len(row_list), dtype=np.int64)
+    return scipy.sparse.csr_matrix((data, (row_list, column_list)), shape=(len(reviewer_lists), len(reviewer_index)))
+
+#%% Function to compute the availability score of each paper on each timeslot
+## The score of a paper on a timeslot is the sum of the penalty of its reviewers on that timeslot:
+## 0 if every reviewer is available, lower if some reviewers are not (or only maybe) available.
+## Returns a DataFrame with columns ID and one column per timeslot.
+@timed()
+def availability_scores(paper_id_list, reviewer_lists, pc_avail_doodle_df, timeslot_list=None):
+    if timeslot_list is None:
+        timeslot_list = doodle_timeslots(pc_avail_doodle_df)
+    penalty, reviewer_index = availability_penalty_matrix(pc_avail_doodle_df, timeslot_list)
+    score = assignment_matrix(reviewer_lists, reviewer_index) @ penalty
+    paper_window_df = pd.DataFrame(np.asarray(score), columns=timeslot_list)
+    paper_window_df.insert(0, 'ID', list(paper_id_list))
+    return paper_window_df
+
+#%% Function to encode a list of sets as bitsets
+## Each element of value_lists is encoded as a Python integer in which bit i is set if the i-th item
+## (in order of first appearance) is in it. A string (e.g., '#NA') is a set of its characters, as
+## set('#NA') in the greedy scheduler before.
+def bitset_list(value_lists):
+    item_index = {}
+    bitsets = []
+    for value_list in value_lists:
+        bitset = 0
+        for item in set(value_list):
+            bitset |= 1 << item_index.setdefault(item, len(item_index))
+        bitsets.append(bitset)
+    return bitsets
+
+#%% Function to count the items in a bitset
+def bitset_count(bitset):
+    return bin(bitset).count('1')
+
+#%% Function to schedule the papers greedily
+## For each threshold (from 0 down to -11), the timeslots are filled one by one with the papers whose
+## score on the timeslot equals the threshold. Among those papers, the one that can be scheduled on the
+## fewest of the remaining timeslots is chosen first, then the one sharing the most reviewers and then
+## the most conflicts with the previously scheduled paper, then the one with the lowest ID.
+## The papers are kept in per-(timeslot, score) candidate buckets, the reviewers and conflicts as
+## bitsets, and a scheduled paper is only marked as removed, so no table is copied while scheduling.
+## score_matrix is the paper x timeslot availability score and the papers are expected to be sorted
+## by ID. Returns schedule_dict {timeslot: [[paper ID, score], ...]}.
+@timed()
+def greedy_schedule(paper_id_list, score_matrix, reviewer_lists, conflict_lists, timeslot_list, target_paper_per_timeslot, threshold_list=range(0,-12,-1)):
+    paper_id_list = [int(paper_id) for paper_id in paper_id_list]
+    score_matrix = np.asarray(score_matrix, dtype=np.int64)
+    reviewer_bitsets = bitset_list(reviewer_lists)
+    conflict_bitsets = bitset_list(conflict_lists)
+    remaining = np.ones(len(paper_id_list), dtype=bool)
+    number_of_paper = len(paper_id_list)
+
+    # Candidate buckets: papers (in ID order) with a given score on a given timeslot
+    buckets = {}
+    for slot in range(len(timeslot_list)):
+        for score in np.unique(score_matrix[:, slot]):
+            buckets[(slot, int(score))] = np.flatnonzero(score_matrix[:, slot] == score)
+    no_candidate = np.zeros(0, dtype=np.int64)
+
+    schedule_dict = {}
+    stop = False
+    previous_reviewer = None
+    previous_conflict = None
+    # priority 1st -> same reviewer
+    # priority 2nd -> same conflict
+    for current_threshold in tqdm.tqdm(threshold_list):
+        for phase in range(1,3):
+            for slot, timeslot in enumerate(timeslot_list):
+                # Note: once no paper could be found for a timeslot, at most one paper is scheduled
+                # on each timeslot per pass (as the greedy scheduler always did)
+                for subslot in range(1,target_paper_per_timeslot):
+                    candidates = buckets.get((slot, current_threshold), no_candidate)
+                    candidates = candidates[remaining[candidates]]
+                    if len(candidates) == 0:
+                        print("Warning! No more paper that can be scheduled on timeslot " + str(timeslot) + " with threshold " + str(current_threshold) + "\n")
+                        stop = True
+                    else:
+                        if previous_reviewer is None or len(candidates) == 1:
+                            # First paper or only a single paper is available on the particular timeslot
+                            paper = candidates[0]
+                        else:
+                            # Let's decide :)
+                            lowest_threshold = (score_matrix[candidates, slot:] == current_threshold).sum(axis=1)
+                            paper = min(range(len(candidates)), key=lambda index: (lowest_threshold[index],
+                                        -bitset_count(reviewer_bitsets[candidates[index]] & previous_reviewer),
+                                        -bitset_count(conflict_bitsets[candidates[index]] & previous_conflict), index))
+                            paper = candidates[paper]
+                        previous_reviewer = reviewer_bitsets[paper]
+                        previous_conflict = conflict_bitsets[paper]
+                        schedule_dict.setdefault(timeslot, []).append([paper_id_list[paper], int(score_matrix[paper, slot])])
+                        remaining[paper] = False
+                        number_of_paper = number_of_paper - 1
+
+                    # if no more papers that can be scheduled on current time slots
+                    if (stop):
+                        break
+
+                if(number_of_paper==0):
+                    print("No more unscheduled paper\n")
+                    break
+
+        if(number_of_paper==0):
+            print("No more unscheduled paper\n")
+            break
+    return schedule_dict
+
+#%% Function to count the reviewers shared by each paper with the other papers of each timeslot
+## assignment is the paper x reviewer matrix and slot_index is the timeslot (column) of each paper.
+## Returns a paper x timeslot matrix.
+def shared_reviewer_count(assignment, slot_index, slot_num):
+    paper_num = assignment.shape[0]
+    placement = scipy.sparse.csr_matrix((np.ones(paper_num, dtype=np.int64), (np.arange(paper_num), slot_index)), shape=(paper_num, slot_num))
+    reviewer_slot = (assignment.T @ placement).tocsr()
+    shared = np.asarray((assignment @ reviewer_slot).todense())
+    # A paper does not share reviewers with itself
+    shared[np.arange(paper_num), slot_index] -= np.asarray(assignment.multiply(assignment).sum(axis=1)).ravel()
+    return shared
+
+#%% Function to compute the weights of the objectives of the optimal scheduler
+## max_bonus is the largest contiguity bonus of one paper. The objectives are combined into one
+## cost so that the sum of all the lower priority terms of all papers is always smaller than one
+## unit of the higher priority term:
+##   balance_weight > total contiguity bonus          (max_bonus per paper)
+##   score_weight   > total balance + total bonus     (seat cost < seat_num per paper)
+## Returns (balance_weight, score_weight).
+def schedule_weights(max_bonus, paper_num, seat_num):
+    paper_num = max(paper_num, 1)
+    balance_weight = max_bonus * paper_num + 1
+    score_weight = (balance_weight * seat_num + max_bonus) * paper_num + 1
+    return balance_weight, score_weight
+
+#%% Function to schedule the papers optimally
+## The papers are assigned to the timeslots by solving an assignment problem (a special case of
+## min-cost flow) exactly: each timeslot is split into seats, at most target_paper_per_timeslot
+## seats per timeslot (more if there are not enough seats for all papers), and each paper gets
+## exactly one seat. The objectives are, in order of priority:
+##   1. maximize the total availability score (provably optimal)
+##   2. balance the number of papers between timeslots
+##   3. keep the papers that share reviewers in the same timeslot (improved in a few rounds, each
+##      round rewards the timeslots of the previous solution, which never worsens 1)
+## score_matrix is the paper x timeslot availability score. Returns (schedule_dict, stats), in which
+## schedule_dict is {timeslot: [[paper ID, score], ...]} like the greedy scheduler.
+@timed()
+def optimal_schedule(paper_id_list, score_matrix, reviewer_lists, timeslot_list, target_paper_per_timeslot, contiguity_rounds=3):
+    paper_id_list = list(paper_id_list)
+    score_matrix = np.asarray(score_matrix, dtype=np.int64)
+    paper_num, slot_num = score_matrix.shape
+    seat_num = max(target_paper_per_timeslot, -(-paper_num // max(slot_num, 1)))
+
+    # Cost of each paper on each seat, the seats of a timeslot are filled in order
+    reviewer_index = {}
+    for reviewer_list in reviewer_lists:
+        for reviewer in reviewer_list:
+            reviewer_index.setdefault(reviewer, len(reviewer_index))
+    assignment = assignment_matrix(reviewer_lists, reviewer_index)
+    reviewer_num = np.asarray(assignment.sum(axis=1)).ravel()
+    seat_cost = np.tile(np.arange(seat_num, dtype=np.int64), slot_num)
+    seat_slot = np.repeat(np.arange(slot_num), seat_num)
+    max_bonus = int(reviewer_num.max() * seat_num) if paper_num else 0
+    balance_weight, score_weight = schedule_weights(max_bonus, paper_num, seat_num)
+
+    best = None
+    bonus = np.zeros((paper_num, slot_num), dtype=np.int64)
+    for contiguity_round in range(contiguity_rounds + 1):
+        cost = -score_matrix[:, seat_slot] * score_weight + seat_cost[np.newaxis, :] * balance_weight - bonus[:, seat_slot]
+        paper_index, seat_index = scipy.optimize.linear_sum_assignment(cost)
+        slot_index = np.empty(paper_num, dtype=np.int64)
+        slot_index[paper_index] = seat_slot[seat_index]
+        shared = shared_reviewer_count(assignment, slot_index, slot_num)
+        total_shared = int(shared[np.arange(paper_num), slot_index].sum())
+        total_score = int(score_matrix[np.arange(paper_num), slot_index].sum())
+        if best is None or (total_score, total_shared) > (best[1], best[2]):
+            best = (slot_index, total_score, total_shared)
+        bonus = shared
+
+    slot_index, total_score, total_shared = best
+    schedule_dict = {}
+    for paper in np.argsort(slot_index, kind='stable'):
+        timeslot = timeslot_list[slot_index[paper]]
+        schedule_dict.setdefault(timeslot, []).append([paper_id_list[paper], int(score_matrix[paper, slot_index[paper]])])
+    stats = \
+    {
+        "papers"          : paper_num,
+        "seats_per_slot"  : seat_num,
+        "total_score"     : total_score,
+        # Upper bound of the total score if the timeslots had no capacity limit
+        "upper_bound"     : int(score_matrix.max(axis=1).sum()) if slot_num else 0,
+        "shared_reviewer" : total_shared
+    }
+    return schedule_dict, stats
+
+#%% Function to compute the Jaccard distance between the conflict sets of the papers
+## conflict_lists is the list of PC conflict emails of each paper ('#NA' or any non-list value means
+## no conflict). Two papers without conflict have distance 0.
+def conflict_distance_matrix(conflict_lists):
+    conflict_sets = [set(conflict_list) if isinstance(conflict_list, list) else set() for conflict_list in conflict_lists]
+    pc_index = {}
+    for conflict_set in conflict_sets:
+        for email in sorted(conflict_set):
+            pc_index.setdefault(email, len(pc_index))
+    conflict = assignment_matrix([sorted(conflict_set) for conflict_set in conflict_sets], pc_index)
+    intersection = np.asarray((conflict @ conflict.T).todense(), dtype=np.float64)
+    size = np.array([len(conflict_set) for conflict_set in conflict_sets], dtype=np.float64)
+    union = size[:, np.newaxis] + size[np.newaxis, :] - intersection
+    distance = np.zeros_like(union)
+    np.divide(intersection, union, out=distance, where=union > 0)
+    return np.where(union > 0, 1 - distance, 0.0), conflict_sets
+
+#%% Function to count the conflict moves of a sequence of papers
+## A conflict move is a PC member that has to be moved between the discussion and conflict room
+## when the discussion moves from one paper to the next one.
+def conflict_moves(order, conflict_sets):
+    return sum(len(conflict_sets[current] ^ conflict_sets[following]) for current, following in zip(order, order[1:]))
+
+#%% Function to order a sequence of papers to minimize the total distance between consecutive papers
+## The sequence is an open path, solved as a tour through a dummy node (index -1 of tour) with 2-opt
+## (reverse a segment) and Or-opt (move a segment of up to 3 papers) moves until no move improves
+## the path or the time budget (seconds) is spent. Returns the new order.
+def order_sequence(order, distance, time_budget):
+    order = list(order)
+    if len(order) < 3:
+        return order
+    # Add the dummy node with distance 0 to every paper
+    size = distance.shape[0]
+    extended = np.zeros((size + 1, size + 1))
+    extended[:size, :size] = distance
+    tour = [size] + order + [size]
+    deadline = time.time() + time_budget
+    epsilon = 1e-9
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        # 2-opt: reverse tour[i..j]
+        for i in range(1, len(tour) - 2):
+            for j in range(i + 1, len(tour) - 1):
+                delta = extended[tour[i-1], tour[j]] + extended[tour[i], tour[j+1]] - extended[tour[i-1], tour[i]] - extended[tour[j], tour[j+1]]
+                if delta < -epsilon:
+                    tour[i:j+1] = tour[i:j+1][::-1]
+                    improved = True
+        # Or-opt: move tour[i..i+length-1] between tour[k] and tour[k+1]
+        for length in range(1, 4):
+            for i in range(1, len(tour) - length):
+                segment = tour[i:i+length]
+                rest = tour[:i] + tour[i+length:]
+                removal_gain = extended[tour[i-1], segment[0]] + extended[segment[-1], tour[i+length]] - extended[tour[i-1], tour[i+length]]
+                best_delta, best_move = -epsilon, None
+                for k in range(len(rest) - 1):
+                    if k == i - 1:
+                        continue
+                    for candidate in (segment, segment[::-1]):
+                        delta = extended[rest[k], candidate[0]] + extended[candidate[-1], rest[k+1]] - extended[rest[k], rest[k+1]] - removal_gain
+                        if delta < best_delta:
+                            best_delta, best_move = delta, rest[:k+1] + candidate + rest[k+1:]
+                if best_move is not None:
+                    tour = best_move
+                    improved = True
+    return tour[1:-1]
+
+#%% Function to order the papers within each timeslot of a schedule
+## conflict_dict maps each paper ID to its PC conflict emails. The time budget (seconds) is shared by
+## all timeslots. Returns (schedule_dict, stats) where the stats contain the total number of conflict
+## moves before and after ordering.
+@timed()
+def order_schedule(schedule_dict, conflict_dict, time_budget=2.0):
+    stats = \
+    {
+        "moves_before" : 0,
+        "moves_after"  : 0
+    }
+    ordered_schedule_dict = {}
+    for timeslot, entries in schedule_dict.items():
+        distance, conflict_sets = conflict_distance_matrix([conflict_dict[entry[0]] for entry in entries])
+        order = order_sequence(range(len(entries)), distance, time_budget / max(len(schedule_dict), 1))
+        moves_before = conflict_moves(list(range(len(entries))), conflict_sets)
+        moves_after = conflict_moves(order, conflict_sets)
+        # Keep the original order if ordering by distance does not reduce the conflict moves
+        if moves_after > moves_before:
+            order, moves_after = list(range(len(entries))), moves_before
+        stats['moves_before'] += moves_before
+        stats['moves_after'] += moves_after
+        ordered_schedule_dict[timeslot] = [entries[index] for index in order]
+    return ordered_schedule_dict, stats
@@ -0,0 +1,261 @@
+# Project: ISCA 2021 Script
+# Filename: s00_synthetic.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Synthetic Dataset Generator for ISCA 2021 Script
+# Description:
+## This script generates a synthetic conference (HotCRP exports, Doodle and Zoom sheets, and a DBLP
+## XML dump) so that every script can be run, and timed, without the real data. The data is random
+## but consistent: the PC members and the authors are persons of a DBLP dump with publications
+## between them, the PC conflicts come from these co-authorships, and so on.
+##
+##   python s00_synthetic.py OUTPUT_FOLDER [--papers N] [--pc N] [--coauthors N] [--seed N]
+## The files are written inside OUTPUT_FOLDER with the same names as in sample-data, plus the DBLP
+## dump (OUTPUT_FOLDER/dblp.xml.gz) to be imported with s00_dblp_dump.py.
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import gzip
+import random
+import argparse
+import pandas as pd
+from xml.sax.saxutils import escape
+
+#%% Define constant
+# Default size of the synthetic conference
+synthetic_papers = 200
+synthetic_pc = 50
+# Average number of DBLP co-authors of each PC member
+synthetic_coauthors = 100
+# Number of topics and Doodle time slots
+synthetic_topics = 30
+synthetic_timeslots = 16
+# Number of reviewers of each paper (in the PC assignments) and maximum number of authors
+synthetic_reviewers_per_paper = 4
+synthetic_authors_per_paper = 6
+# Syllables used to build the person names (DBLP names cannot contain digits)
+name_syllables = ['ka', 'lo', 'mi', 'ra', 'sen', 'ta', 'vo', 'ni', 'ber', 'dal', 'gu', 'har', 'jo', 'lin',
+                  'mar', 'no', 'pe', 'qui', 'ros', 'su', 'tor', 'wen', 'xi', 'yan', 'zel', 'an', 'el', 'or']
+# Relative path of each generated file
+synthetic_files = \
+{
+    "pcinfo"         : 'sample-data/input/isca2021-pcinfo.csv',
+    "authors"        : 'sample-data/input/isca2021-authors.csv',
+    "paperdata"      : 'sample-data/input/isca2021-paperdata.csv',
+    "pcconflicts"    : 'sample-data/input/isca2021-pcconflicts.csv',
+    "pcassignments"  : 'sample-data/input/isca2021-pcassignments.csv',
+    "pcavailability" : 'sample-data/input/isca2021-pcavailability.csv',
+    "pczoom"         : 'sample-data/input/isca2021-pczoom.csv',
+    "topics"         : 'sample-data/input/isca2021-topics.csv',
+    "topicspriority" : 'sample-data/input/isca2021-topics-priority.csv',
+    "zoomrules"      : 'sample-data/input/isca2021-zoom-rules.json',
+    "dblpdump"       : 'dblp.xml.gz'
+}
+
+#%% Function to generate unique person names
+def generate_names(rng, number):
+    name_set = set()
+    name_list = []
+    while len(name_list) < number:
+        first = ''.join(rng.choice(name_syllables) for index in range(rng.randint(2, 3))).capitalize()
+        last = ''.join(rng.choice(name_syllables) for index in range(rng.randint(2, 4))).capitalize()
+        if (first, last) not in name_set:
+            name_set.add((first, last))
+            name_list.append((first, last))
+    return name_list
+
+#%% Function to write the DBLP XML dump
+## persons is a list of dict (pid, name, affiliation) and publications a list of (year, author names).
+def write_dblp_dump(filename, persons, publications):
+    with gzip.GzipFile(filename, 'wb', mtime=0) as output_file:
+        output_file.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<dblp>\n')
+        for person in persons:
+            record = '<www key="homepages/%s"><author>%s</author><title>Home Page</title>' % (person['pid'], escape(person['name']))
+            if person['affiliation']:
+                record = record + '<note type="affiliation">%s</note>' % (escape(person['affiliation']))
+            output_file.write((record + '</www>\n').encode('utf-8'))
+        for index, (year, author_list) in enumerate(publications):
+            record = '<inproceedings key="conf/synth/%d">' % (index)
+            record = record + ''.join('<author>%s</author>' % (escape(author)) for author in author_list)
+            record = record + '<title>Paper %d.</title><year>%d</year></inproceedings>\n' % (index, year)
+            output_file.write(record.encode('utf-8'))
+        output_file.write(b'</dblp>\n')
+
+#%% Function to generate a synthetic conference
+## Returns the number of records of each generated file.
+def generate_dataset(output_folder, papers=None, pc=None, coauthors=None, seed=0):
+    papers = synthetic_papers if papers is None else papers
+    pc = synthetic_pc if pc is None else pc
+    coauthors = synthetic_coauthors if coauthors is None else coauthors
+    rng = random.Random(seed)
+    affiliation_list = ['University of %s' % (''.join(rng.choice(name_syllables) for index in range(3)).capitalize()) for index in range(max(pc, 10))]
+
+    # Persons: the PC members, a community of researchers (co-authors and paper authors), and some
+    # persons with the same last name as a PC member (to be filtered out by s01)
+    community_size = max(pc * coauthors // 2, papers * 2, 50)
+    homonym_size = max(pc // 10, 1)
+    name_list = generate_names(rng, pc + community_size + homonym_size)
+    person_list = []
+    for index, (first, last) in enumerate(name_list):
+        person_dict = \
+        {
+            "pid"         : 'synth/%d' % (index),
+            "first"       : first,
+            "last"        : last,
+            "name"        : first + ' ' + last,
+            "affiliation" : rng.choice(affiliation_list),
+            "email"       : ('pc%d@pc.example.edu' if index < pc else 'person%d@example.edu') % (index)
+        }
+        person_list.append(person_dict)
+    pc_list = person_list[:pc]
+    community_list = person_list[pc:pc + community_size]
+    for offset, person in enumerate(person_list[pc + community_size:]):
+        # Homonym: same name as a PC member, but another affiliation and other co-authors
+        pc_member = pc_list[offset % pc]
+        person.update({"first": pc_member['first'], "last": pc_member['last'], "name": pc_member['name'],
+                       "affiliation": rng.choice([affiliation for affiliation in affiliation_list if affiliation != pc_member['affiliation']])})
+
+    # Publications: each PC member publishes with a group of co-authors of the community
+    publication_list = []
+    coauthor_dict = {}
+    for pc_member in pc_list:
+        group = rng.sample(community_list, min(len(community_list), max(1, int(rng.gauss(coauthors, coauthors / 4)))))
+        coauthor_dict[pc_member['email']] = group
+        for start in range(0, len(group), 3):
+            publication_list.append((rng.randint(2005, 2021), [pc_member['name']] + [person['name'] for person in group[start:start + 3]]))
+    for person in person_list[pc + community_size:]:
+        publication_list.append((rng.randint(2005, 2021), [person['name']] + [coauthor['name'] for coauthor in rng.sample(community_list, 2)]))
+    rng.shuffle(publication_list)
+
+    # Topics
+    topic_list = ['Topic %s' % (''.join(rng.choice(name_syllables) for index in range(3)).capitalize()) + ' %d' % (index) for index in range(synthetic_topics)]
+    topic_priority = list(range(1, synthetic_topics + 1))
+    rng.shuffle(topic_priority)
+
+    # Papers: the authors come from the community, so some of them are co-authors of PC members
+    paper_rows = []
+    author_rows = []
+    topic_rows = []
+    conflict_rows = []
+    assignment_rows = []
+    author_pc_dict = {}
+    for pc_member in pc_list:
+        for coauthor in coauthor_dict[pc_member['email']]:
+            author_pc_dict.setdefault(coauthor['email'], []).append(pc_member)
+    for paper_id in range(1, papers + 1):
+        title = 'Synthetic Paper %d about %s' % (paper_id, rng.choice(topic_list))
+        authors = rng.sample(community_list, rng.randint(1, synthetic_authors_per_paper))
+        tags = ' '.join(rng.sample(['Accept', 'Discuss', 'Online', 'Revision'], rng.randint(0, 2)))
+        paper_rows.append({"ID": paper_id, "Title": title, "Authors": ', '.join(author['name'] for author in authors),
+                           "# Reviews": synthetic_reviewers_per_paper, "Status": 'Submitted', "OveMer": '', "Tags": tags})
+        for author in authors:
+            author_rows.append({"paper": paper_id, "title": title, "first": author['first'], "last": author['last'], "email": author['email'],
+                                "affiliation": author['affiliation'], "country": 'Synthetic', "iscontact": 'yes'})
+        for topic in rng.sample(topic_list, rng.randint(1, 4)):
+            topic_rows.append({"paper": paper_id, "title": title, "topic": topic})
+        # Most of the co-author conflicts are declared, plus some institutional conflicts
+        conflict_set = set()
+        for author in authors:
+            for pc_member in author_pc_dict.get(author['email'], []):
+                if rng.random() < 0.9:
+                    conflict_set.add(pc_member['email'])
+            for pc_member in pc_list:
+                if pc_member['affiliation'] == author['affiliation'] and rng.random() < 0.5:
+                    conflict_set.add(pc_member['email'])
+        for pc_member in pc_list:
+            if pc_member['email'] in conflict_set:
+                conflict_rows.append({"paper": paper_id, "title": title, "first": pc_member['first'], "last": pc_member['last'],
+                                      "email": pc_member['email'], "conflicttype": 'Collaborator'})
+        reviewer_list = [pc_member for pc_member in pc_list[1:] if pc_member['email'] not in conflict_set]
+        for order, pc_member in enumerate(rng.sample(reviewer_list, min(len(reviewer_list), synthetic_reviewers_per_paper))):
+            assignment_rows.append({"paper": paper_id, "action": 'primary' if order < synthetic_reviewers_per_paper - 1 else 'secondary',
+                                    "email": pc_member['email']})
+        if rng.random() < 0.05:
+            assignment_rows.append({"paper": paper_id, "action": 'clearreview', "email": rng.choice(pc_list)['email']})
+
+    # PC info (HotCRP): most DBLP co-authors are declared as collaborators, plus some that are not in DBLP
+    pcinfo_rows = []
+    availability_rows = []
+    zoom_rows = []
+    for index, pc_member in enumerate(pc_list):
+        collaborators = [coauthor for coauthor in coauthor_dict[pc_member['email']] if rng.random() < 0.8]
+        collaborator_lines = ['%s (%s)' % (coauthor['name'], coauthor['affiliation']) for coauthor in collaborators]
+        collaborator_lines += ['%s %s (%s)' % (first, last, rng.choice(affiliation_list)) for first, last in generate_names(rng, rng.randint(0, 3))]
+        pcinfo_dict = \
+        {
+            "first"         : pc_member['first'],
+            "last"          : pc_member['last'],
+            "email"         : pc_member['email'],
+            "affiliation"   : pc_member['affiliation'],
+            "country"       : 'Synthetic',
+            "roles"         : 'chair pc' if index == 0 else 'pc',
+            "collaborators" : '\n'.join(collaborator_lines),
+            "follow"        : 'reviews'
+        }
+        for topic in topic_list:
+            pcinfo_dict['topic: ' + topic] = rng.choice([None, None, None, -2, -1, 1, 2])
+        pcinfo_rows.append(pcinfo_dict)
+        availability_dict = {"Name": pc_member['name'], "hotcrp_email": pc_member['email']}
+        for timeslot in range(1, synthetic_timeslots + 1):
+            availability_dict[str(timeslot)] = rng.choice([None, None, None, None, '(OK)', '0'])
+        availability_rows.append(availability_dict)
+        zoom_rows.append({"Name": pc_member['name'], "Institution": pc_member['affiliation'], "hotcrp_email": pc_member['email'], "Zoom email 1": 'zoom.' + pc_member['email'],
+                          "Zoom email 2": 'zoom2.' + pc_member['email'] if rng.random() < 0.3 else None})
+
+    zoom_rules = \
+    {
+        "roles"          : [{"name": 'chair', "hotcrp_email": pc_list[0]['email'], "required": True, "fallback": ['co-chair']},
+                            {"name": 'co-chair', "hotcrp_email": pc_list[min(1, pc - 1)]['email']},
+                            {"name": 'student', "hotcrp_email": pc_list[min(2, pc - 1)]['email'], "accounts": ['student@zoom.example.edu']}],
+        "always_in_room" : [{"room": 'discussion', "accounts": ['host@zoom.example.edu']}]
+    }
+
+    # Write the files (the scripts expect the output folder to exist, as in sample-data)
+    os.makedirs(os.path.join(output_folder, 'sample-data/output'), exist_ok=True)
+    def output_path(kind):
+        filename = os.path.join(output_folder, synthetic_files[kind])
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        return filename
+    pd.DataFrame(pcinfo_rows).to_csv(output_path('pcinfo'), index=False)
+    pd.DataFrame(author_rows).to_csv(output_path('authors'), index=False)
+    pd.DataFrame(paper_rows).to_csv(output_path('paperdata'), index=False)
+    pd.DataFrame(conflict_rows, columns=['paper','title','first','last','email','conflicttype']).to_csv(output_path('pcconflicts'), index=False)
+    pd.DataFrame(assignment_rows, columns=['paper','action','email']).to_csv(output_path('pcassignments'), index=False)
+    pd.DataFrame(availability_rows).to_csv(output_path('pcavailability'), index=False)
+    pd.DataFrame(zoom_rows).to_csv(output_path('pczoom'), index=False)
+    pd.DataFrame(topic_rows).to_csv(output_path('topics'), index=False)
+    pd.DataFrame({"topics": topic_list, "priority": topic_priority}).to_csv(output_path('topicspriority'), index=False)
+    with open(output_path('zoomrules'), 'w') as output_file:
+        json.dump(zoom_rules, output_file, indent=4)
+    write_dblp_dump(output_path('dblpdump'), [{"pid": person['pid'], "name": person['name'], "affiliation": person['affiliation']} for person in person_list],
+                    publication_list)
+
+    count_dict = \
+    {
+        "papers"       : papers,
+        "pc"           : pc,
+        "authors"      : len(author_rows),
+        "conflicts"    : len(conflict_rows),
+        "assignments"  : len(assignment_rows),
+        "persons"      : len(person_list),
+        "publications" : len(publication_list)
+    }
+    return count_dict
+
+#%% Command line interface
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic conference for ISCA 2021 Script')
+    parser.add_argument('output_folder', help='folder of the generated files')
+    parser.add_argument('--papers', type=int, default=synthetic_papers, help='number of papers')
+    parser.add_argument('--pc', type=int, default=synthetic_pc, help='number of PC members')
+    parser.add_argument('--coauthors', type=int, default=synthetic_coauthors, help='average number of DBLP co-authors of each PC member')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args(argv)
+    count_dict = generate_dataset(args.output_folder, args.papers, args.pc, args.coauthors, args.seed)
+    print(', '.join('%d %s' % (count, kind) for kind, count in count_dict.items()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
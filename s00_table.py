@@ -0,0 +1,166 @@
+# Project: ISCA 2021 Script
+# Filename: s00_table.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Table Interchange Format for ISCA 2021 Script
+# Description:
+## This script contains the functions to save and load the tables exchanged between the scripts
+## (e.g., the co-authors list from s02 and the conflict crosscheck from s03). Unlike CSV, the tables
+## keep the type of each column, including list columns, so that they can be loaded in bulk
+## without eval.
+##
+## The format is chosen from the file extension:
+##   .parquet          : Apache Parquet (requires pyarrow)
+##   .json.gz / .json  : columnar JSON bundle, no extra library is needed
+##
+## The script can also be run from the command line to inspect a table:
+##   python s00_table.py show FILE [--rows N]
+##   python s00_table.py export FILE CSV_FILE
+
+#%% Import some libraries that are needed
+import os
+import sys
+import gzip
+import json
+import argparse
+import pandas as pd
+from s00_instrument import timed
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+#%% Define constant
+# Name and version of the columnar JSON bundle
+table_format_name = 'isca2021-table'
+table_format_version = 1
+
+#%% Function to get the type of a column
+## Returns 'list' for columns containing lists, 'str' for columns containing strings, 'object' for
+## columns containing both (e.g., a list or '#NA'), otherwise the pandas dtype name
+def column_type(column):
+    if column.dtype == object or str(column.dtype) in ('str', 'string'):
+        is_list = [isinstance(value, (list, tuple)) for value in column]
+        if any(is_list):
+            values = [value for value, value_is_list in zip(column, is_list) if not value_is_list]
+            if all(value is None or (isinstance(value, float) and pd.isna(value)) for value in values):
+                return 'list'
+            return 'object'
+        return 'str'
+    return str(column.dtype)
+
+#%% Function to convert a column to JSON values
+def column_to_json(column, type_name):
+    if type_name == 'list':
+        return [None if not isinstance(value, (list, tuple)) else list(value) for value in column]
+    if type_name in ('str', 'object'):
+        return [list(value) if isinstance(value, (list, tuple)) else None if pd.isna(value) else value for value in column]
+    # Numeric and boolean columns, NaN is stored as null
+    return column.astype(object).where(column.notna(), None).tolist()
+
+#%% Function to save a DataFrame as columnar JSON bundle
+def save_json_table(df, filename):
+    bundle = \
+    {
+        "format"  : table_format_name,
+        "version" : table_format_version,
+        "rows"    : int(df.shape[0]),
+        "columns" : []
+    }
+    for name in df.columns:
+        type_name = column_type(df[name])
+        bundle['columns'].append({"name": str(name), "type": type_name, "values": column_to_json(df[name], type_name)})
+    json_bytes = json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(filename, 'wb') as table_file:
+        if filename.endswith('.gz'):
+            # No timestamp in the header, so that the same table always gives the same file
+            with gzip.GzipFile(filename='', mode='wb', fileobj=table_file, mtime=0) as gzip_file:
+                gzip_file.write(json_bytes)
+        else:
+            table_file.write(json_bytes)
+
+#%% Function to load a columnar JSON bundle as DataFrame
+def load_json_table(filename, columns=None):
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rt', encoding='utf-8') as table_file:
+        bundle = json.load(table_file)
+    if bundle.get('format') != table_format_name or bundle.get('version') != table_format_version:
+        raise ValueError('%s is not a table saved by s00_table.py' % (filename))
+    data = {}
+    for column in bundle['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        type_name = column['type']
+        if type_name in ('list', 'str', 'object'):
+            data[column['name']] = pd.Series(column['values'], dtype=object)
+        elif type_name.startswith('int') and None in column['values']:
+            # Integer column with missing values (should not happen, but keep the values)
+            data[column['name']] = pd.Series(column['values'], dtype='float64')
+        else:
+            data[column['name']] = pd.Series(column['values'], dtype=object).astype(type_name)
+    df = pd.DataFrame(data, index=pd.RangeIndex(bundle['rows']))
+    if columns is not None:
+        df = df[[name for name in columns if name in df.columns]]
+    return df
+
+#%% Function to save a DataFrame as table
+@timed()
+def save_table(df, filename):
+    table_dir = os.path.dirname(filename)
+    if table_dir and not os.path.exists(table_dir):
+        os.makedirs(table_dir, exist_ok=True)
+    if filename.endswith('.parquet'):
+        if pyarrow is None:
+            raise ImportError('pyarrow is needed to save %s, use .json.gz instead' % (filename))
+        df.to_parquet(filename, index=False)
+    elif filename.endswith('.json') or filename.endswith('.json.gz'):
+        save_json_table(df, filename)
+    else:
+        raise ValueError('Unknown table format of %s (.parquet, .json or .json.gz)' % (filename))
+
+#%% Function to load a table as DataFrame
+## List columns are returned as Python lists in both formats
+@timed()
+def load_table(filename, columns=None):
+    if filename.endswith('.parquet'):
+        if pyarrow is None:
+            raise ImportError('pyarrow is needed to load %s' % (filename))
+        df = pd.read_parquet(filename, columns=columns)
+        for name in df.columns:
+            if df[name].dtype == object:
+                df[name] = [value.tolist() if hasattr(value, 'tolist') else value for value in df[name]]
+        return df
+    elif filename.endswith('.json') or filename.endswith('.json.gz'):
+        return load_json_table(filename, columns)
+    else:
+        raise ValueError('Unknown table format of %s (.parquet, .json or .json.gz)' % (filename))
+
+#%% Command line interface
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect the tables exchanged between the ISCA 2021 scripts.')
+    subparsers = parser.add_subparsers(dest='command')
+    show_parser = subparsers.add_parser('show', help='print the column types and the first rows of a table')
+    show_parser.add_argument('file', help='table file (.parquet, .json or .json.gz)')
+    show_parser.add_argument('--rows', type=int, default=5, help='number of rows to print')
+    export_parser = subparsers.add_parser('export', help='export a table to CSV (e.g., to inspect it with Excel)')
+    export_parser.add_argument('file', help='table file (.parquet, .json or .json.gz)')
+    export_parser.add_argument('csv_file', help='output CSV file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        df = load_table(args.file)
+        print('%d rows' % (df.shape[0]))
+        for name in df.columns:
+            print('%-28s %s' % (name, column_type(df[name])))
+        print(df.head(args.rows).to_string())
+    elif args.command == 'export':
+        df = load_table(args.file)
+        df.to_csv(args.csv_file, index=False)
+        print('Exported %d rows to %s' % (df.shape[0], args.csv_file))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
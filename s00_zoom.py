@@ -0,0 +1,198 @@
+# Project: ISCA 2021 Script
+# Filename: s00_zoom.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Zoom Breakout Room Functions for ISCA 2021 Script
+# Description:
+## This script contains the functions used by s07 to generate the Zoom breakout room files.
+## The conflicts are encoded as a paper x PC member boolean matrix, so the room of every PC member
+## on every paper is obtained by masking instead of looping over the PC members of each paper.
+## The CSV lines of each PC member (for both rooms) are built once and every room file is
+## assembled from them, then all files are written in one pass (or into a single ZIP archive).
+##
+## The accounts of the chairs and helpers are described in a rules file (JSON), e.g.:
+##   {
+##     "roles": [
+##       {"name": "chair", "hotcrp_email": "chair@uni.edu", "required": true, "fallback": ["co-chair"]},
+##       {"name": "co-chair", "hotcrp_email": "cochair@uni.edu"},
+##       {"name": "student", "hotcrp_email": "student@uni.edu", "accounts": ["student@zoom.edu"]}
+##     ],
+##     "always_in_room": [{"room": "discussion", "accounts": ["host@zoom.edu"]}]
+##   }
+## - A role is a PC member (hotcrp_email). Its Zoom accounts are taken from the Zoom sheet of the PC
+##   members, unless "accounts" is given: then these accounts are added to every paper, in the
+##   conflict room if the role is in conflict with the paper and in the discussion room otherwise.
+## - A "required" role must be in the discussion room of every paper. If it is not (conflict or not
+##   in the Zoom sheet), the first available role of its "fallback" list replaces it. Papers where
+##   a required role is replaced or where no role is available are listed in the validation report.
+## - The "always_in_room" accounts are added to every paper in the given room ("discussion" or
+##   "conflict").
+## The rules are compiled once and applied to all papers at once.
+
+#%% Import some libraries that are needed
+import os
+import io
+import csv
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from s00_instrument import timed
+
+#%% Function to encode the PC conflicts of the papers as a paper x PC member boolean matrix
+## conflict_lists is the list of PC conflict emails of each paper ('#NA' or any non-list value means
+## no conflict) and pc_email_list is the email of each column of the matrix.
+def conflict_matrix(conflict_lists, pc_email_list):
+    pc_index = {}
+    for column, email in enumerate(pc_email_list):
+        pc_index.setdefault(email, []).append(column)
+    conflict_lists = list(conflict_lists)
+    conflict = np.zeros((len(conflict_lists), len(pc_email_list)), dtype=bool)
+    for row, conflict_list in enumerate(conflict_lists):
+        if not isinstance(conflict_list, list):
+            continue
+        for email in conflict_list:
+            conflict[row, pc_index.get(email, [])] = True
+    return conflict
+
+#%% Function to format rows as CSV lines (same format as pandas to_csv)
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in rows:
+        writer.writerow(['' if value is None or value != value else value for value in row])
+    return buffer.getvalue()
+
+#%% Function to build the participant lines of each PC member in a room
+## Each PC member is added with Zoom email 1, and also with Zoom email 2 if it is a different account
+## ('#na' means no second account). Returns one string of CSV lines per PC member.
+def participant_lines(pc_member_zoom_info_df, room):
+    line_list = []
+    for zoom_email_1, zoom_email_2 in zip(pc_member_zoom_info_df['Zoom email 1'], pc_member_zoom_info_df['Zoom email 2']):
+        rows = [[room, zoom_email_1]]
+        if(zoom_email_1!=zoom_email_2 and zoom_email_2 != '#na'):
+            # Multiple zoom account handle
+            rows.append([room, zoom_email_2])
+        line_list.append(csv_lines(rows))
+    return np.array(line_list, dtype=object)
+
+#%% Function to assemble the room files of every paper
+## conflict is the paper x PC member matrix, the lines are per PC member (see participant_lines) and
+## extra_lines is the list of additional CSV lines of each paper. Returns the list of file contents.
+@timed()
+def room_files(conflict, discussion_lines, conflict_lines, header, extra_lines=None):
+    files = []
+    for row in range(conflict.shape[0]):
+        lines = np.where(conflict[row], conflict_lines, discussion_lines)
+        content = header + ''.join(lines)
+        if extra_lines is not None:
+            content = content + extra_lines[row]
+        files.append(content)
+    return files
+
+#%% Function to write the output files in one pass
+## files is a list of (filename, content). If archive_filename is given, the files are written into
+## a single ZIP archive (with a fixed timestamp, so the archive only changes if a file changes)
+## instead of the folders. The files are stored in the archive relative to the folder of the archive.
+@timed()
+def write_files(files, archive_filename=None):
+    if archive_filename is not None:
+        if os.path.dirname(archive_filename):
+            os.makedirs(os.path.dirname(archive_filename), exist_ok=True)
+        with zipfile.ZipFile(archive_filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for filename, content in files:
+                arcname = os.path.relpath(os.path.abspath(filename), os.path.dirname(os.path.abspath(archive_filename)))
+                archive.writestr(zipfile.ZipInfo(arcname, date_time=(2021, 3, 16, 0, 0, 0)), content.encode('utf-8'), zipfile.ZIP_DEFLATED)
+        return
+    for folder in sorted(set(os.path.dirname(filename) for filename, content in files)):
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+    for filename, content in files:
+        with open(filename, 'w', newline='') as output_file:
+            output_file.write(content)
+
+#%% Function to load the rules of the chair and helper accounts
+def load_zoom_rules(filename):
+    with open(filename, 'r') as input_file:
+        return json.load(input_file)
+
+#%% Function to compile the rules of the chair and helper accounts
+## pc_email_list is the HotCRP email of the PC members in the Zoom sheet and room_names maps
+## 'discussion' and 'conflict' to the name of the rooms. Raises ValueError if the rules are invalid.
+def compile_zoom_rules(rules, pc_email_list, room_names):
+    roles = rules.get('roles', [])
+    role_index = {}
+    for role in roles:
+        if 'name' not in role or 'hotcrp_email' not in role:
+            raise ValueError('Every role needs a name and a hotcrp_email: %s' % (role))
+        if role['name'] in role_index:
+            raise ValueError('Role %s is defined more than once' % (role['name']))
+        role_index[role['name']] = len(role_index)
+    for role in roles:
+        for fallback in role.get('fallback', []):
+            if fallback not in role_index:
+                raise ValueError('Unknown fallback role %s of role %s' % (fallback, role['name']))
+    always_rows = []
+    for entry in rules.get('always_in_room', []):
+        if entry.get('room') not in room_names:
+            raise ValueError('Unknown room %s, it must be one of %s' % (entry.get('room'), ', '.join(room_names)))
+        always_rows.extend([room_names[entry['room']], account] for account in entry.get('accounts', []))
+
+    pc_email_set = set(pc_email_list)
+    compiled_rules = \
+    {
+        "role_name"     : [role['name'] for role in roles],
+        "role_email"    : [role['hotcrp_email'] for role in roles],
+        # A role without its own accounts can only join through the Zoom sheet
+        "role_in_sheet" : np.array([('accounts' in role) or (role['hotcrp_email'] in pc_email_set) for role in roles], dtype=bool),
+        "role_accounts" : [role.get('accounts', []) for role in roles],
+        "required"      : [role_index[role['name']] for role in roles if role.get('required', False)],
+        "fallback"      : {role_index[role['name']]: [role_index[fallback] for fallback in role.get('fallback', [])] for role in roles},
+        "always_lines"  : csv_lines(always_rows),
+        "room_names"    : room_names
+    }
+    return compiled_rules
+
+#%% Function to apply the compiled rules to all papers
+## Returns (extra_lines, report): the additional CSV lines of the room file of each paper, and the
+## validation report (paper, role, status, replaced by) of the papers where a required role is not
+## in the discussion room.
+## conflict_lists are the conflicts used for the rooms of the PC members (they decide whether a
+## required role is in the discussion room). The accounts of a role follow what the role can see on
+## HotCRP, i.e., hotcrp_conflict_lists (default: conflict_lists).
+@timed()
+def apply_zoom_rules(compiled_rules, paper_id_list, conflict_lists, hotcrp_conflict_lists=None):
+    paper_id_list = list(paper_id_list)
+    role_conflict = conflict_matrix(conflict_lists, compiled_rules['role_email'])
+    available = ~role_conflict & compiled_rules['role_in_sheet'][np.newaxis, :]
+    account_conflict = role_conflict if hotcrp_conflict_lists is None else conflict_matrix(hotcrp_conflict_lists, compiled_rules['role_email'])
+
+    # The additional lines only depend on which roles are in conflict with the paper on HotCRP
+    room_names = compiled_rules['room_names']
+    patterns, pattern_index = np.unique(account_conflict, axis=0, return_inverse=True)
+    pattern_lines = []
+    for pattern in patterns:
+        rows = []
+        for is_conflict, accounts in zip(pattern, compiled_rules['role_accounts']):
+            rows.extend([room_names['conflict' if is_conflict else 'discussion'], account] for account in accounts)
+        pattern_lines.append(compiled_rules['always_lines'] + csv_lines(rows))
+    extra_lines = [pattern_lines[index] for index in np.asarray(pattern_index).ravel()]
+
+    report_list = []
+    for role in compiled_rules['required']:
+        replacement = np.full(len(paper_id_list), -1)
+        for fallback in reversed(compiled_rules['fallback'][role]):
+            replacement = np.where(available[:, fallback], fallback, replacement)
+        for row in np.flatnonzero(~available[:, role]):
+            report_dict = \
+            {
+                "paper"       : paper_id_list[row],
+                "role"        : compiled_rules['role_name'][role],
+                "status"      : 'replaced' if replacement[row] >= 0 else 'unavailable',
+                "replaced by" : compiled_rules['role_name'][replacement[row]] if replacement[row] >= 0 else ''
+            }
+            report_list.append(report_dict)
+    report_df = pd.DataFrame(report_list, columns=['paper', 'role', 'status', 'replaced by'])
+    report_df.sort_values(['paper', 'role'], inplace=True, kind='stable')
+    report_df.reset_index(drop=True, inplace=True)
+    return extra_lines, report_df
@@ -18,10 +18,19 @@ import tqdm
 import os
 from fuzzywuzzy import fuzz
 from s00_function import request_author_key
+from s00_function import request_author_key_batch
+from s00_function import get_http_client
 from s00_function import merge_affiliation
 from s00_function import convert_to_dict
-from s00_function import filter_name
-from s00_function import filter_affiliation
+from s00_function import resolve_candidates
+from s00_incremental import fingerprint
+from s00_incremental import load_fingerprints
+from s00_incremental import save_fingerprints
+from s00_incremental import changed_keys
+from s00_incremental import merge_incremental
+from s00_incremental import print_incremental_summary
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
 
 #%% Define the input and output CSV filename
 # Input CSV filename
@@ -32,50 +41,75 @@ pc_info_hotcrp_filename = 'sample-data/input/isca2021-pcinfo.csv'
 
 # Output CSV filename
 pc_to_dblp_filename = 'sample-data/output/isca2021-pc-to-dblp.csv'
+# Run report (see s00_instrument.py)
+run_report_filename = 'sample-data/output/isca2021-s01-run-report.json'
 
-# %% Load Input CSV to Pandas Dataframe
-# Load the PC Info from HotCRP
-pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
+#%% Define constant
+# Incremental mode: only look up the PC members that are new or whose name or affiliation has changed
+# since the previous run. The rows of the other PC members (including your manual changes) are kept.
+incremental = True
 
-# %% Sanitize
-# Construct and Sanitize First name and Last name
-pc_members_name = pd.DataFrame(pc_info_hotcrp_df['first'] + " " + pc_info_hotcrp_df['last'], columns = ['full'])
-pc_members_name['split'] = pc_members_name['full'].str.split()
-pc_members_name['last'] = pc_members_name['split'].str[-1]
-pc_members_name['first'] = pc_members_name.apply(lambda x: x['full'].replace(" " + x['last'],""), axis=1)
-pc_members_name['affiliation'] = pc_info_hotcrp_df['affiliation']
-pc_members_name['email'] = pc_info_hotcrp_df['email']
-del pc_members_name['split']
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s01')
 
-# %% Request DBLP Person ID for each PC Members
-pc_members_list = []
+    # %% Load Input CSV to Pandas Dataframe
+    # Load the PC Info from HotCRP
+    pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
 
-for index,pc_member in tqdm.tqdm(pc_members_name.iterrows(), total=pc_members_name.shape[0]):
-    pc_json = request_author_key(pc_member["first"], pc_member["last"])    
-    pc_member_dblp_list = convert_to_dict(pc_member, pc_json)
-    confidence_level=100
-    pc_member_dblp_list_filtered = []
-    
-    # Filtering by name with the highest confidence level
-    # then gradually reducing the confidence level until at least one item come up.
+    # %% Sanitize
+    # Construct and Sanitize First name and Last name
+    pc_members_name = pd.DataFrame(pc_info_hotcrp_df['first'] + " " + pc_info_hotcrp_df['last'], columns = ['full'])
+    pc_members_name['split'] = pc_members_name['full'].str.split()
+    pc_members_name['last'] = pc_members_name['split'].str[-1]
+    pc_members_name['first'] = [full.replace(" " + last,"") for full,last in zip(pc_members_name['full'], pc_members_name['last'])]
+    pc_members_name['affiliation'] = pc_info_hotcrp_df['affiliation']
+    pc_members_name['email'] = pc_info_hotcrp_df['email']
+    del pc_members_name['split']
+
+    # %% Find the PC members that have changed since the previous run
+    # Only the input row is used: the result of each PC member is checked (and edited) manually,
+    # so it is not overwritten just because DBLP returns something different.
+    fingerprint_dict = {email: {'input': fingerprint(first, last, affiliation), 'dependency': None}
+                        for first, last, affiliation, email in zip(pc_members_name['first'], pc_members_name['last'], pc_members_name['affiliation'], pc_members_name['email'])}
+    previous_fingerprint_dict = load_fingerprints(pc_to_dblp_filename) if incremental else {}
+    changed = changed_keys(fingerprint_dict, previous_fingerprint_dict)
+    print_incremental_summary(changed, len(fingerprint_dict))
+    pc_members_all = pc_members_name
+    pc_members_name = pc_members_name[pc_members_name['email'].isin(changed)]
+
+    # %% Request DBLP Person ID for each PC Members
+    # Fetch all PC members at once, cached names are not requested again
+    pc_json_list = request_author_key_batch(list(zip(pc_members_name['first'], pc_members_name['last'])))
+    print('DBLP requests: %(requests)d, retries: %(retries)d, failures: %(failures)d, total latency: %(total_latency).1fs' % get_http_client().summary())
+
+    pc_member_dblp_lists = []
+    for (index,pc_member),pc_json in tqdm.tqdm(zip(pc_members_name.iterrows(), pc_json_list), total=pc_members_name.shape[0]):
+        pc_member_dblp_lists.append(convert_to_dict(pc_member, pc_json))
+
+    # %% Filter the candidates of each PC Members
+    # The name and affiliation of every candidate are scored once, then only the candidates with the
+    # highest name score are kept, followed by filtering by affiliation.
     # This is not 100% perfect.
-    while(len(pc_member_dblp_list_filtered)<1):
-        pc_member_dblp_list_filtered=filter_name(pc_member_dblp_list, confidence_level)
-        confidence_level=confidence_level-1
-    pc_member_dblp_list = pc_member_dblp_list_filtered   
-    pc_member_dblp_list_filtered = filter_affiliation(pc_member_dblp_list)
-    
-    # Filtering by Affiliation
-    if(len(pc_member_dblp_list_filtered)>0):
-        pc_member_dblp_list = pc_member_dblp_list_filtered
-    
+    pc_member_dblp_lists = resolve_candidates(pc_member_dblp_lists)
+
     # Add to the Final List
-    pc_members_list = pc_members_list + pc_member_dblp_list
+    pc_members_list = [pc_member_dict for pc_member_dblp_list in pc_member_dblp_lists for pc_member_dict in pc_member_dblp_list]
+
+    # %% Write Output to CSV
+    # This CSV needs to be inspected manually.
+    ## NOTE: To avoid overwritting, rename the final CSV file to something else.
+    pc_members_df = pd.DataFrame(pc_members_list)
+    if previous_fingerprint_dict:
+        pc_members_df = merge_incremental(pd.read_csv(pc_to_dblp_filename), pc_members_df, 'email', pc_members_all['email'], changed)
+    pc_members_df.to_csv(pc_to_dblp_filename, index=False)
+    save_fingerprints(pc_to_dblp_filename, fingerprint_dict)
 
-# %% Write Output to CSV
-# This CSV needs to be inspected manually.
-## NOTE: To avoid overwritting, rename the final CSV file to something else.
-pc_members_df = pd.DataFrame(pc_members_list)
-pc_members_df.to_csv(pc_to_dblp_filename, index=False)
+    # %% Write the run report
+    write_run_report(run_report_filename)
 
-# %%
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,23 @@
 import pandas as pd
 import numpy as np
 import tqdm
+import ast
+import os
 from datetime import datetime
-from s00_function import request_publication_list
+from s00_function import request_person_record_batch
+from s00_function import get_http_client
+from s00_coauthor_graph import CoauthorGraph
+from s00_coauthor_graph import load_coauthor_graph
+from s00_incremental import fingerprint
+from s00_incremental import load_fingerprints
+from s00_incremental import save_fingerprints
+from s00_incremental import changed_keys
+from s00_incremental import carry_fingerprints
+from s00_incremental import person_records_fingerprint
+from s00_incremental import print_incremental_summary
+from s00_table import save_table
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
 
 #%% Define the input and output CSV filename
 # Input CSV filename
@@ -21,95 +36,120 @@ from s00_function import request_publication_list
 ## It is obtained after sanitized and manually checked the result of s01_pcname_to_dblp_person_id.py.
 pc_to_dblp_filename = 'sample-data/output/isca2021-pc-to-dblp.csv'
 
-# Output CSV filename
-pc_coauthors_dblp_filename = 'sample-data/output/isca2021-pccoauthors.csv'
+# Output table filename (see s00_table.py, use .parquet if pyarrow is installed)
+pc_coauthors_dblp_filename = 'sample-data/output/isca2021-pccoauthors.json.gz'
+pc_coauthors_graph_filename = 'sample-data/output/isca2021-pccoauthors-graph.npz'
+# Run report (see s00_instrument.py)
+run_report_filename = 'sample-data/output/isca2021-s02-run-report.json'
 
 # %% Set the Threshold Date
 # This date is to limit the oldest publication that is still considered as conflict
 threshold_year = 2016
 
-# %%# Load Input CSV to Pandas Dataframe
-# Load the PC DBLP 
-pc_to_dblp_df = pd.read_csv(pc_to_dblp_filename, converters={
-    'affiliation_dblp': eval
-    })
-
-# %% Fetch all co-authors for each PC member.
-# Initialize Empty List
-pc_coauthors_list = []
-for index,pc_member in tqdm.tqdm(pc_to_dblp_df.iterrows(), total=pc_to_dblp_df.shape[0]):
-    xml_dict = request_publication_list(pc_member['url_dblp'])
-    list_pub = xml_dict['dblpperson']['r']
-    # For single publication, only dictionary is returned. We need to convert to list.
-    if isinstance(list_pub, dict):
-        list_pub = [list_pub]
-    # Prepare coauthors list for pc_member
-    coauthors_name_list = []
-    coauthors_url_list  = []
-    # Initiliaze the list with the PC's name and dblp url to avoid entering PC's name to the list
-    # We will remove this at the end of the process.
-    coauthors_name_list.append(pc_member['name_dblp'])
-    coauthors_url_list.append(pc_member['url_dblp'])
-    
-    # Loop through all publications
-    for pub in list_pub:
-        for bib in pub.items():
-            # Check the publication date whether it is younger than threshold
-            #bib_date = datetime.strptime(bib[1]['@mdate'], '%Y-%m-%d')
-            bib_year = int(bib[1]['year'])
-            # If younger, then store the co-authors
-            if(bib_year>=threshold_year): 
-                # Sometimes they use key 'author' or 'editor'
-                # We need to check both of them
-                try:
-                    authors = bib[1]['author']
-                except:
-                    authors = bib[1]['editor']
-                # Sometime, only single author is returned, and thus a dict is returned.
-                # We need to convert it to list.
-                if isinstance(authors, dict):
-                    authors = [authors]
-                
-                # Now, loop for each authors
-                for author in authors:
-                    url_dblp  = 'https://dblp.org/pid/' + author['@pid']
-                    name_dblp = author['#text'].translate({ord(ch): None for ch in '0123456789'}).rstrip()
-                    # Make sure the list always contains unique value
-                    if url_dblp not in coauthors_url_list:
-                        coauthors_name_list.append(name_dblp)
-                        coauthors_url_list.append(url_dblp)
-    
-    # Remove the PC's name and dblp url.
-    coauthors_name_list.pop(0)
-    coauthors_url_list.pop(0)
-    # Construct Dictionary
-    pc_member_dblp_dict = \
-    {
-        "full_name"             : pc_member['full_name'],
-        "first_name"            : pc_member['first_name'],
-        "last_name"             : pc_member['last_name'],
-        "affiliation"           : pc_member['affiliation'],
-        "email"                 : pc_member['email'],
-        "name_dblp"             : pc_member['name_dblp'],
-        "url_dblp"              : pc_member['url_dblp'],
-        "affiliation_dblp"      : pc_member['affiliation_dblp'],
-        "coauthors_name_dblp"   : coauthors_name_list,
-        "coauthors_url_dblp"    : coauthors_url_list
-    }
-    # Put into the list
-    pc_coauthors_list.append(pc_member_dblp_dict)
-
-# %% Convert pc_coauthors_list to Pandas DF and remove duplicates
-pc_coauthors_df = pd.DataFrame(pc_coauthors_list)
-
-# Convert Name DBLP and URL DBLP to List
-pc_coauthors_df['name_dblp'] = pc_coauthors_df.apply(lambda row : [row['name_dblp']], axis = 1)
-pc_coauthors_df['url_dblp'] = pc_coauthors_df.apply(lambda row : [row['url_dblp']], axis = 1)
-
-# Merge based on email
-pc_coauthors_df = pc_coauthors_df.groupby(['full_name','first_name','last_name','affiliation','email'], as_index=False).sum()
-
-# %% Save the pc_coauthors_list to CSV
-pc_coauthors_df.to_csv(pc_coauthors_dblp_filename, index=False)
-
-# %%
+#%% Define constant
+# Incremental mode: only fetch and parse the PC members whose rows in the input CSV or whose cached
+# DBLP records have changed since the previous run. The co-authors of the other PC members are
+# taken from the co-author graph saved by the previous run.
+incremental = True
+# Columns of the input CSV used by this script
+pc_input_columns = ['full_name','first_name','last_name','affiliation','name_dblp','url_dblp','affiliation_dblp']
+
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s02')
+
+    # %%# Load Input CSV to Pandas Dataframe
+    # Load the PC DBLP 
+    ## This CSV is edited by hand, so the list column is parsed as a Python literal (never evaluated)
+    pc_to_dblp_df = pd.read_csv(pc_to_dblp_filename, converters={
+        'affiliation_dblp': ast.literal_eval
+        })
+
+    # %% Find the PC members that have changed since the previous run
+    # The DBLP part of the fingerprint is only computed from the records that are already in the cache,
+    # no request is sent to DBLP for the PC members that have not changed.
+    fingerprint_dict = {}
+    for email,pc_rows in pc_to_dblp_df.groupby('email', sort=False):
+        fingerprint_dict[email] = \
+        {
+            "input"      : fingerprint(pc_rows[pc_input_columns].values.tolist(), threshold_year),
+            "dependency" : person_records_fingerprint(pc_rows['url_dblp'], threshold_year)
+        }
+    previous_fingerprint_dict = {}
+    if incremental and os.path.exists(pc_coauthors_graph_filename):
+        previous_fingerprint_dict = load_fingerprints(pc_coauthors_dblp_filename)
+    changed = changed_keys(fingerprint_dict, previous_fingerprint_dict)
+    print_incremental_summary(changed, len(fingerprint_dict))
+
+    # %% Fetch all co-authors for each changed PC member.
+    # Fetch all person records at once, cached links are not requested again
+    # Publications older than threshold_year are skipped while parsing the DBLP XML
+    pc_changed_df = pc_to_dblp_df[pc_to_dblp_df['email'].isin(changed)]
+    person_record_list = request_person_record_batch(pc_changed_df['url_dblp'].to_list(), threshold_year=threshold_year)
+    print('DBLP requests: %(requests)d, retries: %(retries)d, failures: %(failures)d, total latency: %(total_latency).1fs' % get_http_client().summary())
+    for email,pc_rows in pc_changed_df.groupby('email', sort=False):
+        fingerprint_dict[email]['dependency'] = person_records_fingerprint(pc_rows['url_dblp'], threshold_year)
+    fingerprint_dict = carry_fingerprints(fingerprint_dict, previous_fingerprint_dict, changed)
+
+    # %% Build the co-author graph of the whole committee
+    # Each co-author is interned once and the co-authorships are stored with the most recent year
+    # and the number of papers. The graph is saved so that the next scripts can query it directly.
+    # The PC members that have not changed are copied from the graph of the previous run.
+    coauthor_graph = CoauthorGraph(threshold_year)
+    person_record_dict = dict(zip(pc_changed_df['url_dblp'], person_record_list))
+    previous_coauthor_graph = load_coauthor_graph(pc_coauthors_graph_filename) if previous_fingerprint_dict else None
+    for index,pc_member in pc_to_dblp_df.iterrows():
+        if pc_member['email'] in changed:
+            coauthor_graph.add_person(pc_member['url_dblp'], pc_member['name_dblp'], person_record_dict[pc_member['url_dblp']]['publications'])
+        else:
+            coauthor_graph.copy_person(previous_coauthor_graph, pc_member['url_dblp'])
+    coauthor_graph.freeze()
+    coauthor_graph.save(pc_coauthors_graph_filename)
+
+    # %% Collect the co-authors of each PC member from the graph
+    # Initialize Empty List
+    pc_coauthors_list = []
+    for index,pc_member in tqdm.tqdm(pc_to_dblp_df.iterrows(), total=pc_to_dblp_df.shape[0]):
+        # The co-authors are unique and do not contain the PC member
+        coauthors = coauthor_graph.coauthors(pc_member['url_dblp'], threshold_year)
+        coauthors_url_list  = ['https://dblp.org/pid/' + author_pid for author_pid, author_name, last_year, paper_count in coauthors]
+        coauthors_name_list = [author_name.translate({ord(ch): None for ch in '0123456789'}).rstrip() for author_pid, author_name, last_year, paper_count in coauthors]
+        # Construct Dictionary
+        pc_member_dblp_dict = \
+        {
+            "full_name"             : pc_member['full_name'],
+            "first_name"            : pc_member['first_name'],
+            "last_name"             : pc_member['last_name'],
+            "affiliation"           : pc_member['affiliation'],
+            "email"                 : pc_member['email'],
+            "name_dblp"             : pc_member['name_dblp'],
+            "url_dblp"              : pc_member['url_dblp'],
+            "affiliation_dblp"      : pc_member['affiliation_dblp'],
+            "coauthors_name_dblp"   : coauthors_name_list,
+            "coauthors_url_dblp"    : coauthors_url_list
+        }
+        # Put into the list
+        pc_coauthors_list.append(pc_member_dblp_dict)
+
+    # %% Convert pc_coauthors_list to Pandas DF and remove duplicates
+    pc_coauthors_df = pd.DataFrame(pc_coauthors_list)
+
+    # Convert Name DBLP and URL DBLP to List
+    pc_coauthors_df['name_dblp'] = pc_coauthors_df.apply(lambda row : [row['name_dblp']], axis = 1)
+    pc_coauthors_df['url_dblp'] = pc_coauthors_df.apply(lambda row : [row['url_dblp']], axis = 1)
+
+    # Merge based on email
+    pc_coauthors_df = pc_coauthors_df.groupby(['full_name','first_name','last_name','affiliation','email'], as_index=False).sum()
+
+    # %% Save the pc_coauthors_list as table
+    save_table(pc_coauthors_df, pc_coauthors_dblp_filename)
+    save_fingerprints(pc_coauthors_dblp_filename, fingerprint_dict)
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
@@ -12,90 +12,121 @@
 import pandas as pd
 import numpy as np
 import tqdm
-import re
-from fuzzywuzzy import process
+from s00_name_match import crosscheck_names_batch
+from s00_table import load_table
+from s00_table import save_table
+from s00_incremental import fingerprint
+from s00_incremental import load_fingerprints
+from s00_incremental import save_fingerprints
+from s00_incremental import changed_keys
+from s00_incremental import merge_incremental
+from s00_incremental import print_incremental_summary
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
+
 #%% Define the input and output CSV filename
 # Input CSV filename
 pc_info_hotcrp_filename = 'sample-data/input/isca2021-pcinfo.csv'
 
-pc_coauthors_dblp_filename = 'sample-data/output/isca2021-pccoauthors.csv'
-
-# Output CSV filename
-pc_coauthors_conflict_crosscheck_filename = 'sample-data/output/isca2021-pcconflict-crosscheck.csv'
-
-# %%# Load Input CSV to Pandas Dataframe
-# Load the PC Info HotCRP
-pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
-
-# Load the PC Coauthors DBLP
-pc_coauthors_dblp_df = pd.read_csv(pc_coauthors_dblp_filename, converters={
-    'name_dblp': eval, 
-    'url_dblp': eval, 
-    'affiliation_dblp': eval,
-    'coauthors_name_dblp': eval, 
-    'coauthors_url_dblp': eval}
-    )
-
-# %% Sanitize PC Info HotCRP Collaborator (e.g., convert to list)
-
-# Fill NA
-pc_info_hotcrp_df['collaborators'] = pc_info_hotcrp_df['collaborators'].fillna(' ')
-
-# Remove affiliation name
-pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df.apply(lambda row: re.sub(r'\s\([^)]*\)', '', row['collaborators']), axis=1)
-pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df.apply(lambda row: re.sub(r'\([^)]*\)', '', row['collaborators_name']), axis=1)
-pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df.apply(lambda row: row['collaborators_name'].split('\n'), axis=1)
-
-# %% Cross Check HotCRP to DBLP
-hotcrp_to_dblp_crosschecks_list = []
-for index,pc_member in tqdm.tqdm(pc_info_hotcrp_df.iterrows(), total=pc_info_hotcrp_df.shape[0]):
-    conflict_only_on_hotcrp = []
-    email = pc_member['email']
-    conflicts_from_dblp = pc_coauthors_dblp_df.loc[pc_coauthors_dblp_df['email']==email]['coauthors_name_dblp'].to_list()[0] 
-
-    if(len(conflicts_from_dblp)!=0):
-        for conflict_hotcrp in pc_member['collaborators_name']:
-            highest = process.extractOne(conflict_hotcrp,conflicts_from_dblp)
-            if(highest[1]<90):
-                conflict_only_on_hotcrp.append(conflict_hotcrp)
-
-    hotcrp_to_dblp_crosschecks_dict = \
-    {
-        "email"                : email,
-        "conflict_only_hotcrp" : conflict_only_on_hotcrp
-    }
-    hotcrp_to_dblp_crosschecks_list.append(hotcrp_to_dblp_crosschecks_dict)
-
-# %% Cross Check DBLP to HotCRP
-dblp_to_hotcrp_crosschecks_list = []
-for index,pc_member in tqdm.tqdm(pc_coauthors_dblp_df.iterrows(), total=pc_coauthors_dblp_df.shape[0]):
-    conflict_only_on_dblp_name = []
-    conflict_only_on_dblp_url = []
-    email = pc_member['email']
-    conflicts_from_hotcrp= pc_info_hotcrp_df.loc[pc_info_hotcrp_df['email']==email]['collaborators_name'].to_list()[0] 
-    if(len(conflicts_from_hotcrp)!=0):
-        for name_dblp,url_dblp in zip(pc_member['coauthors_name_dblp'],pc_member['coauthors_url_dblp']) :
-            highest = process.extractOne(name_dblp,conflicts_from_hotcrp)
-            if(highest[1]<90):
-                conflict_only_on_dblp_name.append(name_dblp)
-                conflict_only_on_dblp_url.append(url_dblp)
-    dblp_to_hotcrp_crosschecks_dict = \
-    {
-        "email"                  : email,
-        "conflict_only_dblp_name": conflict_only_on_dblp_name,
-        "conflict_only_dblp_url" : conflict_only_on_dblp_url
-    }
-    dblp_to_hotcrp_crosschecks_list.append(dblp_to_hotcrp_crosschecks_dict)
-# %% Combine all of them
-hotcrp_to_dblp_crosschecks_df = pd.DataFrame(hotcrp_to_dblp_crosschecks_list)
-dblp_to_hotcrp_crosschecks_df = pd.DataFrame(dblp_to_hotcrp_crosschecks_list)
-
-pc_conflict_crosscheck_df = pc_coauthors_dblp_df[['full_name','email']]
-pc_conflict_crosscheck_df['conflict_only_dblp_name'] = dblp_to_hotcrp_crosschecks_df['conflict_only_dblp_name']
-pc_conflict_crosscheck_df['conflict_only_dblp_url'] = dblp_to_hotcrp_crosschecks_df['conflict_only_dblp_url']
-pc_conflict_crosscheck_df['conflict_only_hotcrp'] = hotcrp_to_dblp_crosschecks_df['conflict_only_hotcrp']
-
-# %% Save as CSV
-pc_conflict_crosscheck_df.to_csv(pc_coauthors_conflict_crosscheck_filename, index=False)
-
-# %%
+pc_coauthors_dblp_filename = 'sample-data/output/isca2021-pccoauthors.json.gz'
+
+# Output table filename (see s00_table.py, use .parquet if pyarrow is installed)
+pc_coauthors_conflict_crosscheck_filename = 'sample-data/output/isca2021-pcconflict-crosscheck.json.gz'
+# Run report (see s00_instrument.py)
+run_report_filename = 'sample-data/output/isca2021-s03-run-report.json'
+
+#%% Define constant
+# Minimum fuzzy match score to consider two names as the same person
+confidence_threshold = 90
+# Incremental mode: only crosscheck the PC members whose HotCRP collaborators or DBLP co-authors
+# have changed since the previous run
+incremental = True
+
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s03')
+
+    # %%# Load Input CSV to Pandas Dataframe
+    # Load the PC Info HotCRP
+    pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
+
+    # Load the PC Coauthors DBLP (list columns are loaded as lists)
+    pc_coauthors_dblp_df = load_table(pc_coauthors_dblp_filename)
+
+    # %% Sanitize PC Info HotCRP Collaborator (e.g., convert to list)
+
+    # Fill NA
+    pc_info_hotcrp_df['collaborators'] = pc_info_hotcrp_df['collaborators'].fillna(' ')
+
+    # Remove affiliation name
+    pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df['collaborators'].str.replace(r'\s\([^)]*\)', '', regex=True)
+    pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df['collaborators_name'].str.replace(r'\([^)]*\)', '', regex=True)
+    pc_info_hotcrp_df['collaborators_name'] = pc_info_hotcrp_df['collaborators_name'].str.split('\n')
+    collaborators_by_email = dict(zip(pc_info_hotcrp_df['email'], pc_info_hotcrp_df['collaborators_name']))
+
+    # %% Find the PC members that have changed since the previous run
+    pc_coauthors_dblp_all_df = pc_coauthors_dblp_df
+    fingerprint_dict = {}
+    for index,pc_member in pc_coauthors_dblp_df.iterrows():
+        fingerprint_dict[pc_member['email']] = \
+        {
+            "input"      : fingerprint(pc_member['full_name'], collaborators_by_email.get(pc_member['email'], []),
+                                       pc_member['coauthors_name_dblp'], pc_member['coauthors_url_dblp'], confidence_threshold),
+            "dependency" : None
+        }
+    previous_fingerprint_dict = load_fingerprints(pc_coauthors_conflict_crosscheck_filename) if incremental else {}
+    changed = changed_keys(fingerprint_dict, previous_fingerprint_dict)
+    print_incremental_summary(changed, len(fingerprint_dict))
+    pc_coauthors_dblp_df = pc_coauthors_dblp_df[pc_coauthors_dblp_df['email'].isin(changed)]
+
+    # %% Cross Check HotCRP and DBLP
+    # Both directions are computed from the same pass: the names are normalized once, only the names
+    # that share a blocking key (name token) are compared, and all PC members are scored in one batch.
+    name_list_pairs = []
+    for index,pc_member in pc_coauthors_dblp_df.iterrows():
+        conflicts_from_hotcrp = collaborators_by_email.get(pc_member['email'], [])
+        name_list_pairs.append((conflicts_from_hotcrp, pc_member['coauthors_name_dblp']))
+    crosscheck_list = crosscheck_names_batch(name_list_pairs, confidence_threshold=confidence_threshold, return_index=True)
+
+    # %% Combine all of them
+    pc_conflict_crosscheck_list = []
+    for (index,pc_member),(conflicts_from_hotcrp, conflicts_from_dblp),(only_hotcrp_index, only_dblp_index) in \
+            tqdm.tqdm(zip(pc_coauthors_dblp_df.iterrows(), name_list_pairs, crosscheck_list), total=pc_coauthors_dblp_df.shape[0]):
+        # HotCRP to DBLP: only if DBLP has the co-authors of the PC member
+        conflict_only_on_hotcrp = []
+        if(len(conflicts_from_dblp)!=0):
+            conflict_only_on_hotcrp = [conflicts_from_hotcrp[i] for i in only_hotcrp_index]
+        # DBLP to HotCRP
+        conflict_only_on_dblp_name = []
+        conflict_only_on_dblp_url = []
+        if(len(conflicts_from_hotcrp)!=0):
+            conflict_only_on_dblp_name = [pc_member['coauthors_name_dblp'][i] for i in only_dblp_index]
+            conflict_only_on_dblp_url = [pc_member['coauthors_url_dblp'][i] for i in only_dblp_index]
+        pc_conflict_crosscheck_dict = \
+        {
+            "full_name"              : pc_member['full_name'],
+            "email"                  : pc_member['email'],
+            "conflict_only_dblp_name": conflict_only_on_dblp_name,
+            "conflict_only_dblp_url" : conflict_only_on_dblp_url,
+            "conflict_only_hotcrp"   : conflict_only_on_hotcrp
+        }
+        pc_conflict_crosscheck_list.append(pc_conflict_crosscheck_dict)
+
+    pc_conflict_crosscheck_df = pd.DataFrame(pc_conflict_crosscheck_list, columns=['full_name','email','conflict_only_dblp_name','conflict_only_dblp_url','conflict_only_hotcrp'])
+    if previous_fingerprint_dict:
+        pc_conflict_crosscheck_df = merge_incremental(load_table(pc_coauthors_conflict_crosscheck_filename), pc_conflict_crosscheck_df,
+                                                      'email', pc_coauthors_dblp_all_df['email'], changed)
+
+    # %% Save as table
+    ## Use 'python s00_table.py export' to get a CSV file to inspect it with Excel
+    save_table(pc_conflict_crosscheck_df, pc_coauthors_conflict_crosscheck_filename)
+    save_fingerprints(pc_coauthors_conflict_crosscheck_filename, fingerprint_dict)
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
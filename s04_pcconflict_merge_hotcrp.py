@@ -13,69 +13,134 @@ import pandas as pd
 import numpy as np
 import tqdm
 
-from s00_function import request_affiliation
+from s00_function import request_affiliation_batch
+from s00_function import dblp_link_to_pid
+from s00_function import get_http_client
+from s00_function import affiliation_only_year
+from s00_table import load_table
+from s00_incremental import fingerprint
+from s00_incremental import load_fingerprints
+from s00_incremental import save_fingerprints
+from s00_incremental import changed_keys
+from s00_incremental import carry_fingerprints
+from s00_incremental import person_records_fingerprint
+from s00_incremental import print_incremental_summary
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
 
 #%% Define the input and output CSV filename
 # Input CSV filename
 pc_info_hotcrp_filename = 'sample-data/input/isca2021-pcinfo.csv'
-pc_conflict_crosscheck_filename = 'sample-data/output/isca2021-pcconflict-crosscheck.csv'
+pc_conflict_crosscheck_filename = 'sample-data/output/isca2021-pcconflict-crosscheck.json.gz'
 
-# Output CSV filename
+# Output CSV filename (to be uploaded to HotCRP)
 pc_info_hotcrp_update_filename = 'sample-data/output/isca2021-pcinfo-update.csv'
+# Run report (see s00_instrument.py)
+run_report_filename = 'sample-data/output/isca2021-s04-run-report.json'
 
-# %%# Load Input CSV to Pandas Dataframe
-# Load the PC Info HotCRP
-pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
-pc_info_hotcrp_df['collaborators'] = pc_info_hotcrp_df['collaborators'].fillna(' ')
-
-# Load the PC Conflict Crosscheck
-pc_conflict_crosscheck_df = pd.read_csv(pc_conflict_crosscheck_filename, converters={
-    'conflict_only_dblp_name': eval, 
-    'conflict_only_dblp_url': eval, 
-    'conflict_only_hotcrp': eval}
-    )
-# %% Iterate over PC member
-new_collaborators_list = []
-for index,pc_member in tqdm.tqdm(pc_info_hotcrp_df.iterrows(), total=pc_info_hotcrp_df.shape[0]):
-    email = pc_member['email']
-    dblp_only_conflict_name = pc_conflict_crosscheck_df.loc[pc_conflict_crosscheck_df['email']==email]['conflict_only_dblp_name'].to_list()[0]
-    dblp_only_conflict_url = pc_conflict_crosscheck_df.loc[pc_conflict_crosscheck_df['email']==email]['conflict_only_dblp_url'].to_list()[0]
-    new_conflict_strings = ''
-    if(len(dblp_only_conflict_name)!=0):
-        new_conflict_strings = '\n'
-        for name_dblp,url_dblp in zip(dblp_only_conflict_name,dblp_only_conflict_url):
-
-            # !!! THIS WILL TAKE VERY LONG TIME !!!
-            # comment these two lines below if you don't want affiliation information
-            affiliation = request_affiliation(url_dblp)
-            conflict_string = name_dblp + ' (' + affiliation + ')\n'
-
-            # uncomment this line below to put generic affiliation to reduce runtime
-            #conflict_string = name_dblp + ' (NONE <dblp>)\n'
-            new_conflict_strings = new_conflict_strings + conflict_string
-            
-    new_collaborators_dict = \
-    {
-        "email"             : pc_member['email'],
-        "new_collaborators" : pc_member['collaborators'] + new_conflict_strings[:-1]
-    }
-    new_collaborators_list.append(new_collaborators_dict)
-
-new_collaborators_df = pd.DataFrame(new_collaborators_list)
-pc_info_hotcrp_df['collaborators'] = new_collaborators_df['new_collaborators']
-# %% Dump to CSV and Post-Processing
-#print(pc_info_hotcrp_df.dtypes)
-pc_info_hotcrp_df.to_csv(pc_info_hotcrp_update_filename, index=False)
-
-# post-processing to match the CSV header
-with open(pc_info_hotcrp_filename) as orig_file:
-    lines_orig = orig_file.readlines()
-
-with open(pc_info_hotcrp_update_filename) as target_file:
-    lines_targ = target_file.readlines()
-
-lines_targ[0] = lines_orig[0]
-
-with open(pc_info_hotcrp_update_filename, "w") as target_file:
-    target_file.writelines(lines_targ)
-# %%
+#%% Define constant
+# Fetch the affiliation of each DBLP-only conflict from DBLP (this may take a while)
+# Set to False to put generic affiliation (NONE <DBLP>) without crawling DBLP
+fetch_affiliation = True
+# Incremental mode: only merge the PC members whose collaborators or DBLP-only conflicts have changed
+# since the previous run. The collaborators of the other PC members are taken from the previous output.
+incremental = True
+
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s04')
+
+    # %%# Load Input CSV to Pandas Dataframe
+    # Load the PC Info HotCRP
+    pc_info_hotcrp_df = pd.read_csv(pc_info_hotcrp_filename)
+    pc_info_hotcrp_df['collaborators'] = pc_info_hotcrp_df['collaborators'].fillna(' ')
+
+    # Load the PC Conflict Crosscheck
+    pc_conflict_crosscheck_df = load_table(pc_conflict_crosscheck_filename)
+    conflict_by_email = {email: (names, urls) for email, names, urls in zip(pc_conflict_crosscheck_df['email'],
+        pc_conflict_crosscheck_df['conflict_only_dblp_name'], pc_conflict_crosscheck_df['conflict_only_dblp_url'])}
+
+    # %% Find the PC members that have changed since the previous run
+    # The dependency is the DBLP affiliations of the DBLP-only conflicts that are already in the cache,
+    # so a PC member is merged again if one of these affiliations has changed.
+    fingerprint_dict = {}
+    for email,collaborators in zip(pc_info_hotcrp_df['email'], pc_info_hotcrp_df['collaborators']):
+        conflict_urls = conflict_by_email.get(email, ([], []))[1]
+        fingerprint_dict[email] = \
+        {
+            "input"      : fingerprint(collaborators, conflict_by_email.get(email, ([], [])), fetch_affiliation),
+            "dependency" : person_records_fingerprint(conflict_urls, affiliation_only_year, 'affiliations') if fetch_affiliation else None
+        }
+    previous_fingerprint_dict = load_fingerprints(pc_info_hotcrp_update_filename) if incremental else {}
+    changed = changed_keys(fingerprint_dict, previous_fingerprint_dict)
+    print_incremental_summary(changed, len(fingerprint_dict))
+    previous_collaborators_by_email = {}
+    if previous_fingerprint_dict:
+        previous_update_df = pd.read_csv(pc_info_hotcrp_update_filename)
+        previous_collaborators_by_email = dict(zip(previous_update_df['email'], previous_update_df['collaborators']))
+
+    # %% Resolve the affiliation of every distinct DBLP-only conflict
+    # The same co-author (e.g., a shared student) is only looked up once for the whole committee,
+    # and the lookups are done concurrently (see fetch_max_workers inside s00_function.py).
+    affiliation_dict = {}
+    if fetch_affiliation:
+        conflict_url_list = [url_dblp for email in pc_info_hotcrp_df['email'] if email in changed for url_dblp in conflict_by_email.get(email, ([], []))[1]]
+        print('DBLP-only conflicts: %d, unique persons: %d' % (len(conflict_url_list), len(set(map(dblp_link_to_pid, conflict_url_list)))))
+        affiliation_dict = request_affiliation_batch(conflict_url_list, progress='Affiliations')
+        print('DBLP requests: %(requests)d, retries: %(retries)d, failures: %(failures)d, total latency: %(total_latency).1fs' % get_http_client().summary())
+        # The affiliations of the merged PC members are now in the cache
+        for email in changed:
+            fingerprint_dict[email]['dependency'] = person_records_fingerprint(conflict_by_email.get(email, ([], []))[1], affiliation_only_year, 'affiliations')
+    fingerprint_dict = carry_fingerprints(fingerprint_dict, previous_fingerprint_dict, changed)
+
+    # %% Iterate over PC member
+    new_collaborators_list = []
+    for index,pc_member in pc_info_hotcrp_df.iterrows():
+        if pc_member['email'] not in changed:
+            new_collaborators_list.append({"email": pc_member['email'], "new_collaborators": previous_collaborators_by_email[pc_member['email']]})
+            continue
+        dblp_only_conflict_name, dblp_only_conflict_url = conflict_by_email.get(pc_member['email'], ([], []))
+        new_conflict_strings = ''
+        if(len(dblp_only_conflict_name)!=0):
+            new_conflict_strings = '\n'
+            for name_dblp,url_dblp in zip(dblp_only_conflict_name,dblp_only_conflict_url):
+                affiliation = affiliation_dict.get(dblp_link_to_pid(url_dblp), 'NONE <DBLP>')
+                conflict_string = name_dblp + ' (' + affiliation + ')\n'
+                new_conflict_strings = new_conflict_strings + conflict_string
+
+        new_collaborators_dict = \
+        {
+            "email"             : pc_member['email'],
+            "new_collaborators" : pc_member['collaborators'] + new_conflict_strings[:-1]
+        }
+        new_collaborators_list.append(new_collaborators_dict)
+
+    new_collaborators_df = pd.DataFrame(new_collaborators_list)
+    pc_info_hotcrp_df['collaborators'] = new_collaborators_df['new_collaborators']
+    # %% Dump to CSV and Post-Processing
+    #print(pc_info_hotcrp_df.dtypes)
+    pc_info_hotcrp_df.to_csv(pc_info_hotcrp_update_filename, index=False)
+
+    # post-processing to match the CSV header
+    with open(pc_info_hotcrp_filename) as orig_file:
+        lines_orig = orig_file.readlines()
+
+    with open(pc_info_hotcrp_update_filename) as target_file:
+        lines_targ = target_file.readlines()
+
+    lines_targ[0] = lines_orig[0]
+
+    with open(pc_info_hotcrp_update_filename, "w") as target_file:
+        target_file.writelines(lines_targ)
+
+    # Save the fingerprints for the incremental mode
+    save_fingerprints(pc_info_hotcrp_update_filename, fingerprint_dict)
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
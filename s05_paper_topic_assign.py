@@ -10,28 +10,79 @@
 #%% Import some libraries that are needed
 import pandas as pd
 import numpy as py
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
 
 #%% Define the filename
 list_of_papers_topics='sample-data/input/isca2021-topics.csv'
 list_of_topics_priority='sample-data/input/isca2021-topics-priority.csv'
 result_of_paper_topics_assigned='sample-data/output/isca2021-papers-topics-assigned.csv'
+result_of_paper_topics_ranked='sample-data/output/isca2021-papers-topics-ranked.csv'
+result_of_topics_count='sample-data/output/isca2021-topics-count.csv'
+# Run report (see s00_instrument.py)
+run_report_filename='sample-data/output/isca2021-s05-run-report.json'
 
-#%% Load the paper list from HotCRP
-papers_topics_df = pd.read_csv(list_of_papers_topics)
+#%% Define constant
+# Number of topics of each paper (in order of priority) in the ranked output
+top_k_topics = 3
 
-#%% load topics priority list
-topics_priority_df = pd.read_csv(list_of_topics_priority)
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s05')
 
-#%%  sort topics by priority
-topics_priority_df = topics_priority_df.sort_values('priority').reset_index()
+    #%% Load the paper list from HotCRP
+    papers_topics_df = pd.read_csv(list_of_papers_topics)
 
-#%%  Group the Paper List based on topic priority
-result=papers_topics_df.drop_duplicates(subset = ['paper']).reset_index()[['paper','title']]
-result['topic']=papers_topics_df.groupby('paper')['topic'].apply(lambda x: sorted(list(x), key=lambda y: topics_priority_df['topics'].to_list().index(y))[0]).reset_index()['topic']
+    #%% load topics priority list
+    topics_priority_df = pd.read_csv(list_of_topics_priority)
 
-#%% Save the result to CSV
-result.to_csv(result_of_paper_topics_assigned,index=False)
+    #%%  sort topics by priority
+    topics_priority_df = topics_priority_df.sort_values('priority').reset_index()
 
-# Display statistics
-result[['title','topic']].groupby(['topic']).agg(['count'])
-# %%
+    #%%  Encode each topic by its rank in the priority list
+    # The topics are ordered categorical codes (0 is the highest priority). A topic that is not in the
+    # priority list gets the lowest priority.
+    topic_category = pd.Categorical(papers_topics_df['topic'], categories=topics_priority_df['topics'].drop_duplicates(), ordered=True)
+    papers_topics_df['rank'] = topic_category.codes
+    unknown_topic = papers_topics_df['rank'] < 0
+    if unknown_topic.any():
+        print("Warning! Topics without priority: " + ', '.join(sorted(set(papers_topics_df.loc[unknown_topic, 'topic']))) + "\n")
+        papers_topics_df.loc[unknown_topic, 'rank'] = len(topic_category.categories)
+
+    #%%  Group the Paper List based on topic priority
+    # The topic of each paper is its topic with the highest priority
+    result=papers_topics_df.drop_duplicates(subset = ['paper']).reset_index()[['paper','title']]
+    primary_topic = papers_topics_df.loc[papers_topics_df.groupby('paper', sort=False)['rank'].idxmin()].set_index('paper')['topic']
+    result['topic']=result['paper'].map(primary_topic)
+
+    #%% Save the result to CSV
+    result.to_csv(result_of_paper_topics_assigned,index=False)
+
+    #%% Rank the topics of each paper
+    # The top_k_topics topics of each paper with the highest priority ('topic 1' is the topic above)
+    ranked_df = papers_topics_df.sort_values(['rank'], kind='stable')
+    ranked_df = ranked_df.assign(order=ranked_df.groupby('paper').cumcount() + 1)
+    ranked_df = ranked_df[ranked_df['order'] <= top_k_topics]
+    ranked_df = ranked_df.pivot(index='paper', columns='order', values='topic').reindex(columns=range(1, top_k_topics + 1))
+    ranked_df.columns = ['topic %d' % (order) for order in ranked_df.columns]
+    result_ranked = result[['paper','title']].join(ranked_df, on='paper')
+    result_ranked.to_csv(result_of_paper_topics_ranked,index=False)
+
+    #%% Count the papers of each topic
+    # primary: number of papers assigned to the topic, papers: number of papers having the topic
+    topics_count_df = topics_priority_df[['topics','priority']].drop_duplicates(subset=['topics']).rename(columns={'topics':'topic'})
+    topics_count_df['primary'] = topics_count_df['topic'].map(result['topic'].value_counts()).fillna(0).astype(int)
+    topics_count_df['papers'] = topics_count_df['topic'].map(papers_topics_df.drop_duplicates(subset=['paper','topic'])['topic'].value_counts()).fillna(0).astype(int)
+    topics_count_df.to_csv(result_of_topics_count,index=False)
+
+    # Display statistics
+    result[['title','topic']].groupby(['topic']).agg(['count'])
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,20 @@ import re
 import hashlib
 import os
 from fuzzywuzzy import process
+from s00_table import load_table
+from s00_paper import load_papers
+from s00_name_match import build_name_index
+from s00_name_match import query_name_index
+from s00_zoom import conflict_matrix
+from s00_zoom import csv_lines
+from s00_zoom import participant_lines
+from s00_zoom import room_files
+from s00_zoom import write_files
+from s00_zoom import load_zoom_rules
+from s00_zoom import compile_zoom_rules
+from s00_zoom import apply_zoom_rules
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
 
 #%% Define the input and output CSV filename
 # Input CSV filename
@@ -21,8 +35,10 @@ from fuzzywuzzy import process
 paper_authors_filename        = 'sample-data/input/isca2021-authors.csv'
 paper_data_filename           = 'sample-data/input/isca2021-paperdata.csv'
 paper_pc_conflict_filename    = 'sample-data/input/isca2021-pcconflicts.csv'
-pcpc_conflict_info_filename   = 'sample-data/output/isca2021-pcconflict-crosscheck.csv'
+pcpc_conflict_info_filename   = 'sample-data/output/isca2021-pcconflict-crosscheck.json.gz'
 pc_member_zoom_info_filename  = 'sample-data/input/isca2021-pczoom.csv' 
+# Roles and Zoom accounts of the chairs and helpers (see s00_zoom.py for the format)
+zoom_rules_filename           = 'sample-data/input/isca2021-zoom-rules.json'
 
 # Output CSV filename
 zoom_csv_config_non_hash_folder = 'sample-data/output/zoom'
@@ -30,248 +46,152 @@ zoom_csv_config_hash_folder     = 'sample-data/output/zoom_hashed'
 conflict_csv_non_hash_folder    = 'sample-data/output/conflict'
 conflict_csv_hash_folder        = 'sample-data/output/conflict_hashed'
 paper_summary_filename          = 'sample-data/output/isca2021-paper-summary.csv'
+# Set write_zoom_archive to True to write the four folders above into a single ZIP archive instead
+write_zoom_archive              = False
+zoom_archive_filename           = 'sample-data/output/isca2021-zoom.zip'
+# Papers where a required role (e.g., the chair) is replaced or not available in the discussion room
+zoom_report_filename            = 'sample-data/output/isca2021-zoom-report.csv'
+# Possible conflicts between the authors of the papers and the co-authors of the PC members
+suspected_conflict_filename     = 'sample-data/output/isca2021-suspected-conflicts.csv'
+# Run report (see s00_instrument.py)
+run_report_filename             = 'sample-data/output/isca2021-s07-run-report.json'
 
 #%% Define constant
-# Predefined Email
-lizy_discussion_account    = 'ljohn@eid.utexas.edu' 
-lizy_conflict_account      = 'lizy.john@gmail.com'
-sandhya_discussion_account = 'sandhya.dwarkadas@rochester.edu'
-bagus_discussion_account   = 'bh29293@eid.utexas.edu'
-aman_discussion_account    = 'aa36432@eid.utexas.edu'
-bagus_hotcrp_email         = 'hanindhito@bagus.my.id'
-aman_hotcrp_email          = 'aman.kbm@utexas.edu'
-lizy_hotcrp_email          = 'ljohn@ece.utexas.edu'
-sandhya_hotcrp_email       = 'sandhya@cs.rochester.edu'
-
 #Define Room Name
 discussion_room = 'Discussion Room'
 conflict_room   = 'Conflict Room'
 
-#%% Load CSV to Pandas DF
-
-# Load the Paper Authors
-paper_authors_df = pd.read_csv(paper_authors_filename)
-
-# Load the Paper Data
-paper_data_df = pd.read_csv(paper_data_filename)
-
-# Load the Paper PC Conflict
-paper_pc_conflict_df = pd.read_csv(paper_pc_conflict_filename)
-
-# Load the PC PC Conflict Info
-pcpc_conflict_info_df = pd.read_csv(pcpc_conflict_info_filename, converters={
-    'conflict_only_dblp_name': eval, 
-    'conflict_only_dblp_url': eval, 
-    'conflict_only_hotcrp': eval}
-    )
-
-# %% Process paper authors
-paper_authors_df['full name'] = paper_authors_df['first'] + ' ' + paper_authors_df['last']
-paper_authors_merge_df = paper_authors_df.groupby('paper').agg({'full name': lambda x: list(x)})
-
-# %% Process paper_data
-paper_data_df['Tags'] = paper_data_df['Tags'].fillna('#NA')
-paper_data_df['Tags'] = paper_data_df['Tags'].apply(lambda x: list(x.split(' ')))
-
-# %% Process paper_pc_conflict
-paper_pc_conflict_df['full name'] = paper_pc_conflict_df['first'] + ' ' + paper_pc_conflict_df['last']
-paper_pc_conflict_merge_df = paper_pc_conflict_df.groupby('paper').agg({'full name': lambda x: list(x), 'email': lambda x: list(x)})
-#paper_pc_conflict_merge_df.to_csv('Output-CSV/test.csv', index=False)
-
-# %% Create new dataframe for papers data
-papers_df = paper_data_df[['ID','Title','Tags']]
-
-# Merge the authors
-papers_df['authors'] = papers_df.ID.map(paper_authors_merge_df['full name'])
-
-# Merge PC Conflict Name
-papers_df['pc conflict name'] = papers_df.ID.map(paper_pc_conflict_merge_df['full name']).fillna("#NA")
-papers_df['pc conflict email'] = papers_df.ID.map(paper_pc_conflict_merge_df['email']).fillna("#NA")
-
-# Generate Paper Hash based on Title and Paper ID
-#hashlib.sha256().hexdigest()
-papers_df['hash'] = papers_df.apply(lambda x: hashlib.sha256((str(x.ID) + '@' + x.Title).encode('utf-8')).hexdigest()[:6], axis=1)
-papers_df['hash'] = papers_df['hash'].astype(str)
-#papers_df.to_csv('Output-CSV/test.csv', index=False)
-
-# %% Load PC Zoom Info
-pc_member_zoom_info_df = pd.read_csv(pc_member_zoom_info_filename)
-#pc_member_zoom_info_df['Zoom email 1'] = pc_member_zoom_info_df.apply(lambda x:  x[x.last_valid_index()], axis=1)
-#pc_member_zoom_info_df['Zoom email 2'] = pc_member_zoom_info_df.apply(lambda x:  x[x.last_valid_index()], axis=1)
-pc_member_zoom_info_df['Zoom email 2'] = pc_member_zoom_info_df['Zoom email 2'].fillna('#na')
-
-# %% Merge PC Zoom Info and PC Conflict Info
-pcpc_merged_info_df = pd.merge(pc_member_zoom_info_df, pcpc_conflict_info_df, on='hotcrp_email')
-
-# %% Make Folder 
-if not os.path.exists(zoom_csv_config_non_hash_folder):
-    os.makedirs(zoom_csv_config_non_hash_folder)
-if not os.path.exists(zoom_csv_config_hash_folder):
-    os.makedirs(zoom_csv_config_hash_folder)
-if not os.path.exists(conflict_csv_non_hash_folder):
-    os.makedirs(conflict_csv_non_hash_folder)
-if not os.path.exists(conflict_csv_hash_folder):
-    os.makedirs(conflict_csv_hash_folder)
-
-# %% Iterate through each paper
-for index,paper in tqdm.tqdm(papers_df.iterrows(), total=papers_df.shape[0]):
-    participant_list = []
-    conflict_list = []
-    conflict_email_list = []
-    discussion_email_list = []
-    
-    # Loop through PC Member
-    for index,pc_member in pcpc_merged_info_df.iterrows():
-        is_this_pc_conflict = False
-        # Check author-side conflict
-        if(pc_member['hotcrp_email'] in paper['pc conflict email']):
-            # This pc member has conflict with the paper
-            is_this_pc_conflict = True
-        
-        # Check pc-side conflict
-        # DBLP
-        #if(is_this_pc_conflict == False):
-        #    for author in paper['authors']:
-        #        if(pd.isna(author)):
-        #            continue
-        #        highest = process.extractOne(author,pc_member['conflict_only_dblp_name'])
-        #        if highest is not None:            
-        #            if(highest[1]>=95):
-        #                ## Possible Conflict with author
-        #                print("["+str(paper['ID']) + "] Possible DBLP conflict author " + author + " with pcpc " + pc_member['Name'] + " with probability " + str(highest[1]) +"\n")
-        #                is_this_pc_conflict = True
-
-        # HOTCRP
-        #if(is_this_pc_conflict == False):
-        #    for author in paper['authors']:
-        #        if(pd.isna(author)):
-        #            continue
-        #        highest = process.extractOne(author,pc_member['conflict_only_hotcrp'])
-        #        if highest is not None: 
-        #            if(highest[1]>=95):
-        #                ## Possible Conflict with author
-        #                print("["+str(paper['ID']) + "] Possible HOTCRP conflict author " + author + " with pcpc " + pc_member['Name'] + " with probability " + str(highest[1]) +"\n")
-        #                is_this_pc_conflict = True
-
-        # Register PC Member as Conflict or Discussion
-        if(is_this_pc_conflict == True):
-            # Conflict
-            conflict_email_list.append(pc_member['hotcrp_email'])
-            participant_dict = \
-            {
-                "Pre-assign Room Name" : conflict_room,
-                "Email Address"        : pc_member['Zoom email 1']
-            }
-            participant_list.append(participant_dict)
-
-            if(pc_member['Zoom email 1']!=pc_member['Zoom email 2'] and pc_member['Zoom email 2'] != '#na'):
-                # Multiple zoom account handle
-                participant_dict = \
-                {
-                    "Pre-assign Room Name" : conflict_room,
-                    "Email Address"        : pc_member['Zoom email 2']
-                }
-                participant_list.append(participant_dict)
-            conflict_list.append(pc_member['Name'] + " (" + pc_member['Institution'] + ")")
-        else :
-            # No Conflict
-            discussion_email_list.append(pc_member['hotcrp_email'])
-            participant_dict = \
-            {
-                "Pre-assign Room Name" : discussion_room,
-                "Email Address"        : pc_member['Zoom email 1']
-            }
-            participant_list.append(participant_dict)
-
-            if(pc_member['Zoom email 1']!=pc_member['Zoom email 2'] and pc_member['Zoom email 2'] != '#na'):
-                # Multiple zoom account handle
-                participant_dict = \
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s07')
+
+    #%% Load CSV to Pandas DF
+
+    # Load the Papers (paper data, authors and PC conflicts combined, see s00_paper.py)
+    papers_df = load_papers(paper_data_filename, paper_authors_filename, paper_pc_conflict_filename)
+
+    # Load the PC PC Conflict Info
+    pcpc_conflict_info_df = load_table(pcpc_conflict_info_filename)
+
+    # %% Load PC Zoom Info
+    pc_member_zoom_info_df = pd.read_csv(pc_member_zoom_info_filename)
+    #pc_member_zoom_info_df['Zoom email 1'] = pc_member_zoom_info_df.apply(lambda x:  x[x.last_valid_index()], axis=1)
+    #pc_member_zoom_info_df['Zoom email 2'] = pc_member_zoom_info_df.apply(lambda x:  x[x.last_valid_index()], axis=1)
+    pc_member_zoom_info_df['Zoom email 2'] = pc_member_zoom_info_df['Zoom email 2'].fillna('#na')
+
+    # %% Merge PC Zoom Info and PC Conflict Info
+    # The PC members are identified by their HotCRP email ('email' in the s03 output)
+    pcpc_conflict_info_df.rename(columns={'email':'hotcrp_email'}, inplace=True)
+    pcpc_merged_info_df = pd.merge(pc_member_zoom_info_df, pcpc_conflict_info_df, on='hotcrp_email')
+
+    # %% Check pc-side conflict
+    # The authors of each paper are matched against the co-authors of every PC member that are only
+    # in DBLP or only in HotCRP (see s03). The co-author names of all PC members are indexed once and
+    # each author is looked up once, so the check no longer needs every author x every PC member.
+    # The suspected conflicts are added to the PC conflicts of the paper for the room assignment and
+    # written for the chairs to review.
+    check_pc_side_conflict     = True
+    pc_side_conflict_threshold = 95
+    hotcrp_conflict_lists = [list(conflict_list) if isinstance(conflict_list, list) else [] for conflict_list in papers_df['pc conflict email']]
+    room_conflict_lists   = [list(conflict_list) for conflict_list in hotcrp_conflict_lists]
+    suspected_conflict_list = []
+    if check_pc_side_conflict:
+        coauthor_name_list  = []
+        coauthor_owner_list = []
+        for pc_position, (dblp_name_list, hotcrp_name_list) in enumerate(zip(pcpc_merged_info_df['conflict_only_dblp_name'], pcpc_merged_info_df['conflict_only_hotcrp'])):
+            for source, name_list in (('DBLP', dblp_name_list), ('HOTCRP', hotcrp_name_list)):
+                for name in (name_list if isinstance(name_list, list) else []):
+                    coauthor_name_list.append(name)
+                    coauthor_owner_list.append((pc_position, source))
+        coauthor_index = build_name_index(coauthor_name_list)
+
+        author_list     = []
+        author_row_list = []
+        for row, authors in enumerate(papers_df['authors']):
+            for author in (authors if isinstance(authors, list) else []):
+                if(pd.isna(author)):
+                    continue
+                author_list.append(author)
+                author_row_list.append(row)
+        match_lists = query_name_index(coauthor_index, author_list, pc_side_conflict_threshold)
+
+        for author, row, match_list in zip(author_list, author_row_list, match_lists):
+            for position, score in match_list:
+                pc_position, source = coauthor_owner_list[position]
+                pc_member = pcpc_merged_info_df.iloc[pc_position]
+                if(pc_member['hotcrp_email'] in papers_df['pc conflict email'].iloc[row]):
+                    # Already in conflict with the paper
+                    continue
+                ## Possible Conflict with author
+                suspected_conflict_dict = \
                 {
-                    "Pre-assign Room Name" : discussion_room,
-                    "Email Address"        : pc_member['Zoom email 2']
+                    "paper"         : papers_df['ID'].iloc[row],
+                    "author"        : author,
+                    "pc member"     : pc_member['Name'],
+                    "hotcrp_email"  : pc_member['hotcrp_email'],
+                    "source"        : source,
+                    "co-author"     : coauthor_name_list[position],
+                    "probability"   : score
                 }
-                participant_list.append(participant_dict)
-
-    # post Processing
-    # make sure lizy email is in discussion room
-    if(lizy_hotcrp_email not in discussion_email_list):
-        if(sandhya_hotcrp_email in discussion_email_list):
-            print("["+str(paper['ID']) + "] Lizy conflict is detected and Sandhya replaces Lizy\n")
-        else:
-            print("["+str(paper['ID']) + "] !!!! Something Has Gone Wrong !!!!\n")
-
-    # Second, default assignment for bagus discussion account and lizy conflict account
-    # Always add Bagus Discussion Account to Discussion Room
-    participant_dict = \
+                suspected_conflict_list.append(suspected_conflict_dict)
+                if pc_member['hotcrp_email'] not in room_conflict_lists[row]:
+                    room_conflict_lists[row].append(pc_member['hotcrp_email'])
+    suspected_conflict_df = pd.DataFrame(suspected_conflict_list, columns=['paper','author','pc member','hotcrp_email','source','co-author','probability'])
+    suspected_conflict_df.to_csv(suspected_conflict_filename, index=False)
+    if check_pc_side_conflict:
+        print("Possible conflict of %d PC members with %d papers, see %s\n" % (suspected_conflict_df[['paper','hotcrp_email']].drop_duplicates().shape[0],
+              suspected_conflict_df['paper'].nunique(), suspected_conflict_filename))
+
+    # %% Encode the PC conflicts as a paper x PC member matrix
+    pc_conflict = conflict_matrix(room_conflict_lists, pcpc_merged_info_df['hotcrp_email'].tolist())
+
+    # %% Build the room of every PC member on every paper
+    participant_header     = csv_lines([["Pre-assign Room Name", "Email Address"]])
+    pc_discussion_lines    = participant_lines(pcpc_merged_info_df, discussion_room)
+    pc_conflict_lines      = participant_lines(pcpc_merged_info_df, conflict_room)
+    pc_conflict_name_lines = np.array([csv_lines([[name + " (" + institution + ")"]]) for name, institution in
+                                       zip(pcpc_merged_info_df['Name'], pcpc_merged_info_df['Institution'])], dtype=object)
+
+    # %% Apply the rules of the chair and helper accounts
+    # The rules are compiled once, then the accounts of the roles (e.g., a student helper follows the
+    # authors-side conflict since they will not be able to see the paper on HotCRP) and the accounts
+    # that are always in a room are added to every paper, and the required roles are checked.
+    # The accounts of a role follow the HotCRP conflicts only, a suspected conflict of the role moves
+    # the PC member to the conflict room but not its helper accounts (they can still see the paper).
+    room_names = \
     {
-        "Pre-assign Room Name" : discussion_room,
-        "Email Address"        : bagus_discussion_account
+        "discussion" : discussion_room,
+        "conflict"   : conflict_room
     }
-    participant_list.append(participant_dict)
-    # Keep Lizy Gmail Account in the Main Room
-    ## Always add Lizy Conflict Account to Conflict Room
-    #participant_dict = \
-    #{
-    #    "Pre-assign Room Name" : conflict_room,
-    #    "Email Address"        : lizy_conflict_account
-    #}
-    #participant_list.append(participant_dict)
-
-    # Always add Lizy Conflict Account to Conflict Room
-    participant_dict = \
-    {
-        "Pre-assign Room Name" : discussion_room,
-        "Email Address"        : 'zoom@bagus.my.id'
-    }
-    participant_list.append(participant_dict)
-
-    # Then, handle Aman Conflict
-    # Does not need to be so precise -- depends only on the authors-side 
-    # since he will not be able to see the paper on HotCRP.
-    if(aman_hotcrp_email in paper['pc conflict email']) :
-        # Aman is in conflict with the paper
-        # Add Aman to Conflict Room
-        participant_dict = \
-        {
-            "Pre-assign Room Name" : conflict_room,
-            "Email Address"        : aman_discussion_account
-        }
-        participant_list.append(participant_dict)
-        participant_dict = \
-        {
-            "Pre-assign Room Name" : conflict_room,
-            "Email Address"        : 'zjs362@eid.utexas.edu'
-        }
-        participant_list.append(participant_dict)
-        #conflict_list.append("Aman Arora (UT Austin)")
-    else :
-        # Aman is not in conflict with the paper
-        # Add Aman to Discussion Room
-        participant_dict = \
-        {
-            "Pre-assign Room Name" : discussion_room,
-            "Email Address"        : aman_discussion_account
-        }
-        participant_list.append(participant_dict)
-        participant_dict = \
-        {
-            "Pre-assign Room Name" : discussion_room,
-            "Email Address"        : 'zjs362@eid.utexas.edu'
-        }
-        participant_list.append(participant_dict)
-
-
-    # Write the data to the output
-    participant_df = pd.DataFrame(participant_list)
-    conflict_df    = pd.DataFrame(conflict_list)
-
-    participant_df.to_csv(zoom_csv_config_non_hash_folder+"/"+str(paper['ID'])+".csv", index=False)
-    participant_df.to_csv(zoom_csv_config_hash_folder+"/"+paper['hash']+".csv", index=False)
-
-    conflict_df.to_csv(conflict_csv_non_hash_folder+"/"+str(paper['ID'])+".csv", index=False, header=False)
-    conflict_df.to_csv(conflict_csv_hash_folder+"/"+paper['hash']+".csv", index=False, header=False)
-
-# %% Save Paper Summary
-papers_df.rename(columns={'authors':'Authors'}, inplace=True)
-papers_df.to_csv(paper_summary_filename, index=False)
-
+    zoom_rules = compile_zoom_rules(load_zoom_rules(zoom_rules_filename), pcpc_merged_info_df['hotcrp_email'].tolist(), room_names)
+    extra_lines, zoom_report_df = apply_zoom_rules(zoom_rules, papers_df['ID'], room_conflict_lists, hotcrp_conflict_lists)
+    zoom_report_df.to_csv(zoom_report_filename, index=False)
+    for (role, status), status_df in zoom_report_df.groupby(['role', 'status']):
+        print("Role %s is %s on %d papers\n" % (role, status, status_df.shape[0]))
+    if (zoom_report_df['status'] == 'unavailable').any():
+        print("Warning! Some papers have no chair in the discussion room, see " + zoom_report_filename + "\n")
+
+    participant_files = room_files(pc_conflict, pc_discussion_lines, pc_conflict_lines, participant_header, extra_lines)
+    conflict_files    = [''.join(pc_conflict_name_lines[pc_conflict[row]]) for row in range(pc_conflict.shape[0])]
+
+    # %% Write the room files of every paper
+    output_files = []
+    for paper_id, paper_hash, participant_file, conflict_file in zip(papers_df['ID'], papers_df['hash'], participant_files, conflict_files):
+        output_files.append((zoom_csv_config_non_hash_folder+"/"+str(paper_id)+".csv", participant_file))
+        output_files.append((zoom_csv_config_hash_folder+"/"+paper_hash+".csv", participant_file))
+        output_files.append((conflict_csv_non_hash_folder+"/"+str(paper_id)+".csv", conflict_file))
+        output_files.append((conflict_csv_hash_folder+"/"+paper_hash+".csv", conflict_file))
+    write_files(output_files, zoom_archive_filename if write_zoom_archive else None)
+
+    # %% Save Paper Summary
+    papers_df.rename(columns={'authors':'Authors'}, inplace=True)
+    papers_df.to_csv(paper_summary_filename, index=False)
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Project: ISCA 2021 Script
+# Filename: s08_reviewer_assign.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Topic-Aware Reviewer Assignment
+# Description:
+## This script assigns reviewers to each paper based on the topics assigned by s05 and the topic
+## interest of each PC member, while respecting the PC conflicts and the reviewer load.
+## The output is a HotCRP assignment CSV (the same format as the PC assignments used by s06) that
+## can be uploaded to HotCRP as a starting point of the reviewer assignment.
+
+#%% Import some libraries that are needed
+import math
+import pandas as pd
+import numpy as np
+from s00_assignment import topic_interest_matrix
+from s00_assignment import paper_topic_matrix
+from s00_assignment import conflict_mask
+from s00_assignment import solve_assignment
+from s00_instrument import start_run_report
+from s00_instrument import write_run_report
+
+#%% Define the input and output CSV filename
+# Input CSV filename
+paper_topics_ranked_filename = 'sample-data/output/isca2021-papers-topics-ranked.csv'
+pc_info_filename             = 'sample-data/input/isca2021-pcinfo.csv'
+paper_pc_conflict_filename   = 'sample-data/input/isca2021-pcconflicts.csv'
+
+# Output CSV filename
+paper_pc_assignment_filename = 'sample-data/output/isca2021-pcassignments.csv'
+# Run report (see s00_instrument.py)
+run_report_filename          = 'sample-data/output/isca2021-s08-run-report.json'
+
+#%% Define constant
+# Number of primary and secondary reviews of each paper
+primary_reviews_per_paper   = 3
+secondary_reviews_per_paper = 1
+# Maximum number of papers of each reviewer (None: the average load rounded up, plus one)
+reviewer_max_load           = None
+# Only the PC members with this role are reviewers
+reviewer_role               = 'pc'
+# Weight of the other topics of a paper (the topic assigned by s05 has weight 1)
+secondary_topic_weight      = 0.5
+# Number of best reviewers of each paper considered by the solver
+candidates_per_paper        = 50
+# Seed of the tie breaking between reviewers with the same score
+assignment_seed             = 0
+
+#%% Run the script
+## All the steps of the script are in main(), so the script can be imported (e.g., by
+## s00_pipeline.py) without running it.
+def main():
+    # Start the run report of this script
+    start_run_report('s08')
+
+    #%% Load the topics of the papers (s05) and the PC info from HotCRP
+    paper_topics_df = pd.read_csv(paper_topics_ranked_filename)
+    pc_info_df = pd.read_csv(pc_info_filename)
+    paper_pc_conflict_df = pd.read_csv(paper_pc_conflict_filename)
+
+    # Reviewers are the PC members with the reviewer role
+    pc_info_df = pc_info_df[pc_info_df['roles'].fillna('').str.split().apply(lambda roles: reviewer_role in roles)].reset_index(drop=True)
+
+    #%% Compute the score of each reviewer on each paper
+    topic_column_list = [column for column in paper_topics_df.columns if column.startswith('topic ')]
+    topic_lists = [[topic for topic in topics if isinstance(topic, str)] for topics in paper_topics_df[topic_column_list].itertuples(index=False)]
+    topic_list = sorted(set(topic for topics in topic_lists for topic in topics))
+    topic_index = {topic: index for index, topic in enumerate(topic_list)}
+
+    paper_topic = paper_topic_matrix(topic_lists, topic_index, secondary_topic_weight)
+    interest = topic_interest_matrix(pc_info_df, topic_list)
+    score = np.asarray(paper_topic @ interest.T)
+
+    # Conflicted reviewers are never assigned
+    conflict = conflict_mask(paper_topics_df['paper'].tolist(), pc_info_df['email'].tolist(),
+                             zip(paper_pc_conflict_df['paper'], paper_pc_conflict_df['email']))
+
+    #%% Assign the reviewers
+    reviews_per_paper = primary_reviews_per_paper + secondary_reviews_per_paper
+    max_load = reviewer_max_load
+    if max_load is None:
+        max_load = math.ceil(paper_topics_df.shape[0] * reviews_per_paper / max(pc_info_df.shape[0], 1)) + 1
+    assignment_list, assignment_stats = solve_assignment(score, conflict, reviews_per_paper, max_load, candidates_per_paper, assignment_seed)
+
+    print("Assigned %d reviews of %d papers to %d reviewers (load %d to %d, maximum %d), total score %.1f\n"
+          % (assignment_stats['assigned'], assignment_stats['papers'], assignment_stats['reviewers'],
+             assignment_stats['min_load'], assignment_stats['max_load'], max_load, assignment_stats['total_score']))
+    if assignment_stats['unassigned'] > 0:
+        print("Warning! %d reviews cannot be assigned, increase reviewer_max_load or candidates_per_paper\n" % (assignment_stats['unassigned']))
+
+    #%% Save the assignment as HotCRP assignment CSV
+    # The reviewers with the highest score on each paper are the primary reviewers
+    assignment_df = pd.DataFrame(assignment_list, columns=['paper_index','reviewer_index'])
+    assignment_df['score'] = score[assignment_df['paper_index'], assignment_df['reviewer_index']]
+    assignment_df.sort_values(['paper_index','score','reviewer_index'], ascending=[True, False, True], inplace=True)
+    assignment_df['order'] = assignment_df.groupby('paper_index').cumcount()
+    assignment_df['paper']  = paper_topics_df['paper'].to_numpy()[assignment_df['paper_index']]
+    assignment_df['action'] = np.where(assignment_df['order'] < primary_reviews_per_paper, 'primary', 'secondary')
+    assignment_df['email']  = pc_info_df['email'].to_numpy()[assignment_df['reviewer_index']]
+    assignment_df[['paper','action','email']].to_csv(paper_pc_assignment_filename, index=False)
+
+    # %% Write the run report
+    write_run_report(run_report_filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Project: ISCA 2021 Script
+# Filename: tests/conftest.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Shared Fixtures of the Tests
+# Description:
+## This file contains the fixtures shared by the tests:
+## - stand_in: a local HTTP server that stands in for DBLP. By default it answers every GET with
+##   a JSON body that echoes the path. The responses of a path can be scripted with
+##   stand_in.script(path, [response, ...]); each response is a dictionary with status, headers,
+##   body, and delay (seconds to wait before answering), and is used once, in order.
+##   The path and the arrival time of every request are recorded in stand_in.requests.
+## - dblp_cache: a DBLP cache in a temporary folder, used by s00_function instead of .cache.
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import time
+import threading
+import socketserver
+import http.server
+import urllib.parse
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import s00_cache
+
+#%% Request handler of the stand-in server
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1 so that the client can keep the connection alive
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        path = urllib.parse.urlsplit(self.path).path
+        with server.lock:
+            server.requests.append((self.path, time.monotonic(), self.headers.get('Host')))
+            script = server.scripts.get(path)
+            response = script.pop(0) if script else {}
+        time.sleep(response.get('delay', 0))
+        body = response.get('body', json.dumps({"path": self.path}))
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(response.get('status', 200))
+        for name, value in response.get('headers', {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+#%% Stand-in server (one thread per connection)
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        http.server.HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.scripts = {}
+        self.url = 'http://127.0.0.1:%d' % (self.server_address[1])
+
+    def script(self, path, response_list):
+        with self.lock:
+            self.scripts[path] = list(response_list)
+
+    def paths(self):
+        with self.lock:
+            return [request[0] for request in self.requests]
+
+@pytest.fixture
+def stand_in():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+#%% DBLP cache in a temporary folder
+@pytest.fixture
+def dblp_cache(tmp_path, monkeypatch):
+    cache = s00_cache.DBLPCache(str(tmp_path / 'dblp-cache.sqlite'))
+    monkeypatch.setattr(s00_cache, 'dblp_cache', cache)
+    return cache
@@ -0,0 +1,99 @@
+# Project: ISCA 2021 Script
+# Filename: tests/test_cache.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Tests of the DBLP Cache
+# Description:
+## The TTL, the LRU eviction, and the derived entries (person records of a person XML) of the
+## SQLite DBLP cache are checked on a cache in a temporary folder.
+## Run with: python -m pytest tests
+
+#%% Import some libraries that are needed
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import s00_cache
+from s00_cache import DBLPCache
+
+#%% Function to open a cache in the temporary folder
+def open_cache(tmp_path, ttl=None, max_size=None):
+    return DBLPCache(str(tmp_path / 'dblp-cache.sqlite'), ttl, max_size)
+
+#%% An entry expires after its TTL and is removed on the next lookup
+def test_entry_expires(tmp_path):
+    cache = open_cache(tmp_path, ttl={"person_id": 100, "pub_id": 100, "person_record": 100})
+    now = time.time()
+    cache.put('person_id', 'fresh', 'fresh value', created=now - 50)
+    cache.put('person_id', 'old', 'old value', created=now - 150)
+    assert cache.get('person_id', 'fresh') == 'fresh value'
+    assert cache.get('person_id', 'old') is None
+    assert cache.created('person_id', 'old') is None
+    # A kind without TTL never expires
+    cache.put('other', 'key', 'value', created=0)
+    assert cache.get('other', 'key') == 'value'
+
+#%% A person record never lives longer than the person XML it was built from
+def test_derived_entry_expires_with_its_source(tmp_path):
+    cache = open_cache(tmp_path, ttl={"pub_id": 100, "person_record": 1000})
+    assert cache.ttl['person_record'] == 100
+    cache.put('pub_id', 'pid', '<dblpperson/>', created=time.time() - 150)
+    cache.put('person_record', 'pid', '{}', created=cache.created('pub_id', 'pid'))
+    assert cache.get('person_record', 'pid') is None
+
+#%% The least recently used entries are evicted first when the cache is over its size
+def test_eviction_order(tmp_path):
+    cache = open_cache(tmp_path)
+    for key in ['a', 'b', 'c', 'd']:
+        cache.put('person_id', key, 'value of %s' % (key))
+        time.sleep(0.01)
+    # a and c are used again, so b then d are the least recently used (the touches are batched)
+    assert cache.get('person_id', 'a') is not None
+    time.sleep(0.01)
+    assert cache.get('person_id', 'c') is not None
+    entry_size = cache.total_size() // 4
+    assert cache.evict(max_size=cache.total_size() - 1) == 1
+    assert cache.created('person_id', 'b') is None
+    assert cache.evict(max_size=2 * entry_size) == 1
+    assert cache.created('person_id', 'd') is None
+    assert cache.get('person_id', 'a') == 'value of a'
+    assert cache.get('person_id', 'c') == 'value of c'
+
+#%% The size cap is checked every cache_evict_interval writes
+def test_size_cap_on_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(s00_cache, 'cache_evict_interval', 1)
+    cache = open_cache(tmp_path)
+    cache.put('person_id', 'a', 'value of a')
+    cache.max_size = 2 * cache.total_size()
+    time.sleep(0.01)
+    cache.put('person_id', 'b', 'value of b')
+    time.sleep(0.01)
+    cache.put('person_id', 'c', 'value of c')
+    assert cache.created('person_id', 'a') is None
+    assert cache.get('person_id', 'b') == 'value of b'
+    assert cache.get('person_id', 'c') == 'value of c'
+
+#%% The person record is removed with its person XML (new XML, deleted XML, or evicted XML)
+def test_derived_entry_removed_with_its_source(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put('pub_id', 'pid1', '<dblpperson/>')
+    cache.put('person_record', 'pid1', '{}')
+    cache.put('pub_id', 'pid1', '<dblpperson n="1"/>')
+    assert cache.get('person_record', 'pid1') is None
+
+    cache.put('person_record', 'pid1', '{}')
+    cache.delete('pub_id', 'pid1')
+    assert cache.get('person_record', 'pid1') is None
+
+    cache.put('pub_id', 'pid1', '<dblpperson/>')
+    time.sleep(0.01)
+    cache.put('pub_id', 'pid2', '<dblpperson/>')
+    time.sleep(0.01)
+    # The person record of pid1 is more recent than both XML, only the XML of pid1 is the victim
+    cache.put('person_record', 'pid1', '{}')
+    cache.put('person_record', 'pid2', '{}')
+    assert cache.evict(max_size=cache.total_size() - 1) == 2
+    assert cache.created('pub_id', 'pid1') is None
+    assert cache.created('person_record', 'pid1') is None
+    assert cache.get('pub_id', 'pid2') is not None
+    assert cache.get('person_record', 'pid2') is not None
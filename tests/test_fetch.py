@@ -0,0 +1,99 @@
+# Project: ISCA 2021 Script
+# Filename: tests/test_fetch.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Tests of the Concurrent DBLP Fetch
+# Description:
+## The fetch pool, the per-host rate limiter, and the batch functions are run against a local
+## stand-in of DBLP (see conftest.py), so no request is sent to DBLP.
+## Run with: python -m pytest tests
+
+#%% Import some libraries that are needed
+import os
+import sys
+import json
+import time
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import s00_function
+from s00_function import DBLPHttpClient
+from s00_function import HostRateLimiter
+from s00_function import run_fetch_pool
+from s00_function import request_author_key_batch
+
+#%% The results come back in the order of the requests, even if the first request is the slowest
+def test_fetch_pool_keeps_order(stand_in):
+    client = DBLPHttpClient(requests_per_second=0)
+    stand_in.script('/paper/0', [{"delay": 0.3, "body": 'paper 0'}])
+    requests = [(stand_in.url + '/paper/%d' % (index), 'hash%d' % (index)) for index in range(8)]
+    results = run_fetch_pool(requests, lambda req_url, req_hash: client.get(req_url), max_workers=4)
+    assert results[0] == b'paper 0'
+    assert [json.loads(result)['path'] for result in results[1:]] == ['/paper/%d' % (index) for index in range(1, 8)]
+
+#%% The same URL is only fetched once, and every copy of the request gets the result
+def test_fetch_pool_dedups_urls(stand_in):
+    client = DBLPHttpClient(requests_per_second=0)
+    url_list = [stand_in.url + '/paper/%d' % (index) for index in (1, 2, 1, 3, 2, 1)]
+    results = run_fetch_pool([(req_url, 'hash') for req_url in url_list], lambda req_url, req_hash: client.get(req_url), max_workers=4)
+    assert [json.loads(result)['path'] for result in results] == ['/paper/%d' % (index) for index in (1, 2, 1, 3, 2, 1)]
+    assert sorted(stand_in.paths()) == ['/paper/1', '/paper/2', '/paper/3']
+
+#%% The cached names of a batch are not sent to the fetch pool
+def test_cache_hits_skip_the_pool(stand_in, dblp_cache, monkeypatch):
+    monkeypatch.setattr(s00_function, 'dblp_author_api_url', stand_in.url + '/search/author/api?')
+    monkeypatch.setattr(s00_function, 'http_client', DBLPHttpClient(requests_per_second=0))
+    pool_requests = []
+    def counting_fetch_pool(requests, fetch_function, max_workers=None, progress=None):
+        pool_requests.extend(requests)
+        return run_fetch_pool(requests, fetch_function, max_workers, progress)
+    monkeypatch.setattr(s00_function, 'run_fetch_pool', counting_fetch_pool)
+
+    first = request_author_key_batch([('Lizy', 'John'), ('Sandhya', 'Dwarkadas')])
+    assert len(pool_requests) == 2
+    assert len(stand_in.requests) == 2
+
+    # One name is cached, only the other one goes to the pool
+    pool_requests[:] = []
+    second = request_author_key_batch([('Sandhya', 'Dwarkadas'), ('Aman', 'Arora')])
+    assert len(pool_requests) == 1
+    assert 'Arora' in pool_requests[0][0]
+    assert second[0] == first[1]
+
+    # Every name is cached, the pool is not used and nothing is sent
+    pool_requests[:] = []
+    third = request_author_key_batch([('Aman', 'Arora'), ('Lizy', 'John')])
+    assert pool_requests == []
+    assert len(stand_in.requests) == 3
+    assert third == [second[1], first[0]]
+
+#%% The limiter spaces out the requests to the same host, and the hosts do not wait for each other
+def test_limiter_keeps_per_host_rate():
+    limiter = HostRateLimiter(requests_per_second=10)
+    start_time = time.monotonic()
+    time_list = []
+    time_lock = threading.Lock()
+    def wait(req_url):
+        limiter.wait(req_url)
+        with time_lock:
+            time_list.append((req_url, time.monotonic() - start_time))
+    threads = [threading.Thread(target=wait, args=('http://dblp.example/%d' % (index),)) for index in range(5)]
+    threads.append(threading.Thread(target=wait, args=('http://other.example/',)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    same_host = sorted(elapsed for req_url, elapsed in time_list if 'dblp.example' in req_url)
+    assert all(later - earlier >= 0.09 for earlier, later in zip(same_host, same_host[1:]))
+    assert same_host[-1] >= 0.39
+    other_host = [elapsed for req_url, elapsed in time_list if 'other.example' in req_url]
+    assert other_host[0] < 0.05
+
+#%% The shared client keeps to the rate of the host when the pool runs many workers
+def test_fetch_pool_keeps_per_host_rate(stand_in):
+    client = DBLPHttpClient(requests_per_second=20)
+    requests = [(stand_in.url + '/paper/%d' % (index), 'hash%d' % (index)) for index in range(10)]
+    run_fetch_pool(requests, lambda req_url, req_hash: client.get(req_url), max_workers=8)
+    arrival_list = sorted(arrival for path, arrival, host in stand_in.requests)
+    # 20 requests per second: 0.05 s between requests (with some slack for the thread scheduling)
+    assert all(later - earlier >= 0.035 for earlier, later in zip(arrival_list, arrival_list[1:]))
+    assert arrival_list[-1] - arrival_list[0] >= 9 * 0.05 * 0.9
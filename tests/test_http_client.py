@@ -0,0 +1,65 @@
+# Project: ISCA 2021 Script
+# Filename: tests/test_http_client.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Tests of the Retries of the DBLP HTTP Client
+# Description:
+## The retries of DBLPHttpClient (HTTP 429 with Retry-After, HTTP 5xx, and retries running out)
+## are run against a local stand-in of DBLP (see conftest.py).
+## Run with: python -m pytest tests
+
+#%% Import some libraries that are needed
+import os
+import sys
+import time
+import urllib.error
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from s00_function import DBLPHttpClient
+
+#%% HTTP 429: the client waits for Retry-After (the backoff alone would not wait at all)
+def test_retry_after_is_honored(stand_in):
+    client = DBLPHttpClient(requests_per_second=0, backoff_base=0.0)
+    stand_in.script('/pid/1.xml', [{"status": 429, "headers": {"Retry-After": '1'}}, {"body": 'person 1'}])
+    start_time = time.monotonic()
+    assert client.get(stand_in.url + '/pid/1.xml') == b'person 1'
+    assert time.monotonic() - start_time >= 0.9
+    assert stand_in.paths() == ['/pid/1.xml', '/pid/1.xml']
+    summary = client.summary()
+    assert (summary['requests'], summary['retries'], summary['failures']) == (1, 1, 0)
+
+#%% Retry-After is capped by the maximum backoff and can be an HTTP date
+def test_retry_after_values():
+    client = DBLPHttpClient(requests_per_second=0, backoff_max=5.0)
+    assert client.backoff_delay(0, client.parse_retry_after('120')) == 5.0
+    assert client.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert client.parse_retry_after('soon') is None
+
+#%% HTTP 5xx followed by a success
+def test_server_error_then_success(stand_in):
+    client = DBLPHttpClient(requests_per_second=0, backoff_base=0.01)
+    stand_in.script('/pid/2.xml', [{"status": 503}, {"status": 500}, {"body": 'person 2'}])
+    assert client.get(stand_in.url + '/pid/2.xml', retry_num=2) == b'person 2'
+    assert len(stand_in.requests) == 3
+    summary = client.summary()
+    assert (summary['requests'], summary['retries'], summary['failures']) == (1, 2, 0)
+
+#%% The retries run out: the last error is raised after retry_num + 1 attempts
+def test_retries_run_out(stand_in):
+    client = DBLPHttpClient(requests_per_second=0, backoff_base=0.01)
+    stand_in.script('/pid/3.xml', [{"status": 502}] * 5)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.get(stand_in.url + '/pid/3.xml', retry_num=2)
+    assert error.value.code == 502
+    assert len(stand_in.requests) == 3
+    summary = client.summary()
+    assert (summary['requests'], summary['retries'], summary['failures']) == (1, 2, 1)
+
+#%% An error that cannot be fixed by retrying (e.g., HTTP 404) is raised at once
+def test_no_retry_on_client_error(stand_in):
+    client = DBLPHttpClient(requests_per_second=0, backoff_base=0.01)
+    stand_in.script('/pid/4.xml', [{"status": 404}, {"body": 'person 4'}])
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.get(stand_in.url + '/pid/4.xml', retry_num=2)
+    assert error.value.code == 404
+    assert len(stand_in.requests) == 1
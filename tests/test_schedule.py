@@ -0,0 +1,50 @@
+# Project: ISCA 2021 Script
+# Filename: tests/test_schedule.py
+# Date: March 16, 2021
+# Author: Bagus Hanindhito (hanindhito[at]bagus[dot]my[dot]id)
+# Title: Tests of the Paper Discussion Scheduler
+# Description:
+## Run with: python -m pytest tests
+
+#%% Import some libraries that are needed
+import os
+import sys
+import random
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from s00_schedule import optimal_schedule
+from s00_schedule import schedule_weights
+
+#%% Function to compute the balance cost of a schedule (the seats of a timeslot are filled in order)
+def balance_cost(schedule_dict):
+    return sum(len(paper_list) * (len(paper_list) - 1) // 2 for paper_list in schedule_dict.values())
+
+#%% Contiguity (priority 3) never beats the balance (priority 2) nor the score (priority 1)
+## Many papers share the same reviewers and all timeslots have the same score, so the contiguity
+## bonus pushes to put these papers together in a few timeslots.
+def test_contiguity_never_beats_balance():
+    for seed in range(20):
+        rng = random.Random(seed)
+        paper_num = rng.randint(8, 40)
+        slot_num = rng.randint(2, 6)
+        reviewer_pool = ['r%d@example.edu' % (index) for index in range(rng.randint(3, 8))]
+        reviewer_lists = [rng.sample(reviewer_pool, rng.randint(1, 3)) for paper in range(paper_num)]
+        score_matrix = np.array([[rng.choice([0, 0, 0, -1]) for slot in range(slot_num)] for paper in range(paper_num)])
+        timeslot_list = list(range(1, slot_num + 1))
+        target = rng.randint(2, 6)
+        plain_dict, plain_stats = optimal_schedule(range(paper_num), score_matrix, reviewer_lists, timeslot_list, target, contiguity_rounds=0)
+        schedule_dict, stats = optimal_schedule(range(paper_num), score_matrix, reviewer_lists, timeslot_list, target, contiguity_rounds=3)
+        assert stats['total_score'] == plain_stats['total_score']
+        assert balance_cost(schedule_dict) == balance_cost(plain_dict)
+        assert stats['shared_reviewer'] >= plain_stats['shared_reviewer']
+
+#%% The weights keep the order of priority for any number of papers
+def test_schedule_weights():
+    for max_bonus in [0, 1, 6, 60]:
+        for paper_num in [0, 1, 10, 3000]:
+            for seat_num in [1, 6, 20]:
+                balance_weight, score_weight = schedule_weights(max_bonus, paper_num, seat_num)
+                total_bonus = max_bonus * max(paper_num, 1)
+                total_balance = balance_weight * (seat_num - 1) * max(paper_num, 1)
+                assert total_bonus < balance_weight
+                assert total_balance + total_bonus < score_weight